@@ -0,0 +1,618 @@
+"""
+Async Blockchain Service
+Non-blocking counterpart of BlockchainService built on AsyncWeb3,
+used by FastAPI routes and background tasks so RPC latency never stalls the event loop
+"""
+import asyncio
+from decimal import Decimal
+from typing import Optional, Dict, Any, List, Union
+from web3 import AsyncWeb3
+from web3.exceptions import Web3RPCError
+from eth_account import Account
+import logging
+
+from nonce_manager import get_nonce_manager, is_nonce_conflict, is_already_known
+from gas_oracle import get_gas_oracle
+from chain_head import get_head_tracker
+from receipt_cache import get_receipt_cache
+from blockchain_service import (
+    BlockchainService, broadcast_error, chunked, to_block_param, read_batch_results, get_rpc_pool
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBlockchainService:
+    """Async service for interacting with Ethereum blockchain"""
+    
+    # Same networks as the sync service
+    NETWORKS = BlockchainService.NETWORKS
+    
+    def __init__(self, network: str = 'sepolia'):
+        """
+        Initialize async blockchain service
+        
+        Call connect() before first use (get_async_blockchain_service does this).
+        
+        Args:
+            network: Network name (sepolia, ethereum, amoy, polygon)
+        """
+        if network not in self.NETWORKS:
+            raise ValueError(f"Unsupported network: {network}. Supported: {list(self.NETWORKS.keys())}")
+        
+        self.network = network
+        self.network_config = self.NETWORKS[network]
+        
+        # Initialize AsyncWeb3 on the network's provider pool (failover across endpoints)
+        self.w3 = AsyncWeb3(get_rpc_pool(network).async_provider())
+        
+        # Shared per-network fee cache (one eth_feeHistory per block)
+        self.gas_oracle = get_gas_oracle(network, self.w3, self.network_config['block_time'])
+    
+    async def connect(self):
+        """Verify connection to the RPC node"""
+        if not await self.w3.is_connected():
+            logger.error(f"Failed to connect to {self.network_config['name']}")
+            raise ConnectionError(f"Cannot connect to {self.network_config['name']}")
+        
+        logger.info(f"✅ Connected to {self.network_config['name']} (async)")
+    
+    async def get_balance(self, address: str, block: Union[int, str] = 'latest') -> Decimal:
+        """
+        Get ETH balance of an address
+        
+        Args:
+            address: Ethereum address
+            block: Block number or tag ('pending' includes queued sends)
+        
+        Returns:
+            Balance in ETH (Decimal)
+        """
+        try:
+            checksum_address = self.w3.to_checksum_address(address)
+            balance_wei = await self.w3.eth.get_balance(checksum_address, block)
+            balance_eth = self.w3.from_wei(balance_wei, 'ether')
+            return Decimal(str(balance_eth))
+        except Exception as e:
+            logger.error(f"Error getting balance for {address}: {e}")
+            raise
+    
+    async def get_balances(self, addresses: List[str], block: Union[int, str] = 'latest') -> Dict[str, Decimal]:
+        """
+        Get ETH balances of many addresses using JSON-RPC batch requests
+        
+        Packs up to RPC_BATCH_LIMIT eth_getBalance calls into each HTTP request
+        and sends the chunks concurrently.
+        
+        Args:
+            addresses: Ethereum addresses
+            block: Block number or tag to read balances at
+        
+        Returns:
+            Dict of address (as passed in) -> balance in ETH.
+            Addresses whose lookup failed are left out.
+        """
+        unique = list(dict.fromkeys(addresses))
+        block_param = to_block_param(block)
+        
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Any]:
+            calls = [
+                ('eth_getBalance', [self.w3.to_checksum_address(address), block_param])
+                for address in chunk
+            ]
+            return read_batch_results(await self.w3.provider.make_batch_request(calls), chunk)
+        
+        balances = {}
+        for results in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunked(unique))):
+            for address, balance_hex in results.items():
+                balances[address] = Decimal(str(self.w3.from_wei(int(balance_hex, 16), 'ether')))
+        
+        return balances
+    
+    async def estimate_gas_fee(
+        self,
+        from_address: str,
+        to_address: str,
+        amount: Decimal,
+        speed: str = 'standard'
+    ) -> Dict[str, Any]:
+        """
+        Estimate gas fee for a transaction
+        
+        Args:
+            from_address: Sender address
+            to_address: Recipient address
+            amount: Amount in ETH
+            speed: Fee level from the gas oracle ('slow', 'standard', 'fast')
+        
+        Returns:
+            Dict with gas estimate, gas price, and total fee. 'fees' holds the
+            gas oracle quote, which can be passed on to send_transaction.
+        
+        Raises:
+            ValueError: If gas or fees can't be estimated
+        """
+        try:
+            from_addr = self.w3.to_checksum_address(from_address)
+            to_addr = self.w3.to_checksum_address(to_address)
+            amount_wei = self.w3.to_wei(amount, 'ether')
+            
+            # Estimate gas; fees come from the oracle cache (no RPC within the same block)
+            gas_estimate, fees = await asyncio.gather(
+                self.w3.eth.estimate_gas({
+                    'from': from_addr,
+                    'to': to_addr,
+                    'value': amount_wei
+                }),
+                self.gas_oracle.get_fees(speed)
+            )
+            gas_price = fees['gas_price']
+            
+            # Expected fee at base fee + tip, and the most it can cost at maxFeePerGas
+            total_fee_wei = gas_estimate * gas_price
+            total_fee_eth = self.w3.from_wei(total_fee_wei, 'ether')
+            max_fee_eth = self.w3.from_wei(gas_estimate * fees['max_fee_per_gas'], 'ether')
+            
+            return {
+                'gas_estimate': gas_estimate,
+                'gas_price_wei': str(gas_price),
+                'gas_price_gwei': str(self.w3.from_wei(gas_price, 'gwei')),
+                'total_fee_eth': str(total_fee_eth),
+                'max_fee_eth': str(max_fee_eth),
+                'total_fee_usd': None,  # TODO: Add price oracle
+                'fees': fees
+            }
+        except Exception as e:
+            logger.error(f"Error estimating gas: {e}")
+            # No zero-fee fallback - a quote or send must not go ahead without a real fee
+            raise ValueError(f"Gas estimation failed: {e}")
+    
+    async def quote_transaction(
+        self,
+        from_address: str,
+        to_address: str,
+        amount: Decimal,
+        speed: str = 'standard'
+    ) -> Dict[str, Any]:
+        """
+        Prepare a send: balance, gas/fees and nonce, fetched concurrently
+        
+        Args:
+            from_address: Sender address
+            to_address: Recipient address
+            amount: Amount in ETH
+            speed: Fee level from the gas oracle
+        
+        Returns:
+            Dict with balance (ETH), balance_wei ('pending'), gas_estimate
+            (as from estimate_gas_fee) and the next nonce
+        """
+        from_addr = self.w3.to_checksum_address(from_address)
+        
+        def fetch_nonce():
+            return self.w3.eth.get_transaction_count(from_addr, 'pending')
+        
+        balance_wei, gas_estimate, nonce = await asyncio.gather(
+            self.w3.eth.get_balance(from_addr, 'pending'),
+            self.estimate_gas_fee(from_addr, to_address, amount, speed),
+            get_nonce_manager().prime(self.network, from_addr, fetch_nonce)
+        )
+        
+        return {
+            'balance': Decimal(str(self.w3.from_wei(balance_wei, 'ether'))),
+            'balance_wei': balance_wei,
+            'gas_estimate': gas_estimate,
+            'nonce': nonce
+        }
+    
+    async def send_transaction(
+        self,
+        private_key: str,
+        to_address: str,
+        amount: Decimal,
+        gas_price: Optional[int] = None,
+        fees: Optional[Dict[str, Any]] = None,
+        balance_wei: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Send ETH transaction
+        
+        Sent as an EIP-1559 (type 2) transaction priced by the gas oracle,
+        unless a legacy gas_price is given.
+        
+        Args:
+            private_key: Sender's private key (hex string)
+            to_address: Recipient address
+            amount: Amount in ETH
+            gas_price: Optional custom legacy gas price (in wei)
+            fees: Optional gas oracle quote (e.g. from estimate_gas_fee) to reuse
+            balance_wei: Sender balance already read by quote_transaction (skips the lookup)
+        
+        Returns:
+            Dict with tx_hash and status
+        """
+        try:
+            # Validate to_address first
+            if not to_address or not isinstance(to_address, str):
+                raise ValueError("Recipient address is required")
+            
+            if not self.is_valid_address(to_address):
+                raise ValueError(f"Invalid Ethereum address: {to_address}")
+            
+            # Get account from private key
+            try:
+                account = Account.from_key(private_key)
+            except Exception as e:
+                logger.error(f"Invalid private key: {e}")
+                raise ValueError("Invalid private key format")
+            
+            from_address = account.address
+            
+            # Convert addresses to checksum
+            from_addr = self.w3.to_checksum_address(from_address)
+            to_addr = self.w3.to_checksum_address(to_address)
+            
+            # Convert amount to wei
+            try:
+                amount_wei = self.w3.to_wei(amount, 'ether')
+            except Exception:
+                raise ValueError(f"Invalid amount: {amount}")
+            
+            # Balance at 'pending' so sends still queued from this wallet are accounted for
+            if balance_wei is not None:
+                sender_balance_wei = balance_wei
+            else:
+                try:
+                    sender_balance_wei = await self.w3.eth.get_balance(from_addr, 'pending')
+                except Exception as e:
+                    logger.error(f"Failed to get balance: {e}")
+                    raise ValueError(f"Failed to connect to blockchain: {str(e)}")
+            
+            sender_balance_eth = self.w3.from_wei(sender_balance_wei, 'ether')
+            
+            # Fee fields: custom legacy price, else the oracle quote (cached per block)
+            if gas_price is not None:
+                fee_fields = {'gasPrice': gas_price}
+            else:
+                if fees is None:
+                    try:
+                        fees = await self.gas_oracle.get_fees()
+                    except Exception as e:
+                        logger.error(f"Failed to get gas fees: {e}")
+                        fees = {'type': 'legacy', 'max_fee_per_gas': self.w3.to_wei(2, 'gwei')}  # Fallback to 2 gwei
+                
+                if fees['type'] == 'eip1559':
+                    fee_fields = {
+                        'type': 2,
+                        'maxFeePerGas': fees['max_fee_per_gas'],
+                        'maxPriorityFeePerGas': fees['max_priority_fee_per_gas']
+                    }
+                    logger.info(
+                        f"⛽ Max fee: {self.w3.from_wei(fees['max_fee_per_gas'], 'gwei')} gwei, "
+                        f"tip: {self.w3.from_wei(fees['max_priority_fee_per_gas'], 'gwei')} gwei"
+                    )
+                else:
+                    fee_fields = {'gasPrice': fees['max_fee_per_gas']}
+                    logger.info(f"⛽ Gas price: {self.w3.from_wei(fees['max_fee_per_gas'], 'gwei')} gwei")
+            
+            # Calculate total cost (node requires balance for the max fee)
+            gas_cost_wei = 21000 * fee_fields.get('maxFeePerGas', fee_fields.get('gasPrice'))
+            total_cost_wei = amount_wei + gas_cost_wei
+            
+            if sender_balance_wei < total_cost_wei:
+                raise ValueError(
+                    f"Insufficient balance: have {sender_balance_eth} ETH, "
+                    f"need {self.w3.from_wei(total_cost_wei, 'ether')} ETH "
+                    f"(amount + gas)"
+                )
+            
+            logger.info(f"Building transaction: from={from_addr[:10]}... to={to_addr[:10]}... value={amount} ETH")
+            
+            # Nonces come from the nonce manager's table; only the first send
+            # (or a resync after a nonce conflict) asks the node
+            nonce_manager = get_nonce_manager()
+            
+            def fetch_nonce():
+                return self.w3.eth.get_transaction_count(from_addr, 'pending')
+            
+            async with nonce_manager.lock(self.network, from_addr):
+                nonce = await nonce_manager.reserve(self.network, from_addr, fetch_nonce)
+                
+                for attempt in range(2):
+                    logger.info(f"📋 Nonce for {from_addr}: {nonce}")
+                    
+                    # Build transaction
+                    transaction = {
+                        'nonce': nonce,
+                        'to': to_addr,
+                        'value': amount_wei,
+                        'gas': 21000,  # Standard ETH transfer
+                        'chainId': self.network_config['chain_id'],
+                        **fee_fields
+                    }
+                    
+                    # Sign transaction (local, no RPC)
+                    try:
+                        signed_txn = Account.sign_transaction(transaction, private_key)
+                    except Exception as e:
+                        await nonce_manager.release(self.network, from_addr, nonce)
+                        logger.error(f"Failed to sign transaction: {e}")
+                        raise ValueError(f"Failed to sign transaction: {str(e)}")
+                    
+                    # Send transaction
+                    try:
+                        tx_hash = await self.w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+                        tx_hash_hex = self.w3.to_hex(tx_hash)
+                        break
+                    except Exception as e:
+                        logger.error(f"Failed to broadcast transaction: {e}")
+                        
+                        # The node has this exact transaction (an earlier attempt got through)
+                        if is_already_known(e):
+                            tx_hash_hex = signed_txn.hash.to_0x_hex()
+                            break
+                        
+                        # Nonce taken on chain or in the mempool (e.g. sent from elsewhere) -
+                        # never hand it out again; resync and retry once
+                        if is_nonce_conflict(e):
+                            await nonce_manager.resync(self.network, from_addr, fetch_nonce)
+                            if attempt == 0:
+                                nonce = await nonce_manager.reserve(self.network, from_addr, fetch_nonce)
+                                continue
+                            raise broadcast_error(e)
+                        
+                        # The node answered and refused the transaction - it was not broadcast
+                        if isinstance(e, Web3RPCError):
+                            await nonce_manager.release(self.network, from_addr, nonce)
+                            raise broadcast_error(e)
+                        
+                        # Timeout / transport error: it may have been broadcast, so the nonce
+                        # can't be reused blindly - the next send re-reads it from chain
+                        await nonce_manager.forget(self.network, from_addr)
+                        raise ValueError(
+                            f"⚠️ Broadcast outcome unknown ({e}). Transaction {signed_txn.hash.to_0x_hex()} "
+                            f"may still be mined - check the explorer before sending again."
+                        )
+            
+            logger.info(f"✅ Transaction sent: {tx_hash_hex}")
+            
+            return {
+                'tx_hash': tx_hash_hex,
+                'from_address': from_address,
+                'to_address': to_address,
+                'amount': str(amount),
+                'network': self.network,
+                'explorer_url': f"{self.network_config['explorer']}/tx/{tx_hash_hex}",
+                'status': 'pending'
+            }
+        
+        except ValueError:
+            # Re-raise ValueError with message intact
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error sending transaction: {e}")
+            raise ValueError(f"Blockchain error: {str(e)}")
+    
+    async def get_transaction_status(self, tx_hash: str) -> Dict[str, Any]:
+        """
+        Check transaction status
+        
+        Args:
+            tx_hash: Transaction hash
+        
+        Returns:
+            Dict with status and confirmation info
+        """
+        head = get_head_tracker(self.network)
+        
+        # Finalized receipts never change - answer from the cache without an RPC
+        cached = (await get_receipt_cache().async_get_many(self.network, [tx_hash])).get(tx_hash)
+        if cached:
+            return {
+                'status': cached['status'],
+                'block_number': cached['block_number'],
+                'confirmations': await head.async_confirmations(cached['block_number']),
+                'gas_used': cached['gas_used'],
+                'effective_gas_price': cached.get('effective_gas_price'),
+                'tx_hash': tx_hash
+            }
+        
+        try:
+            # Get transaction receipt
+            receipt = await self.w3.eth.get_transaction_receipt(tx_hash)
+            
+            if receipt:
+                status = 'confirmed' if receipt['status'] == 1 else 'failed'
+                # Head comes from the shared tracker, not an extra eth_blockNumber
+                confirmations = await head.async_confirmations(receipt['blockNumber'])
+                await get_receipt_cache().async_put_many(self.network, [(tx_hash, receipt, confirmations)])
+                return {
+                    'status': status,
+                    'block_number': receipt['blockNumber'],
+                    'confirmations': confirmations,
+                    'gas_used': receipt['gasUsed'],
+                    'effective_gas_price': receipt.get('effectiveGasPrice'),
+                    'tx_hash': tx_hash
+                }
+            else:
+                return {
+                    'status': 'pending',
+                    'tx_hash': tx_hash
+                }
+        except Exception:
+            # Transaction not found yet (still pending)
+            return {
+                'status': 'pending',
+                'tx_hash': tx_hash
+            }
+    
+    async def get_transaction_statuses(self, tx_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Check many transactions using JSON-RPC batch requests
+        
+        Finalized receipts come from the receipt cache; the rest are fetched
+        with eth_getTransactionReceipt, up to RPC_BATCH_LIMIT per HTTP
+        request, with the chunks sent concurrently.
+        
+        Args:
+            tx_hashes: Transaction hashes
+        
+        Returns:
+            Dict of tx hash (as passed in) -> status dict like
+            get_transaction_status(). Transactions without a receipt, or whose
+            lookup failed, are 'pending'.
+        """
+        head = get_head_tracker(self.network)
+        cache = get_receipt_cache()
+        current_block = await head.async_block_number()
+        
+        statuses = {}
+        to_fetch = []
+        unique = list(dict.fromkeys(tx_hashes))
+        cached_receipts = await cache.async_get_many(self.network, unique)
+        for tx_hash in unique:
+            cached = cached_receipts.get(tx_hash)
+            if cached:
+                statuses[tx_hash] = {
+                    'status': cached['status'],
+                    'block_number': cached['block_number'],
+                    'confirmations': max(0, current_block - cached['block_number']),
+                    'gas_used': cached['gas_used'],
+                    'effective_gas_price': cached.get('effective_gas_price'),
+                    'tx_hash': tx_hash
+                }
+            else:
+                to_fetch.append(tx_hash)
+        
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Any]:
+            calls = [('eth_getTransactionReceipt', [tx_hash]) for tx_hash in chunk]
+            return read_batch_results(await self.w3.provider.make_batch_request(calls), chunk)
+        
+        fetched = []
+        for results in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunked(to_fetch)), return_exceptions=True):
+            if isinstance(results, Exception):
+                logger.warning(f"Receipt batch on {self.network} failed: {results}")
+                continue
+            for tx_hash, raw in results.items():
+                if not raw:
+                    continue
+                receipt = {
+                    'status': int(raw['status'], 16),
+                    'blockNumber': int(raw['blockNumber'], 16),
+                    'blockHash': raw.get('blockHash'),
+                    'gasUsed': int(raw['gasUsed'], 16),
+                    'effectiveGasPrice': int(raw['effectiveGasPrice'], 16) if raw.get('effectiveGasPrice') else None
+                }
+                confirmations = max(0, current_block - receipt['blockNumber'])
+                fetched.append((tx_hash, receipt, confirmations))
+                statuses[tx_hash] = {
+                    'status': 'confirmed' if receipt['status'] == 1 else 'failed',
+                    'block_number': receipt['blockNumber'],
+                    'confirmations': confirmations,
+                    'gas_used': receipt['gasUsed'],
+                    'effective_gas_price': receipt.get('effectiveGasPrice'),
+                    'tx_hash': tx_hash
+                }
+        
+        await cache.async_put_many(self.network, fetched)
+        for tx_hash in to_fetch:
+            statuses.setdefault(tx_hash, {'status': 'pending', 'tx_hash': tx_hash})
+        return statuses
+    
+    async def get_transaction_nonces(self, tx_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up sender and nonce of many transactions using JSON-RPC batch requests
+        
+        Args:
+            tx_hashes: Transaction hashes
+        
+        Returns:
+            Dict of tx hash -> {'sender': lowercased address, 'nonce': int}.
+            Transactions the node doesn't know are left out.
+        """
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Any]:
+            calls = [('eth_getTransactionByHash', [tx_hash]) for tx_hash in chunk]
+            return read_batch_results(await self.w3.provider.make_batch_request(calls), chunk)
+        
+        nonces = {}
+        for results in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunked(list(dict.fromkeys(tx_hashes))))):
+            for tx_hash, tx in results.items():
+                if tx:
+                    nonces[tx_hash] = {'sender': tx['from'].lower(), 'nonce': int(tx['nonce'], 16)}
+        return nonces
+    
+    async def get_confirmed_nonces(self, addresses: List[str]) -> Dict[str, int]:
+        """
+        Get mined transaction counts ('latest' nonces) of many addresses using JSON-RPC batch requests
+        
+        Args:
+            addresses: Ethereum addresses
+        
+        Returns:
+            Dict of address (as passed in) -> transaction count. Failed lookups are left out.
+        """
+        unique = list(dict.fromkeys(addresses))
+        
+        async def fetch_chunk(chunk: List[str]) -> Dict[str, Any]:
+            calls = [
+                ('eth_getTransactionCount', [self.w3.to_checksum_address(address), 'latest'])
+                for address in chunk
+            ]
+            return read_batch_results(await self.w3.provider.make_batch_request(calls), chunk)
+        
+        counts = {}
+        for results in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunked(unique))):
+            for address, count_hex in results.items():
+                counts[address] = int(count_hex, 16)
+        return counts
+    
+    def generate_new_wallet(self) -> Dict[str, str]:
+        """
+        Generate a new Ethereum wallet
+        
+        Returns:
+            Dict with address and private_key
+        """
+        account = Account.create()
+        return {
+            'address': account.address,
+            'private_key': account.key.hex()
+        }
+    
+    def is_valid_address(self, address: str) -> bool:
+        """
+        Validate Ethereum address
+        
+        Args:
+            address: Address to validate
+        
+        Returns:
+            True if valid, False otherwise
+        """
+        return self.w3.is_address(address)
+
+
+# Singleton instances for different networks
+_async_blockchain_instances = {}
+_instances_lock = asyncio.Lock()
+
+
+async def get_async_blockchain_service(network: str = 'sepolia') -> AsyncBlockchainService:
+    """
+    Get or create async blockchain service instance for a network
+    
+    Args:
+        network: Network name
+    
+    Returns:
+        Connected AsyncBlockchainService instance
+    """
+    if network in _async_blockchain_instances:
+        return _async_blockchain_instances[network]
+    
+    async with _instances_lock:
+        if network not in _async_blockchain_instances:
+            service = AsyncBlockchainService(network)
+            await service.connect()
+            _async_blockchain_instances[network] = service
+    return _async_blockchain_instances[network]
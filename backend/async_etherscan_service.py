@@ -0,0 +1,277 @@
+"""
+Async Etherscan Service
+Non-blocking, paginated Etherscan client that resumes each address from its
+last synced block, used for deposit history backfills
+"""
+import os
+import asyncio
+import logging
+from typing import List, Dict, Any, AsyncIterator, Optional
+
+from aiohttp import ClientTimeout
+
+from etherscan_service import EtherscanService, get_etherscan_rate_limiter, ETHERSCAN_PAGE_SIZE
+from http_sessions import get_session_registry, HTTP_TIMEOUT
+from receipt_cache import finality_depth
+
+logger = logging.getLogger(__name__)
+
+# Addresses synced at once (all share the API key's rate limit)
+ETHERSCAN_CONCURRENCY = int(os.getenv('ETHERSCAN_CONCURRENCY', '4'))
+
+# Retries of a call Etherscan rejected for exceeding the rate limit
+ETHERSCAN_MAX_RETRIES = 5
+
+# Last block of Etherscan's txlist range
+LATEST_BLOCK = 99999999
+
+
+class EtherscanError(Exception):
+    """Etherscan answered with an error (other than "no transactions")"""
+
+
+def checkpoint_scope(address: str) -> str:
+    """Scan checkpoint scope holding an address's last synced block"""
+    return f"etherscan:{address.lower()}"
+
+
+class AsyncEtherscanService:
+    """
+    Async Etherscan client for one network
+    
+    - Pages through txlist in ascending block order, moving startblock to
+      the last block of each full page, so histories longer than Etherscan's
+      10000-result window are read completely.
+    - Every call waits on the API key's token bucket (shared with the sync
+      client and other tasks), and calls rejected for the rate limit are
+      retried with backoff.
+    - sync_address() resumes from the address's checkpoint, records new
+      deposits as pending through the network's DepositIndexer and moves the
+      checkpoint forward.
+    """
+    
+    def __init__(self, api_key: str, network: str = 'sepolia', page_size: int = ETHERSCAN_PAGE_SIZE):
+        """
+        Initialize async Etherscan client
+        
+        Args:
+            api_key: Etherscan API key
+            network: Network name (sepolia, ethereum, amoy, polygon)
+            page_size: Transactions per page (at most 10000)
+        """
+        self.api_key = api_key
+        self.network = network
+        self.base_url = EtherscanService.BASE_URL
+        self.chain_id = EtherscanService.CHAIN_IDS.get(network, EtherscanService.CHAIN_IDS['sepolia'])
+        self.page_size = max(1, min(page_size, 10000))
+        self.rate_limiter = get_etherscan_rate_limiter(api_key)
+    
+    async def _request(self, params: Dict[str, Any]) -> List[Dict]:
+        """
+        Make one rate-limited API call
+        
+        Returns:
+            Result list ([] when Etherscan finds no transactions)
+        
+        Raises:
+            EtherscanError: On API errors, or if still rate limited after retries
+        """
+        params = dict(params, chainid=self.chain_id, apikey=self.api_key)
+        session = await get_session_registry().async_session(self.base_url)
+        
+        for attempt in range(ETHERSCAN_MAX_RETRIES):
+            await self.rate_limiter.async_acquire()
+            async with session.get(self.base_url, params=params, timeout=ClientTimeout(total=HTTP_TIMEOUT)) as response:
+                data = await response.json(content_type=None)
+            
+            if data.get('status') == '1':
+                return data['result']
+            if data.get('message', '').startswith('No transactions found'):
+                return []
+            
+            error = data.get('result') or data.get('message', 'Unknown error')
+            if 'rate limit' not in str(error).lower():
+                raise EtherscanError(f"Etherscan API error: {error}")
+            
+            # Another process is sharing the key - back off and retry
+            await asyncio.sleep(2 ** attempt * 0.5)
+        
+        raise EtherscanError(f"Etherscan rate limit still exceeded after {ETHERSCAN_MAX_RETRIES} attempts")
+    
+    async def iter_transactions(self, address: str, startblock: int = 0, endblock: int = LATEST_BLOCK) -> AsyncIterator[List[Dict]]:
+        """
+        Page through an address's normal transactions, oldest first
+        
+        Args:
+            address: Address to query
+            startblock: First block
+            endblock: Last block
+        
+        Yields:
+            Pages of raw transactions (each transaction exactly once)
+        """
+        cursor, page = startblock, 1
+        seen = set()
+        
+        while True:
+            rows = await self._request({
+                'module': 'account',
+                'action': 'txlist',
+                'address': address,
+                'startblock': cursor,
+                'endblock': endblock,
+                'page': page,
+                'offset': self.page_size,
+                'sort': 'asc'
+            })
+            
+            new = [tx for tx in rows if tx['hash'] not in seen]
+            seen.update(tx['hash'] for tx in new)
+            if new:
+                yield new
+            
+            if len(rows) < self.page_size:
+                return
+            
+            # Restart at the last block (it may continue on the next page); its
+            # transactions already seen are dropped above. Only that block's
+            # hashes can come back, so only they are kept.
+            last = int(rows[-1]['blockNumber'])
+            boundary = {tx['hash'] for tx in rows if int(tx['blockNumber']) == last}
+            if last > cursor:
+                cursor, page, seen = last, 1, boundary
+            else:
+                page += 1  # One block fills whole pages
+                seen |= boundary
+    
+    async def get_incoming_deposits(self, address: str, startblock: int = 0) -> List[Dict]:
+        """
+        Get successful, non-zero transfers to an address
+        
+        Args:
+            address: Address to query
+            startblock: First block
+        
+        Returns:
+            Parsed deposits (see EtherscanService.parse_transaction), oldest first
+        """
+        deposits = []
+        async for page in self.iter_transactions(address, startblock):
+            for tx in page:
+                if tx.get('to', '').lower() != address.lower() or tx.get('isError') != '0':
+                    continue
+                parsed = EtherscanService.parse_transaction(tx)
+                if parsed['amount'] > 0:
+                    deposits.append(parsed)
+        return deposits
+    
+    async def sync_address(self, address: str, wallet_id: str, full_history: bool = False) -> Dict[str, Any]:
+        """
+        Record deposits to an address since its last sync and move its checkpoint
+        
+        The last finality-depth blocks before the checkpoint are fetched
+        again, so transfers re-mined by a reorg are still picked up.
+        
+        Args:
+            address: Wallet address
+            wallet_id: Wallet ID the deposits belong to
+            full_history: Ignore the checkpoint and start from block 0
+        
+        Returns:
+            Dict with new (deposit count) and last_block
+        """
+        from chain_head import get_head_tracker
+        
+        scope = checkpoint_scope(address)
+        startblock = await asyncio.to_thread(self._start_block, scope, full_history)
+        
+        # Checkpoint at the head read before querying; anything newer is left for the next sync
+        head = await get_head_tracker(self.network).async_block_number()
+        deposits = await self.get_incoming_deposits(address, startblock)
+        
+        # All pages are in - one short database transaction, off the event loop
+        new = await asyncio.to_thread(
+            self._record, scope, [dict(d, wallet_id=wallet_id) for d in deposits if d['block_number'] <= head], head
+        )
+        
+        logger.info(f"📜 Synced {address[:10]}... on {self.network} from block {startblock}: {new} new deposit(s)")
+        return {'new': new, 'last_block': head}
+    
+    def _start_block(self, scope: str, full_history: bool) -> int:
+        """First block to fetch for a checkpoint scope (runs in a worker thread)"""
+        from database import SessionLocal
+        from transaction_scanner import load_checkpoint
+        
+        if full_history:
+            return 0
+        db = SessionLocal()
+        try:
+            checkpoint = load_checkpoint(db, self.network, scope)
+        finally:
+            db.close()
+        return max(0, checkpoint.last_block + 1 - finality_depth(self.network)) if checkpoint else 0
+    
+    def _record(self, scope: str, deposits: List[Dict[str, Any]], head: int) -> int:
+        """
+        Record fetched deposits and move the checkpoint to head in one commit
+        (runs in a worker thread)
+        
+        Returns:
+            Number of new deposits
+        """
+        from database import SessionLocal
+        from deposit_indexer import get_deposit_indexer
+        from transaction_scanner import save_checkpoint
+        
+        db = SessionLocal()
+        try:
+            new = get_deposit_indexer(self.network).record_deposits(db, deposits)
+            save_checkpoint(db, self.network, scope, head)
+            db.commit()
+            return len(new)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    async def sync_wallets(self, wallets: Dict[str, str], full_history: bool = False,
+                           concurrency: int = ETHERSCAN_CONCURRENCY) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Sync several wallets concurrently within the rate limit
+        
+        Args:
+            wallets: Address -> wallet ID
+            full_history: Ignore checkpoints and start from block 0
+            concurrency: Addresses synced at once
+        
+        Returns:
+            Address -> sync_address() result (None if that address failed)
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def sync(address: str, wallet_id: str):
+            async with semaphore:
+                try:
+                    return await self.sync_address(address, wallet_id, full_history)
+                except Exception as e:
+                    logger.error(f"❌ Etherscan sync failed for {address[:10]}...: {e}")
+                    return None
+        
+        results = await asyncio.gather(*(sync(address, wallet_id) for address, wallet_id in wallets.items()))
+        return dict(zip(wallets, results))
+
+
+# Service instances per (network, API key)
+_async_etherscan_services = {}
+
+
+def get_async_etherscan_service(network: str = 'sepolia', api_key: str = None) -> AsyncEtherscanService:
+    """Get or create async Etherscan client for a network (api_key defaults to ETHERSCAN_API_KEY)"""
+    if api_key is None:
+        api_key = os.getenv('ETHERSCAN_API_KEY', '')
+    
+    key = (network, api_key)
+    if key not in _async_etherscan_services:
+        _async_etherscan_services[key] = AsyncEtherscanService(api_key, network)
+    return _async_etherscan_services[key]
@@ -0,0 +1,255 @@
+"""
+Balance Reconciler
+Scheduled job that compares every custodial wallet's on-chain balance with
+the balance its deposit and withdrawal history implies, and reports drift
+"""
+import os
+import time
+import heapq
+import asyncio
+import logging
+from decimal import Decimal
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+from sqlalchemy import func, case, and_, or_
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Wallet, Transaction, TransactionType, TransactionStatus
+from async_blockchain_service import get_async_blockchain_service
+from deposit_worker import DEPOSIT_WORKER_NETWORKS, NATIVE_SCOPE, indexed_block
+from transaction_scanner import TransactionScanner
+
+logger = logging.getLogger(__name__)
+
+# Seconds between runs (0 = disabled), addresses per balance lookup, drift ignored below this amount
+RECONCILE_INTERVAL = float(os.getenv('RECONCILE_INTERVAL', '3600'))
+RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', '1000'))
+RECONCILE_TOLERANCE = Decimal(os.getenv('RECONCILE_TOLERANCE', '0.000001'))
+
+# Largest drifts listed in a report
+RECONCILE_REPORT_LIMIT = 50
+
+
+def expected_balances_query(db: Session, currency_code: str, network: str, block: Optional[int] = None):
+    """
+    Wallets of a currency with the on-chain balance their ledger implies
+    
+    One aggregate over the network's on-chain transactions (those with a
+    tx_hash) grouped by wallet_id, outer-joined to the wallets so wallets
+    without history are expected to hold 0:
+    
+    - deposits (pending ones are already mined) add their amount
+    - withdrawals sent or completed subtract amount + fee
+    - failed withdrawals subtract the fee (gas was spent)
+    
+    Fees are the estimate until the transaction monitor resolves the
+    withdrawal and stores what the receipt paid. Internal transfers and the
+    /deposit and /withdraw ledger entries never touch the chain and are
+    left out. With a block, rows mined after it are left out too, so the
+    result is the balance at that block.
+    
+    Args:
+        db: Database session
+        currency_code: Wallet currency (ETH, MATIC)
+        network: Network the transactions were sent on
+        block: Block the balances are compared at (None for all rows)
+    
+    Returns:
+        Query of (wallet_id, address, expected, in_flight) rows, in_flight
+        being the number of withdrawals not yet resolved
+    """
+    fee = func.coalesce(Transaction.fee, 0)
+    is_withdrawal = Transaction.type == TransactionType.WITHDRAWAL
+    in_flight = [TransactionStatus.PENDING, TransactionStatus.PROCESSING]
+    
+    ledger = db.query(
+        Transaction.wallet_id.label('wallet_id'),
+        func.sum(case(
+            (and_(Transaction.type == TransactionType.DEPOSIT,
+                  Transaction.status.in_([TransactionStatus.PENDING, TransactionStatus.COMPLETED])), Transaction.amount),
+            (and_(is_withdrawal, Transaction.status.in_(in_flight + [TransactionStatus.COMPLETED])), -(Transaction.amount + fee)),
+            (and_(is_withdrawal, Transaction.status == TransactionStatus.FAILED), -fee),
+            else_=0
+        )).label('expected'),
+        func.sum(case((and_(is_withdrawal, Transaction.status.in_(in_flight)), 1), else_=0)).label('in_flight')
+    ).filter(
+        Transaction.tx_hash.isnot(None),
+        func.coalesce(Transaction.network, 'sepolia') == network  # Rows from before networks were stored are sepolia
+    )
+    if block is not None:
+        # Withdrawals resolved before their block was stored have none
+        ledger = ledger.filter(or_(Transaction.block_number.is_(None), Transaction.block_number <= block))
+    ledger = ledger.group_by(Transaction.wallet_id).subquery()
+    
+    return db.query(
+        Wallet.id, Wallet.address,
+        func.coalesce(ledger.c.expected, 0),
+        func.coalesce(ledger.c.in_flight, 0)
+    ).outerjoin(ledger, ledger.c.wallet_id == Wallet.id).filter(
+        Wallet.currency_code == currency_code,
+        Wallet.address.isnot(None)
+    )
+
+
+class BalanceReconciler:
+    """
+    Reconciles on-chain balances of all custodial wallets on a schedule
+    
+    Each run reads every wallet's expected balance in one query, fetches
+    on-chain balances in batched RPC requests at the block the deposit
+    indexer has reached (so deposits it hasn't seen yet aren't drift) and
+    diffs them. Withdrawals mined after that block are left out of the
+    expected balance. Wallets with unresolved withdrawals are skipped for that run.
+    It only reports - balances are never changed here.
+    """
+    
+    def __init__(self, networks: List[str] = None, interval: float = RECONCILE_INTERVAL,
+                 batch_size: int = RECONCILE_BATCH_SIZE, tolerance: Decimal = RECONCILE_TOLERANCE):
+        """
+        Initialize reconciler
+        
+        Args:
+            networks: Networks to reconcile (default DEPOSIT_WORKER_NETWORKS)
+            interval: Seconds between runs (0 disables the schedule)
+            batch_size: Addresses per balance lookup
+            tolerance: Smallest difference reported as drift
+        """
+        self.networks = [n for n in (networks or DEPOSIT_WORKER_NETWORKS) if n in TransactionScanner.NETWORKS]
+        self.interval = interval
+        self.batch_size = max(1, batch_size)
+        self.tolerance = tolerance
+        self.running = False
+        self.reports: Dict[str, Dict[str, Any]] = {}
+        self._task = None
+    
+    def start(self):
+        """Start the schedule (call from the running event loop)"""
+        if self.interval <= 0:
+            logger.info("⏸️ Balance reconciliation disabled (RECONCILE_INTERVAL=0)")
+            return
+        self.running = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        logger.info(f"⚖️ Balance reconciliation scheduled every {self.interval:g}s for {', '.join(self.networks)}")
+    
+    async def run(self):
+        """Reconcile every network, then wait for the next run, until stop() is called"""
+        while self.running:
+            for network in self.networks:
+                try:
+                    await self.reconcile(network)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"❌ Balance reconciliation failed on {network}: {e}")
+            await asyncio.sleep(self.interval)
+    
+    def load_expected(self, network: str) -> Tuple[List[tuple], Union[int, str]]:
+        """
+        Read expected balances of a network's wallets and the block to compare at
+        
+        Returns:
+            (wallet_id, address, expected, in_flight) rows up to the block, and
+            the deposit indexer's last block ('latest' if it hasn't run yet)
+        """
+        db = SessionLocal()
+        try:
+            block = indexed_block(db, network, NATIVE_SCOPE)
+            rows = expected_balances_query(db, TransactionScanner.NETWORKS[network]['currency'], network, block).all()
+        finally:
+            db.close()
+        return rows, 'latest' if block is None else block
+    
+    async def reconcile(self, network: str) -> Dict[str, Any]:
+        """
+        Diff expected and on-chain balances of every wallet on a network
+        
+        Args:
+            network: Network name
+        
+        Returns:
+            Report with block, checked / in_flight / unavailable wallet counts,
+            drifted count, total_drift and the largest drifts (wallet_id,
+            address, expected, onchain, drift)
+        """
+        started = time.monotonic()
+        rows, block = await asyncio.to_thread(self.load_expected, network)
+        blockchain = await get_async_blockchain_service(network)
+        
+        checked = in_flight = unavailable = drifted = 0
+        total_drift = Decimal('0')
+        largest: List[tuple] = []
+        
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            balances = await blockchain.get_balances([address for _, address, _, _ in batch], block)
+            
+            for wallet_id, address, expected, pending in batch:
+                if pending:
+                    in_flight += 1
+                    continue
+                if address not in balances:
+                    unavailable += 1
+                    continue
+                checked += 1
+                
+                expected = Decimal(str(expected))
+                drift = balances[address] - expected
+                if abs(drift) < self.tolerance:
+                    continue
+                
+                drifted += 1
+                total_drift += drift
+                item = (abs(drift), wallet_id, address, expected, balances[address], drift)
+                if len(largest) < RECONCILE_REPORT_LIMIT:
+                    heapq.heappush(largest, item)
+                else:
+                    heapq.heappushpop(largest, item)
+        
+        report = {
+            'network': network,
+            'block': block,
+            'wallets': len(rows),
+            'checked': checked,
+            'in_flight': in_flight,
+            'unavailable': unavailable,
+            'drifted': drifted,
+            'total_drift': str(total_drift),
+            'drifts': [
+                {'wallet_id': wallet_id, 'address': address, 'expected': str(expected),
+                 'onchain': str(onchain), 'drift': str(drift)}
+                for _, wallet_id, address, expected, onchain, drift in sorted(largest, reverse=True)
+            ],
+            'duration': round(time.monotonic() - started, 2)
+        }
+        self.reports[network] = report
+        
+        summary = (f"{network} @ {block}: {checked} wallet(s) checked, {drifted} drifted "
+                   f"(total {total_drift}), {in_flight} with withdrawals in flight, {unavailable} unavailable")
+        if drifted:
+            logger.warning(f"⚠️ Balance drift on {summary}")
+            for item in report['drifts'][:10]:
+                logger.warning(f"   {item['address'][:10]}... expected {item['expected']}, on-chain {item['onchain']} ({item['drift']})")
+        else:
+            logger.info(f"⚖️ Balances reconciled on {summary}")
+        return report
+    
+    def stop(self):
+        """Stop the schedule"""
+        self.running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+# Global reconciler instance
+_reconciler = None
+
+
+def get_balance_reconciler() -> BalanceReconciler:
+    """Get or create balance reconciler singleton"""
+    global _reconciler
+    if _reconciler is None:
+        _reconciler = BalanceReconciler()
+    return _reconciler
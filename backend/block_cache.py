@@ -0,0 +1,265 @@
+"""
+Block Cache
+Append-only on-disk store of finalized blocks (the fields deposit scans use),
+so rescans and backfills of history we already hold cost no RPC calls
+"""
+import os
+import json
+import mmap
+import zlib
+import struct
+import threading
+import logging
+from typing import Optional, Dict, Any, List, Iterable
+
+logger = logging.getLogger(__name__)
+
+# Cache directory (empty = disabled) and blocks per segment file
+BLOCK_CACHE_DIR = os.getenv('BLOCK_CACHE_DIR', '')
+BLOCK_CACHE_SEGMENT_BLOCKS = int(os.getenv('BLOCK_CACHE_SEGMENT_BLOCKS', '10000'))
+
+# Index slot per height: offset and length of the record in the data file (length 0 = not cached)
+SLOT = struct.Struct('<QI')
+
+
+def encode_block(block: Dict[str, Any]) -> bytes:
+    """
+    Compress the fields scans need from a raw block (full transactions) and its receipts
+    
+    Args:
+        block: Raw eth_getBlockByNumber result, with fetched receipts under 'receipts'
+    
+    Returns:
+        zlib-compressed record
+    """
+    transactions = block['transactions']
+    receipts = block.get('receipts', {})
+    record = {
+        'n': int(block['number'], 16),
+        'h': block['hash'].lower(),
+        'p': block['parentHash'].lower(),
+        't': int(block['timestamp'], 16),
+        'b': block.get('logsBloom'),
+        'x': [
+            [tx['hash'].lower(), tx['from'].lower(), (tx.get('to') or '').lower(), tx['value'], tx.get('gasPrice')]
+            for tx in transactions
+        ],
+        # Receipts by tx hash: status, gas used, logs (address, topics, data, log index)
+        'r': {
+            tx_hash: [
+                int(r['status'], 16), int(r['gasUsed'], 16),
+                [[log['address'].lower(), log['topics'], log['data'], int(log['logIndex'], 16)] for log in r.get('logs', [])]
+            ]
+            for tx_hash, r in receipts.items()
+        }
+    }
+    return zlib.compress(json.dumps(record, separators=(',', ':')).encode())
+
+
+def decode_block(data: bytes) -> Dict[str, Any]:
+    """
+    Rebuild a raw-style block from a cached record
+    
+    Returns:
+        Block dict with hex fields like eth_getBlockByNumber (full transactions,
+        only the cached fields) and the cached receipts under 'receipts'
+    """
+    record = json.loads(zlib.decompress(data))
+    number, block_hash = hex(record['n']), record['h']
+    
+    receipts = {}
+    for tx_hash, (status, gas_used, logs) in record['r'].items():
+        receipts[tx_hash] = {
+            'transactionHash': tx_hash,
+            'blockNumber': number,
+            'blockHash': block_hash,
+            'status': hex(status),
+            'gasUsed': hex(gas_used),
+            'logs': [
+                {
+                    'address': address, 'topics': topics, 'data': log_data, 'logIndex': hex(log_index),
+                    'transactionHash': tx_hash, 'blockNumber': number, 'blockHash': block_hash
+                }
+                for address, topics, log_data, log_index in logs
+            ]
+        }
+    
+    return {
+        'number': number,
+        'hash': block_hash,
+        'parentHash': record['p'],
+        'timestamp': hex(record['t']),
+        'logsBloom': record['b'],
+        'transactions': [
+            {'hash': tx_hash, 'from': sender, 'to': to or None, 'value': value, 'gasPrice': gas_price}
+            for tx_hash, sender, to, value, gas_price in record['x']
+        ],
+        'receipts': receipts
+    }
+
+
+class BlockCache:
+    """
+    Segmented block store for one network
+    
+    Heights are grouped into segments of segment_blocks. Each segment has a
+    fixed-size index file (one slot per height) and a data file of
+    compressed block records that is only ever appended to; both are
+    memory-mapped for reads. Re-storing a height (e.g. with more receipts)
+    appends a new record and repoints its slot.
+    
+    Only store finalized blocks - cached blocks are never checked for reorgs.
+    """
+    
+    def __init__(self, network: str, directory: str = BLOCK_CACHE_DIR, segment_blocks: int = BLOCK_CACHE_SEGMENT_BLOCKS):
+        """
+        Initialize block cache
+        
+        Args:
+            network: Network name (one directory per network)
+            directory: Root cache directory
+            segment_blocks: Heights per segment file
+        """
+        self.network = network
+        self.directory = os.path.join(directory, network)
+        self.segment_blocks = segment_blocks
+        os.makedirs(self.directory, exist_ok=True)
+        
+        self._segments: Dict[int, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def _paths(self, segment: int):
+        prefix = os.path.join(self.directory, f"{segment * self.segment_blocks:012d}")
+        return prefix + '.idx', prefix + '.dat'
+    
+    def _open(self, segment: int, create: bool = False) -> Optional[Dict[str, Any]]:
+        """Map a segment's index (creating the files if asked); None if it doesn't exist"""
+        if segment in self._segments:
+            return self._segments[segment]
+        
+        idx_path, dat_path = self._paths(segment)
+        if not os.path.exists(idx_path):
+            if not create:
+                return None
+            open(dat_path, 'ab').close()
+            with open(idx_path, 'wb') as f:
+                f.truncate(self.segment_blocks * SLOT.size)
+        
+        with open(idx_path, 'r+b') as f:
+            index = mmap.mmap(f.fileno(), 0)
+        self._segments[segment] = {'index': index, 'data': None, 'data_path': dat_path}
+        return self._segments[segment]
+    
+    def _data(self, seg: Dict[str, Any], end: int) -> Optional[mmap.mmap]:
+        """Data file mapping that covers bytes up to `end` (remapped as the file grows)"""
+        data = seg['data']
+        if data is None or len(data) < end:
+            if os.path.getsize(seg['data_path']) < end:
+                return None
+            if seg['data'] is not None:
+                seg['data'].close()
+            with open(seg['data_path'], 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            seg['data'] = data
+        return data
+    
+    def get(self, number: int) -> Optional[Dict[str, Any]]:
+        """
+        Read a cached block
+        
+        Args:
+            number: Block number
+        
+        Returns:
+            Raw-style block (see decode_block), or None if not cached
+        """
+        segment, slot = divmod(number, self.segment_blocks)
+        with self._lock:
+            seg = self._open(segment)
+            if seg is None:
+                return None
+            offset, length = SLOT.unpack_from(seg['index'], slot * SLOT.size)
+            if not length:
+                return None
+            data = self._data(seg, offset + length)
+            if data is None:
+                return None
+            record = data[offset:offset + length]
+        return decode_block(record)
+    
+    def get_many(self, numbers: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Read cached blocks
+        
+        Returns:
+            Block number -> block, for the heights that are cached
+        """
+        numbers = list(numbers)
+        blocks = {}
+        for n in numbers:
+            block = self.get(n)
+            if block is not None:
+                blocks[n] = block
+        self.hits += len(blocks)
+        self.misses += len(numbers) - len(blocks)
+        return blocks
+    
+    def put(self, block: Dict[str, Any]):
+        """
+        Store a finalized block
+        
+        Args:
+            block: Raw block with full transaction objects and any fetched
+                receipts under 'receipts' (keyed by lowercased tx hash)
+        """
+        number = int(block['number'], 16)
+        record = encode_block(block)
+        segment, slot = divmod(number, self.segment_blocks)
+        
+        with self._lock:
+            seg = self._open(segment, create=True)
+            with open(seg['data_path'], 'ab') as f:
+                offset = f.tell()
+                f.write(record)
+            # Slot last, so readers never see a partly written record
+            SLOT.pack_into(seg['index'], slot * SLOT.size, offset, len(record))
+    
+    def put_many(self, blocks: List[Dict[str, Any]]):
+        """Store several finalized blocks"""
+        for block in blocks:
+            self.put(block)
+    
+    def close(self):
+        """Unmap all segments"""
+        with self._lock:
+            for seg in self._segments.values():
+                seg['index'].close()
+                if seg['data'] is not None:
+                    seg['data'].close()
+            self._segments = {}
+    
+    def stats(self) -> Dict[str, Any]:
+        """Segment count, size on disk and hit counts, for health checks"""
+        files = os.listdir(self.directory)
+        return {
+            'network': self.network,
+            'segments': sum(1 for name in files if name.endswith('.idx')),
+            'bytes': sum(os.path.getsize(os.path.join(self.directory, name)) for name in files if name.endswith('.dat')),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+# Cache instances per network
+_block_caches = {}
+
+
+def get_block_cache(network: str = 'sepolia') -> Optional[BlockCache]:
+    """Get or create the block cache for a network (None when BLOCK_CACHE_DIR isn't set)"""
+    if not BLOCK_CACHE_DIR:
+        return None
+    if network not in _block_caches:
+        _block_caches[network] = BlockCache(network)
+    return _block_caches[network]
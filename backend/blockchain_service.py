@@ -3,8 +3,9 @@ Blockchain Service
 Handles blockchain interactions for Ethereum (Sepolia testnet and mainnet)
 """
 import os
+import threading
 from decimal import Decimal
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Iterable, Union
 from web3 import Web3
 from eth_account import Account
 from dotenv import load_dotenv
@@ -13,39 +14,119 @@ import logging
 # Load environment variables
 load_dotenv()
 
+from rpc_pool import RPCPool, rpc_urls_from_env
+from receipt_cache import get_receipt_cache
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Max JSON-RPC calls packed into one batch request
+# Infura/Alchemy accept larger batches; public RPCs often cap lower
+RPC_BATCH_LIMIT = int(os.getenv('RPC_BATCH_LIMIT', '100'))
+
+
+def chunked(items: List[Any], size: int = RPC_BATCH_LIMIT) -> Iterable[List[Any]]:
+    """Split a list into consecutive chunks of at most `size` items"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def to_block_param(block: Union[int, str]) -> str:
+    """Convert a block number or tag ('latest', 'pending', ...) to a JSON-RPC block param"""
+    return hex(block) if isinstance(block, int) else block
+
+
+def read_batch_results(responses: Any, keys: List[Any]) -> Dict[Any, Any]:
+    """
+    Match raw JSON-RPC batch responses back to their request keys
+    
+    Args:
+        responses: Result of provider.make_batch_request (sorted by request id)
+        keys: Keys in the same order the calls were added to the batch
+    
+    Returns:
+        Dict of key -> raw result. Calls that returned an error are left out.
+    """
+    # A single error object means the node rejected the whole batch
+    if not isinstance(responses, list):
+        error = responses.get('error', responses) if isinstance(responses, dict) else responses
+        raise ConnectionError(f"Batch request rejected: {error}")
+    
+    results = {}
+    for key, response in zip(keys, responses):
+        if 'error' in response:
+            logger.warning(f"Batch call for {key} failed: {response['error']}")
+            continue
+        results[key] = response.get('result')
+    return results
+
+
+def broadcast_error(e: Exception) -> ValueError:
+    """
+    Translate a node error from send_raw_transaction into a user-facing ValueError
+    
+    Args:
+        e: Exception raised while broadcasting
+    
+    Returns:
+        ValueError with a readable message
+    """
+    error_msg = str(e).lower()
+    
+    # Handle specific errors
+    if 'nonce too low' in error_msg:
+        return ValueError(f"⏳ Transaction already pending. Please wait 10-15 seconds before sending another transaction.")
+    elif 'replacement transaction underpriced' in error_msg:
+        return ValueError(f"⛽ Previous transaction still pending. Wait for it to complete or increase gas price.")
+    elif 'insufficient funds' in error_msg or 'balance' in error_msg:
+        return ValueError(f"💰 Insufficient balance: {str(e)}")
+    elif 'gas' in error_msg:
+        return ValueError(f"⛽ Gas error: {str(e)}. Try with a higher gas price.")
+    elif 'nonce' in error_msg:
+        return ValueError(f"📋 Nonce error: {str(e)}. Wait a few seconds and try again.")
+    else:
+        return ValueError(f"❌ Transaction failed: {str(e)}")
+
+
 class BlockchainService:
     """Service for interacting with Ethereum blockchain"""
     
     # Network configurations
     NETWORKS = {
         'sepolia': {
-            'rpc_url': os.getenv('SEPOLIA_RPC_URL', 'https://sepolia.infura.io/v3/YOUR_INFURA_KEY'),
+            # Several endpoints via SEPOLIA_RPC_URLS=url1,url2 (ETH_RPC_URL kept for older .env files)
+            'rpc_urls': rpc_urls_from_env('SEPOLIA', os.getenv('ETH_RPC_URL', 'https://sepolia.infura.io/v3/YOUR_INFURA_KEY')),
             'chain_id': 11155111,
             'explorer': 'https://sepolia.etherscan.io',
-            'name': 'Sepolia Testnet'
+            'name': 'Sepolia Testnet',
+            'block_time': 12,  # seconds
+            'finality_depth': 12  # blocks until a receipt is treated as final
         },
         'ethereum': {
-            'rpc_url': os.getenv('ETHEREUM_RPC_URL', 'https://mainnet.infura.io/v3/YOUR_INFURA_KEY'),
+            'rpc_urls': rpc_urls_from_env('ETHEREUM', 'https://mainnet.infura.io/v3/YOUR_INFURA_KEY'),
             'chain_id': 1,
             'explorer': 'https://etherscan.io',
-            'name': 'Ethereum Mainnet'
+            'name': 'Ethereum Mainnet',
+            'block_time': 12,  # seconds
+            'finality_depth': 12  # blocks
         },
         'amoy': {
-            'rpc_url': os.getenv('AMOY_RPC_URL', 'https://polygon-amoy.infura.io/v3/YOUR_INFURA_KEY'),
+            'rpc_urls': rpc_urls_from_env('AMOY', 'https://polygon-amoy.infura.io/v3/YOUR_INFURA_KEY'),
             'chain_id': 80002,
             'explorer': 'https://amoy.polygonscan.com',
-            'name': 'Polygon Amoy Testnet'
+            'name': 'Polygon Amoy Testnet',
+            'block_time': 2,  # seconds
+            'finality_depth': 64  # blocks
         },
         'polygon': {
-            'rpc_url': os.getenv('POLYGON_RPC_URL', 'https://polygon-mainnet.infura.io/v3/YOUR_INFURA_KEY'),
+            'rpc_urls': rpc_urls_from_env('POLYGON', 'https://polygon-mainnet.infura.io/v3/YOUR_INFURA_KEY'),
             'chain_id': 137,
             'explorer': 'https://polygonscan.com',
-            'name': 'Polygon Mainnet'
+            'name': 'Polygon Mainnet',
+            'block_time': 2,  # seconds
+            'finality_depth': 128  # blocks
         }
     }
     
@@ -62,8 +143,8 @@ class BlockchainService:
         self.network = network
         self.network_config = self.NETWORKS[network]
         
-        # Initialize Web3
-        self.w3 = Web3(Web3.HTTPProvider(self.network_config['rpc_url']))
+        # Initialize Web3 on the network's provider pool (failover across endpoints)
+        self.w3 = Web3(get_rpc_pool(network).provider())
         
         # Note: PoA middleware not needed in newer Web3.py versions
         # The library handles this automatically
@@ -95,6 +176,35 @@ class BlockchainService:
             logger.error(f"Error getting balance for {address}: {e}")
             raise
     
+    def get_balances(self, addresses: List[str], block: Union[int, str] = 'latest') -> Dict[str, Decimal]:
+        """
+        Get ETH balances of many addresses using JSON-RPC batch requests
+        
+        Packs up to RPC_BATCH_LIMIT eth_getBalance calls into each HTTP request.
+        
+        Args:
+            addresses: Ethereum addresses
+            block: Block number or tag to read balances at
+        
+        Returns:
+            Dict of address (as passed in) -> balance in ETH.
+            Addresses whose lookup failed are left out.
+        """
+        unique = list(dict.fromkeys(addresses))
+        block_param = to_block_param(block)
+        balances = {}
+        
+        for chunk in chunked(unique):
+            calls = [
+                ('eth_getBalance', [self.w3.to_checksum_address(address), block_param])
+                for address in chunk
+            ]
+            results = read_batch_results(self.w3.provider.make_batch_request(calls), chunk)
+            for address, balance_hex in results.items():
+                balances[address] = Decimal(str(self.w3.from_wei(int(balance_hex, 16), 'ether')))
+        
+        return balances
+    
     def estimate_gas_fee(self, from_address: str, to_address: str, amount: Decimal) -> Dict[str, Any]:
         """
         Estimate gas fee for a transaction
@@ -249,21 +359,7 @@ class BlockchainService:
                 tx_hash_hex = self.w3.to_hex(tx_hash)
             except Exception as e:
                 logger.error(f"Failed to broadcast transaction: {e}")
-                error_msg = str(e).lower()
-                
-                # Handle specific errors
-                if 'nonce too low' in error_msg:
-                    raise ValueError(f"⏳ Transaction already pending. Please wait 10-15 seconds before sending another transaction.")
-                elif 'replacement transaction underpriced' in error_msg:
-                    raise ValueError(f"⛽ Previous transaction still pending. Wait for it to complete or increase gas price.")
-                elif 'insufficient funds' in error_msg or 'balance' in error_msg:
-                    raise ValueError(f"💰 Insufficient balance: {str(e)}")
-                elif 'gas' in error_msg:
-                    raise ValueError(f"⛽ Gas error: {str(e)}. Try with a higher gas price.")
-                elif 'nonce' in error_msg:
-                    raise ValueError(f"📋 Nonce error: {str(e)}. Wait a few seconds and try again.")
-                else:
-                    raise ValueError(f"❌ Transaction failed: {str(e)}")
+                raise broadcast_error(e)
             
             logger.info(f"✅ Transaction sent: {tx_hash_hex}")
             
@@ -294,17 +390,36 @@ class BlockchainService:
         Returns:
             Dict with status and confirmation info
         """
+        # Head comes from the shared tracker (imported here: chain_head imports this module)
+        from chain_head import get_head_tracker
+        head = get_head_tracker(self.network)
+        
+        # Finalized receipts never change - answer from the cache without an RPC
+        cached = get_receipt_cache().get(self.network, tx_hash)
+        if cached:
+            return {
+                'status': cached['status'],
+                'block_number': cached['block_number'],
+                'confirmations': head.confirmations(cached['block_number']),
+                'gas_used': cached['gas_used'],
+                'effective_gas_price': cached.get('effective_gas_price'),
+                'tx_hash': tx_hash
+            }
+        
         try:
             # Get transaction receipt
             receipt = self.w3.eth.get_transaction_receipt(tx_hash)
             
             if receipt:
                 status = 'confirmed' if receipt['status'] == 1 else 'failed'
+                confirmations = head.confirmations(receipt['blockNumber'])
+                get_receipt_cache().put(self.network, tx_hash, receipt, confirmations)
                 return {
                     'status': status,
                     'block_number': receipt['blockNumber'],
-                    'confirmations': self.w3.eth.block_number - receipt['blockNumber'],
+                    'confirmations': confirmations,
                     'gas_used': receipt['gasUsed'],
+                    'effective_gas_price': receipt.get('effectiveGasPrice'),
                     'tx_hash': tx_hash
                 }
             else:
@@ -348,6 +463,29 @@ class BlockchainService:
 # Singleton instances for different networks
 _blockchain_instances = {}
 
+# One provider pool per network, shared by every sync and async client
+_rpc_pools = {}
+_rpc_pools_lock = threading.Lock()
+
+
+def get_rpc_pool(network: str = 'sepolia') -> RPCPool:
+    """
+    Get or create the RPC provider pool for a network
+    
+    Args:
+        network: Network name
+    
+    Returns:
+        RPCPool over the network's configured endpoints
+    """
+    if network not in BlockchainService.NETWORKS:
+        raise ValueError(f"Unsupported network: {network}. Supported: {list(BlockchainService.NETWORKS.keys())}")
+    
+    with _rpc_pools_lock:
+        if network not in _rpc_pools:
+            _rpc_pools[network] = RPCPool(network, BlockchainService.NETWORKS[network]['rpc_urls'])
+    return _rpc_pools[network]
+
 
 def get_blockchain_service(network: str = 'sepolia') -> BlockchainService:
     """
@@ -0,0 +1,228 @@
+"""
+Chain Head Tracker
+Keeps the latest block number per network in memory so confirmation counts
+don't cost an eth_blockNumber call on every lookup
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Optional, List, Dict, Any
+from web3 import Web3, AsyncWeb3, WebSocketProvider
+
+from blockchain_service import BlockchainService, get_rpc_pool
+
+logger = logging.getLogger(__name__)
+
+# Networks whose head is tracked from startup (others start on first async use)
+HEAD_TRACKER_NETWORKS = [n.strip() for n in os.getenv('HEAD_TRACKER_NETWORKS', 'sepolia').split(',') if n.strip()]
+
+
+class ChainHeadTracker:
+    """
+    Tracks the chain head for one network
+    
+    A background task subscribes to newHeads when {NETWORK}_WS_URL is set,
+    otherwise it polls eth_blockNumber twice per block time through the
+    network's provider pool. Readers get the cached head; if it is stale
+    (tracker not running or the node unreachable) they fall back to one
+    direct RPC call, which also refreshes the cache.
+    """
+    
+    def __init__(self, network: str):
+        """
+        Initialize head tracker
+        
+        Args:
+            network: Network name (sepolia, ethereum, amoy, polygon)
+        """
+        if network not in BlockchainService.NETWORKS:
+            raise ValueError(f"Unsupported network: {network}. Supported: {list(BlockchainService.NETWORKS.keys())}")
+        
+        self.network = network
+        self.block_time = BlockchainService.NETWORKS[network]['block_time']
+        self.ws_url = os.getenv(f'{network.upper()}_WS_URL')
+        
+        # Poll twice per block; a head older than a few blocks is stale
+        self.poll_interval = max(self.block_time / 2, 1)
+        self.max_age = self.block_time * 3
+        
+        pool = get_rpc_pool(network)
+        self.w3 = Web3(pool.provider())
+        self.async_w3 = AsyncWeb3(pool.async_provider())
+        
+        self.number: Optional[int] = None
+        self.updated_at = 0.0  # time.time() when the head was observed
+        self.block_timestamp: Optional[int] = None  # from newHeads only
+        
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._new_head = asyncio.Event()
+    
+    def publish(self, number: int, block_timestamp: Optional[int] = None):
+        """Record a newly observed head (ignores heads older than the current one)"""
+        if self.number is not None and number < self.number:
+            return
+        changed = number != self.number
+        self.number = number
+        self.updated_at = time.time()
+        if block_timestamp is not None:
+            self.block_timestamp = block_timestamp
+        
+        if changed:
+            self._notify()
+    
+    def _notify(self):
+        """Wake wait_for_new_head() callers (safe from worker threads too)"""
+        event, self._new_head = self._new_head, asyncio.Event()
+        try:
+            asyncio.get_running_loop()
+            event.set()
+        except RuntimeError:
+            # Sync reader in another thread - hand the wake-up to the tracker's loop
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(event.set)
+    
+    @property
+    def is_fresh(self) -> bool:
+        return self.number is not None and time.time() - self.updated_at < self.max_age
+    
+    def block_number(self) -> int:
+        """
+        Get the latest block number (sync callers)
+        
+        Returns:
+            Cached head, or a fresh eth_blockNumber result if the cache is stale
+        """
+        if not self.is_fresh:
+            self.publish(self.w3.eth.block_number)
+        return self.number
+    
+    async def async_block_number(self) -> int:
+        """
+        Get the latest block number (async callers)
+        
+        Starts the background tracker on first use.
+        
+        Returns:
+            Cached head, or a fresh eth_blockNumber result if the cache is stale
+        """
+        self.ensure_started()
+        if not self.is_fresh:
+            self.publish(await self.async_w3.eth.block_number)
+        return self.number
+    
+    def confirmations(self, block_number: int) -> int:
+        """Confirmations of a block at the current head (sync callers)"""
+        return max(0, self.block_number() - block_number)
+    
+    async def async_confirmations(self, block_number: int) -> int:
+        """Confirmations of a block at the current head (async callers)"""
+        return max(0, await self.async_block_number() - block_number)
+    
+    async def wait_for_new_head(self, timeout: Optional[float] = None) -> Optional[int]:
+        """
+        Wait until a newer head is published
+        
+        Args:
+            timeout: Seconds to wait (None waits forever)
+        
+        Returns:
+            New head, or None on timeout
+        """
+        event = self._new_head
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return self.number
+        except asyncio.TimeoutError:
+            return None
+    
+    def ensure_started(self):
+        """Start the background task if it isn't running (must be called inside the event loop)"""
+        if self._task is None or self._task.done():
+            self.is_running = True
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self.run())
+    
+    async def run(self):
+        """Track the head until stop() is called"""
+        logger.info(f"⛓️ Head tracker started for {self.network} ({'newHeads' if self.ws_url else 'polling'})")
+        
+        while self.is_running:
+            if self.ws_url:
+                try:
+                    await self._subscribe()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"⚠️ newHeads subscription for {self.network} dropped ({e}), polling until reconnect")
+                    await self._poll(until=time.time() + 30)
+            else:
+                await self._poll()
+    
+    async def _subscribe(self):
+        """Follow newHeads over websocket"""
+        async with AsyncWeb3(WebSocketProvider(self.ws_url)) as w3:
+            await w3.eth.subscribe('newHeads')
+            async for message in w3.socket.process_subscriptions():
+                if not self.is_running:
+                    return
+                header = message['result']
+                self.publish(header['number'], header.get('timestamp'))
+    
+    async def _poll(self, until: Optional[float] = None):
+        """Poll eth_blockNumber (until a deadline, or while running)"""
+        failing = False
+        while self.is_running and (until is None or time.time() < until):
+            try:
+                self.publish(await self.async_w3.eth.block_number)
+                failing = False
+            except Exception as e:
+                # Log once per outage, not every poll
+                if not failing:
+                    logger.error(f"❌ Head poll failed for {self.network}: {e}")
+                failing = True
+            await asyncio.sleep(self.poll_interval)
+    
+    def stop(self):
+        """Stop the background task"""
+        self.is_running = False
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info(f"🛑 Head tracker stopped for {self.network}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current head and its age, for health checks"""
+        return {
+            'network': self.network,
+            'head': self.number,
+            'age_seconds': round(time.time() - self.updated_at, 1) if self.number is not None else None,
+            'source': 'newHeads' if self.ws_url else 'polling',
+            'running': self.is_running
+        }
+
+
+# Tracker instances per network
+_head_trackers = {}
+
+
+def get_head_tracker(network: str = 'sepolia') -> ChainHeadTracker:
+    """Get or create head tracker for a network"""
+    if network not in _head_trackers:
+        _head_trackers[network] = ChainHeadTracker(network)
+    return _head_trackers[network]
+
+
+def start_head_trackers(networks: List[str] = None):
+    """Start background head tracking (call from the running event loop)"""
+    for network in networks or HEAD_TRACKER_NETWORKS:
+        get_head_tracker(network).ensure_started()
+
+
+def stop_head_trackers():
+    """Stop all running head trackers"""
+    for tracker in _head_trackers.values():
+        if tracker.is_running:
+            tracker.stop()
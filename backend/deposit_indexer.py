@@ -0,0 +1,385 @@
+"""
+Deposit Indexer
+Reorg-aware deposit crediting: deposits seen at the chain tip are held as
+pending until they are a confirmation depth deep, and rolled back if the
+chain reorganizes underneath them
+"""
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Dict, Any, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from models import Transaction, TransactionType, TransactionStatus, Wallet, IndexedBlock, ScanCheckpoint
+from receipt_cache import finality_depth
+from transaction_scanner import TransactionScanner, AddressIndex, ChainReorgError
+
+logger = logging.getLogger(__name__)
+
+# Scanned block hashes kept per network, in multiples of the confirmation depth
+REORG_WINDOW_DEPTHS = 2
+
+# Rollback-and-rescan attempts per index() call before giving up
+MAX_REORG_RETRIES = 3
+
+
+class DepositIndexer:
+    """
+    Indexes native-currency deposits for one network
+    
+    - Scans from the scope's checkpoint and checks that every block builds on
+      the previous one (parent hash), starting from the checkpoint's hash.
+    - Records new deposits as PENDING without touching wallet balances.
+    - Credits a deposit (COMPLETED) once it is finality_depth(network) blocks
+      deep and its block is still canonical.
+    - On a parent-hash mismatch, finds the fork point from the recorded block
+      hashes, cancels deposits above it (debiting any that were already
+      credited), rewinds the network's checkpoints and rescans.
+    """
+    
+    def __init__(self, network: str = 'sepolia', scanner: TransactionScanner = None):
+        """
+        Initialize indexer
+        
+        Args:
+            network: Network name ('sepolia' or 'amoy')
+            scanner: Scanner to use (created for the network if not given)
+        """
+        self.scanner = scanner or TransactionScanner(network=network)
+        self.network = self.scanner.network
+        self.confirmations = finality_depth(self.network)
+        self.window = max(self.confirmations * REORG_WINDOW_DEPTHS, 1)
+    
+    def index(self, db: Session, index: AddressIndex, scope: str) -> Dict[str, Any]:
+        """
+        Scan new blocks, record deposits as pending and credit matured ones
+        
+        Changes are added to the session but not committed.
+        
+        Args:
+            db: Database session
+            index: Addresses to match
+            scope: Checkpoint scope (wallet ID, or a name for multi-wallet scans)
+        
+        Returns:
+            Dict with new (pending deposit transactions), confirmed and
+            rolled_back (transactions) and last_block
+        """
+        rolled_back = []
+        for attempt in range(MAX_REORG_RETRIES):
+            try:
+                result = self.scanner.scan_from_checkpoint(db, index, scope, keep_hashes=self.window)
+                break
+            except ChainReorgError as e:
+                logger.warning(f"🔀 {e}")
+                fork_point = self.find_fork_point(db, e.block_number - 1)
+                rolled_back.extend(self.rollback(db, fork_point))
+        else:
+            raise ChainReorgError(self.network, fork_point + 1, 'stable chain', 'still reorganizing')
+        
+        new = self.record_deposits(db, result['deposits'])
+        self.record_blocks(db, result['blocks'])
+        
+        wallet_ids = {wallet_id for wallet_id in (index.wallet_id(a) for a in index.addresses) if wallet_id}
+        confirmed = self.confirm_deposits(db, wallet_ids)
+        
+        return {
+            'new': new,
+            'confirmed': confirmed,
+            'rolled_back': rolled_back,
+            'last_block': result['last_block']
+        }
+    
+    def index_tokens(self, db: Session, indexes: Dict[str, AddressIndex], scope: str) -> Dict[str, Any]:
+        """
+        Scan ERC-20 Transfer logs for token deposits, record them as pending and credit matured ones
+        
+        The last confirmation-depth blocks before the checkpoint are scanned
+        again each time, so transfers re-mined by a reorg are picked up;
+        orphaned ones are cancelled when confirm_deposits() checks their block.
+        Changes are added to the session but not committed.
+        
+        Args:
+            db: Database session
+            indexes: Token symbol -> addresses of that token's wallets
+            scope: Checkpoint scope (wallet ID, or a name for multi-wallet scans)
+        
+        Returns:
+            Dict with new, confirmed, rolled_back (always empty here) and last_block
+        """
+        from token_indexer import get_token_indexer
+        
+        result = get_token_indexer(self.network).scan_from_checkpoint(db, indexes, scope, overlap=self.confirmations)
+        new = self.record_deposits(db, result['deposits'])
+        
+        wallet_ids = set()
+        for index in indexes.values():
+            wallet_ids.update(wallet_id for wallet_id in (index.wallet_id(a) for a in index.addresses) if wallet_id)
+        confirmed = self.confirm_deposits(db, wallet_ids)
+        
+        return {
+            'new': new,
+            'confirmed': confirmed,
+            'rolled_back': [],
+            'last_block': result['last_block']
+        }
+    
+    def record_deposits(self, db: Session, deposits: List[Dict[str, Any]]) -> List[Transaction]:
+        """
+        Add PENDING deposit transactions for deposits not already recorded
+        
+        Args:
+            db: Database session
+            deposits: Deposit dicts (wallet_id, tx_hash, amount, from_address,
+                block_number, block_hash, and currency and log_index for token deposits)
+        
+        Returns:
+            New Transaction rows (not committed)
+        """
+        if not deposits:
+            return []
+        
+        # Deposits cancelled by a reorg don't count - the tx may be re-mined on the new chain.
+        # One tx can pay a wallet several times (token multisends), so each Transfer log is its own deposit.
+        existing = set()
+        legacy = Counter()
+        for wallet_id, tx_hash, log_index in db.query(Transaction.wallet_id, Transaction.tx_hash, Transaction.log_index).filter(
+            Transaction.wallet_id.in_({d['wallet_id'] for d in deposits}),
+            Transaction.tx_hash.in_({d['tx_hash'] for d in deposits}),
+            Transaction.status != TransactionStatus.CANCELLED
+        ):
+            existing.add((wallet_id, tx_hash.lower(), log_index))
+            if log_index is None:
+                legacy[(wallet_id, tx_hash.lower())] += 1
+        
+        native_currency = self.scanner.NETWORKS[self.network]['currency']
+        new = []
+        for deposit in deposits:
+            key = (deposit['wallet_id'], deposit['tx_hash'].lower(), deposit.get('log_index'))
+            if deposit['wallet_id'] is None or key in existing:
+                continue
+            if key[2] is not None and legacy[key[:2]]:
+                # Token deposit recorded before log indexes were stored - it covers one log
+                legacy[key[:2]] -= 1
+                continue
+            existing.add(key)
+            currency = deposit.get('currency', native_currency)
+            
+            tx = Transaction(
+                wallet_id=deposit['wallet_id'],
+                type=TransactionType.DEPOSIT,
+                amount=Decimal(str(deposit['amount'])),
+                fee=Decimal('0'),  # No fee for receiving
+                status=TransactionStatus.PENDING,
+                tx_hash=deposit['tx_hash'],
+                network=self.network,
+                block_number=deposit['block_number'],
+                block_hash=deposit['block_hash'].lower() if deposit.get('block_hash') else None,
+                log_index=deposit.get('log_index'),
+                description=f"{currency} deposit from {deposit['from_address'][:10]}..."
+            )
+            db.add(tx)
+            new.append(tx)
+            logger.info(f"⏳ Pending deposit: {deposit['amount']} {currency} (tx: {deposit['tx_hash'][:10]}...)")
+        
+        db.flush()  # Visible to confirm_deposits() in the same session
+        return new
+    
+    def confirm_deposits(self, db: Session, wallet_ids: Optional[Iterable[str]] = None) -> List[Transaction]:
+        """
+        Credit pending deposits that are deep enough and still on the canonical chain
+        
+        Each deposit's block hash is compared with the node's current hash at
+        that height; a mismatch means the block was orphaned and the deposit
+        is cancelled instead.
+        
+        Args:
+            db: Database session
+            wallet_ids: Only these wallets (all wallets if None)
+        
+        Returns:
+            Deposits credited (not committed)
+        """
+        head = self.scanner.head.block_number()
+        query = db.query(Transaction).filter(
+            Transaction.type == TransactionType.DEPOSIT,
+            Transaction.status == TransactionStatus.PENDING,
+            Transaction.network == self.network,
+            Transaction.block_number.isnot(None),
+            Transaction.block_number <= head - self.confirmations
+        )
+        if wallet_ids is not None:
+            query = query.filter(Transaction.wallet_id.in_(set(wallet_ids)))
+        matured = query.all()
+        if not matured:
+            return []
+        
+        canonical = self.scanner.get_block_hashes(sorted({tx.block_number for tx in matured}))
+        existing = {wallet_id for (wallet_id,) in db.query(Wallet.id).filter(Wallet.id.in_({tx.wallet_id for tx in matured}))}
+        
+        confirmed = []
+        deltas = defaultdict(Decimal)
+        for tx in matured:
+            block_hash = canonical.get(tx.block_number)
+            if block_hash is None:
+                continue  # Node didn't answer - try again next time
+            
+            if tx.block_hash and tx.block_hash.lower() != block_hash:
+                deltas[tx.wallet_id] -= self._cancel(tx)
+                continue
+            
+            if tx.wallet_id not in existing:
+                logger.warning(f"⚠️ Deposit {tx.tx_hash[:10]}... belongs to missing wallet {tx.wallet_id}, not credited")
+                continue
+            
+            tx.status = TransactionStatus.COMPLETED
+            tx.completed_at = datetime.utcnow()
+            deltas[tx.wallet_id] += tx.amount
+            confirmed.append(tx)
+            logger.info(f"✅ Deposit confirmed: {tx.amount} (tx: {tx.tx_hash[:10]}..., block {tx.block_number})")
+        
+        self._adjust_balances(db, deltas)
+        return confirmed
+    
+    def record_blocks(self, db: Session, blocks: List[tuple]):
+        """
+        Remember recently scanned block hashes and forget ones outside the window
+        
+        Args:
+            db: Database session
+            blocks: (number, hash, parent_hash) tuples from the scanner
+        """
+        if not blocks:
+            return
+        
+        for number, block_hash, parent_hash in blocks:
+            db.merge(IndexedBlock(network=self.network, number=number, hash=block_hash, parent_hash=parent_hash))
+        
+        db.query(IndexedBlock).filter(
+            IndexedBlock.network == self.network,
+            IndexedBlock.number <= blocks[-1][0] - self.window
+        ).delete(synchronize_session=False)
+    
+    def find_fork_point(self, db: Session, below: int) -> int:
+        """
+        Find the newest recorded block (at or below `below`) that is still canonical
+        
+        Args:
+            db: Database session
+            below: Highest block number to check
+        
+        Returns:
+            Block number to roll back to (everything above it is orphaned)
+        """
+        recorded = db.query(IndexedBlock).filter(
+            IndexedBlock.network == self.network,
+            IndexedBlock.number <= below
+        ).order_by(IndexedBlock.number.desc()).limit(self.window).all()
+        
+        if not recorded:
+            # No history to compare against - fall back a full window
+            logger.warning(f"⚠️ No recorded blocks on {self.network} below {below}, rolling back {self.window} blocks")
+            return max(below - self.window, 0)
+        
+        canonical = self.scanner.get_block_hashes([b.number for b in recorded])
+        for block in recorded:
+            if canonical.get(block.number) == block.hash:
+                return block.number
+        
+        logger.error(f"❌ Reorg on {self.network} deeper than the {self.window}-block window")
+        return recorded[-1].number - 1
+    
+    def rollback(self, db: Session, fork_point: int) -> List[Transaction]:
+        """
+        Undo everything indexed above a fork point
+        
+        Cancels deposits in orphaned blocks (debiting wallets for any already
+        credited), drops recorded block hashes and rewinds every scan
+        checkpoint on the network to the fork point.
+        
+        Args:
+            db: Database session
+            fork_point: Last block that is still canonical
+        
+        Returns:
+            Deposit transactions cancelled (not committed)
+        """
+        orphaned = db.query(Transaction).filter(
+            Transaction.type == TransactionType.DEPOSIT,
+            Transaction.network == self.network,
+            Transaction.block_number > fork_point,
+            Transaction.status.in_([TransactionStatus.PENDING, TransactionStatus.COMPLETED])
+        ).all()
+        
+        deltas = defaultdict(Decimal)
+        for tx in orphaned:
+            deltas[tx.wallet_id] -= self._cancel(tx)
+        self._adjust_balances(db, deltas)
+        
+        fork_block = db.get(IndexedBlock, (self.network, fork_point))
+        db.query(IndexedBlock).filter(
+            IndexedBlock.network == self.network,
+            IndexedBlock.number > fork_point
+        ).delete(synchronize_session=False)
+        
+        checkpoints = db.query(ScanCheckpoint).filter(
+            ScanCheckpoint.network == self.network,
+            ScanCheckpoint.last_block > fork_point
+        ).all()
+        for checkpoint in checkpoints:
+            checkpoint.last_block = fork_point
+            checkpoint.last_block_hash = fork_block.hash if fork_block else None
+        
+        db.flush()  # Cancelled deposits no longer block re-recording re-mined ones
+        logger.warning(
+            f"🔙 Rolled back {self.network} to block {fork_point}: "
+            f"{len(orphaned)} deposit(s) cancelled, {len(checkpoints)} checkpoint(s) rewound"
+        )
+        return orphaned
+    
+    def _cancel(self, tx: Transaction) -> Decimal:
+        """Cancel an orphaned deposit; returns the credit to take back (0 if it was still pending)"""
+        credited = tx.amount if tx.status == TransactionStatus.COMPLETED else Decimal('0')
+        if credited:
+            logger.error(f"❌ Credited deposit {tx.tx_hash[:10]}... orphaned by reorg, debiting {tx.amount}")
+        else:
+            logger.warning(f"🔀 Pending deposit {tx.tx_hash[:10]}... orphaned by reorg")
+        
+        tx.status = TransactionStatus.CANCELLED
+        tx.completed_at = datetime.utcnow()
+        tx.description = f"{tx.description or 'Deposit'} (orphaned by chain reorg)"
+        return credited
+    
+    @staticmethod
+    def _adjust_balances(db: Session, deltas: Dict[str, Decimal]):
+        """
+        Add each delta to its wallet's balance with an UPDATE per wallet
+        
+        balance = balance + delta is computed by the database, so it can't
+        overwrite a debit /send commits concurrently. Missing wallets match
+        no row and are skipped.
+        """
+        for wallet_id, delta in deltas.items():
+            if delta:
+                db.query(Wallet).filter(Wallet.id == wallet_id).update(
+                    {Wallet.balance: Wallet.balance + delta}, synchronize_session=False
+                )
+
+
+# Indexer instances per network
+_deposit_indexers = {}
+
+
+def get_deposit_indexer(network: str = 'sepolia') -> DepositIndexer:
+    """Get or create deposit indexer for a network"""
+    if network not in _deposit_indexers:
+        _deposit_indexers[network] = DepositIndexer(network)
+    return _deposit_indexers[network]
+
+
+def close_deposit_indexers():
+    """Shut down scanner threads of every deposit indexer (call on app shutdown)"""
+    for indexer in _deposit_indexers.values():
+        indexer.scanner.close()
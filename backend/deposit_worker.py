@@ -0,0 +1,228 @@
+"""
+Deposit Worker
+Background service that follows the chain head on each network and indexes
+deposits to every custodial wallet as blocks arrive
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import ScanCheckpoint
+from chain_head import get_head_tracker
+from deposit_indexer import get_deposit_indexer
+from transaction_scanner import AddressIndex, TransactionScanner
+
+logger = logging.getLogger(__name__)
+
+# Networks indexed in the background
+DEPOSIT_WORKER_NETWORKS = [n.strip() for n in os.getenv('DEPOSIT_WORKER_NETWORKS', 'sepolia,amoy').split(',') if n.strip()]
+
+# Checkpoint scopes shared by all wallets (per network)
+NATIVE_SCOPE = 'deposits'
+TOKEN_SCOPE = 'token-deposits'
+
+# ERC-20 wallets are indexed on this network (OnChainReserveTracker.TESTNET_TOKENS are Sepolia contracts)
+TOKEN_NETWORK = 'sepolia'
+
+
+def deposit_scope(currency_code: str) -> str:
+    """Checkpoint scope that covers wallets of a currency"""
+    from proof_of_reserves import OnChainReserveTracker
+    return TOKEN_SCOPE if currency_code in OnChainReserveTracker.TESTNET_TOKENS else NATIVE_SCOPE
+
+
+def indexed_block(db: Session, network: str, scope: str = NATIVE_SCOPE) -> Optional[int]:
+    """
+    Last block the worker has indexed for a scope
+    
+    Read from the checkpoint table, so it is correct whichever process runs the worker.
+    
+    Args:
+        db: Database session
+        network: Network name
+        scope: NATIVE_SCOPE or TOKEN_SCOPE
+    
+    Returns:
+        Block number, or None if nothing has been indexed yet
+    """
+    row = db.query(ScanCheckpoint.last_block).filter(
+        ScanCheckpoint.network == network,
+        ScanCheckpoint.scope == scope
+    ).first()
+    return row[0] if row else None
+
+
+class DepositWorker:
+    """
+    Indexes deposits for all custodial wallets in the background
+    
+    One task per network waits for a new head, then runs the network's
+    DepositIndexer (native and ERC-20 deposits) in a worker thread, so the
+    event loop never blocks on RPC or the database. Deposits are recorded as
+    pending and credited once deep enough, exactly as DepositIndexer does;
+    the API only reads what has been indexed.
+    """
+    
+    def __init__(self, networks: List[str] = None):
+        """
+        Initialize worker
+        
+        Args:
+            networks: Networks to index (default DEPOSIT_WORKER_NETWORKS)
+        """
+        self.networks = [n for n in (networks or DEPOSIT_WORKER_NETWORKS) if n in TransactionScanner.NETWORKS]
+        self.running = False
+        self.generation = 0  # Bumped by start() and stop(): runs from an earlier term are never committed
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._progress = asyncio.Event()
+    
+    def start(self):
+        """Start one indexing task per network (call from the running event loop)"""
+        self.running = True
+        self.generation += 1
+        loop = asyncio.get_running_loop()
+        for network in self.networks:
+            task = self._tasks.get(network)
+            if task is None or task.done():
+                self._tasks[network] = loop.create_task(self.follow(network))
+        logger.info(f"📥 Deposit worker started for {', '.join(self.networks)}")
+    
+    async def follow(self, network: str):
+        """Index a network every time its head moves, until stop() is called"""
+        tracker = get_head_tracker(network)
+        tracker.ensure_started()
+        failing = False
+        
+        while self.running:
+            try:
+                await asyncio.to_thread(self.index_network, network)
+                failing = False
+                self._notify()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Log once per outage, not every block
+                if not failing:
+                    logger.error(f"❌ Deposit indexing failed on {network}: {e}")
+                failing = True
+            
+            # Falls through after a few block times if no head arrives, so stalls retry
+            await tracker.wait_for_new_head(timeout=tracker.max_age)
+    
+    def index_network(self, network: str) -> Dict[str, int]:
+        """
+        Index new blocks for every wallet on a network and commit
+        
+        Args:
+            network: Network name
+        
+        Returns:
+            Counts of new, confirmed and rolled_back deposits
+        """
+        indexer = get_deposit_indexer(network)
+        counts = {'new': 0, 'confirmed': 0, 'rolled_back': 0}
+        generation = self.generation
+        
+        db = SessionLocal()
+        try:
+            native = AddressIndex.from_db(db, currency_code=TransactionScanner.NETWORKS[network]['currency'])
+            if native:
+                result = indexer.index(db, native, scope=NATIVE_SCOPE)
+                for key in counts:
+                    counts[key] += len(result[key])
+            
+            if network == TOKEN_NETWORK:
+                from proof_of_reserves import OnChainReserveTracker
+                tokens = {symbol: AddressIndex.from_db(db, currency_code=symbol) for symbol in OnChainReserveTracker.TESTNET_TOKENS}
+                tokens = {symbol: index for symbol, index in tokens.items() if index}
+                if tokens:
+                    result = indexer.index_tokens(db, tokens, scope=TOKEN_SCOPE)
+                    for key in counts:
+                        counts[key] += len(result[key])
+            
+            # Deposed while indexing (stop() ran, maybe start() again since) - the leader redoes this range
+            if not self.running or self.generation != generation:
+                db.rollback()
+                logger.info(f"🛑 Discarded {network} indexing run after the deposit worker stopped")
+                return {key: 0 for key in counts}
+            
+            # Deposits and checkpoints land together
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        if any(counts.values()):
+            logger.info(
+                f"📊 {network}: {counts['new']} new, {counts['confirmed']} confirmed, "
+                f"{counts['rolled_back']} rolled back deposit(s)"
+            )
+        return counts
+    
+    def _notify(self):
+        """Wake wait_until_indexed() callers"""
+        event, self._progress = self._progress, asyncio.Event()
+        event.set()
+    
+    async def wait_until_indexed(self, db: Session, network: str, block_number: int,
+                                 scope: str = NATIVE_SCOPE, timeout: float = 30) -> bool:
+        """
+        Wait until the worker has indexed a block
+        
+        Wakes on this process's indexing progress and re-reads the checkpoint
+        at least once a second, so it also works when another process runs
+        the worker.
+        
+        Args:
+            db: Database session
+            network: Network name
+            block_number: Block that must be indexed (usually the current head)
+            scope: NATIVE_SCOPE or TOKEN_SCOPE
+            timeout: Seconds to wait at most
+        
+        Returns:
+            True if the block was indexed in time
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            # Checkpoint query runs in a thread - this loop polls for up to `timeout` seconds
+            indexed = await asyncio.to_thread(indexed_block, db, network, scope)
+            if indexed is not None and indexed >= block_number:
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            
+            try:
+                await asyncio.wait_for(self._progress.wait(), min(remaining, 1.0))
+            except asyncio.TimeoutError:
+                pass
+    
+    def stop(self):
+        """Stop all indexing tasks"""
+        self.running = False
+        self.generation += 1
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks = {}
+        logger.info("🛑 Deposit worker stopped")
+
+
+# Global worker instance
+_deposit_worker = None
+
+
+def get_deposit_worker() -> DepositWorker:
+    """Get or create deposit worker singleton"""
+    global _deposit_worker
+    if _deposit_worker is None:
+        _deposit_worker = DepositWorker()
+    return _deposit_worker
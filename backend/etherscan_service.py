@@ -2,7 +2,6 @@
 Etherscan API Service
 Fetches real transaction history from Etherscan for Ethereum addresses
 """
-import requests
 import logging
 from typing import List, Dict, Optional
 from decimal import Decimal
@@ -12,13 +11,34 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from http_sessions import get_session_registry, HTTP_TIMEOUT
+from rate_limit import TokenBucket
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Etherscan API budget per key (free tier: 5 calls/second) and results per page (page x offset is capped at 10000)
+ETHERSCAN_CALLS_PER_SECOND = float(os.getenv('ETHERSCAN_CALLS_PER_SECOND', '5'))
+ETHERSCAN_PAGE_SIZE = int(os.getenv('ETHERSCAN_PAGE_SIZE', '1000'))
+
+
 class EtherscanService:
     """Service to interact with Etherscan API"""
     
+    # V2 API - single unified endpoint for all chains
+    BASE_URL = "https://api.etherscan.io/v2/api"
+    
+    # Chain IDs for different networks
+    CHAIN_IDS = {
+        "mainnet": "1",
+        "ethereum": "1",
+        "sepolia": "11155111",
+        "holesky": "17000",
+        "polygon": "137",
+        "amoy": "80002",
+    }
+    
     def __init__(self, api_key: str, network: str = "sepolia"):
         """
         Initialize Etherscan service
@@ -29,18 +49,14 @@ class EtherscanService:
         """
         self.api_key = api_key
         self.network = network
+        self.base_url = self.BASE_URL
+        self.chain_id = self.CHAIN_IDS.get(network, self.CHAIN_IDS["sepolia"])
         
-        # V2 API - single unified endpoint for all chains
-        self.base_url = "https://api.etherscan.io/v2/api"
+        # Shared keep-alive session instead of a new connection per requests.get
+        self.session = get_session_registry().session(self.base_url)
         
-        # Chain IDs for different networks
-        self.chain_ids = {
-            "mainnet": "1",
-            "sepolia": "11155111",
-            "holesky": "17000",
-        }
-        
-        self.chain_id = self.chain_ids.get(network, self.chain_ids["sepolia"])
+        # Calls per second are budgeted per API key, across every client using it
+        self.rate_limiter = get_etherscan_rate_limiter(api_key)
     
     def get_normal_transactions(self, address: str, startblock: int = 0, endblock: int = 99999999) -> List[Dict]:
         """
@@ -68,7 +84,8 @@ class EtherscanService:
                 "apikey": self.api_key
             }
             
-            response = requests.get(self.base_url, params=params, timeout=10)
+            self.rate_limiter.acquire()
+            response = self.session.get(self.base_url, params=params, timeout=HTTP_TIMEOUT)
             data = response.json()
             
             if data["status"] == "1" and data["message"] == "OK":
@@ -108,7 +125,8 @@ class EtherscanService:
         logger.info(f"💰 Found {len(incoming)} incoming transactions for {address[:10]}...")
         return incoming
     
-    def parse_transaction(self, tx: Dict) -> Dict:
+    @staticmethod
+    def parse_transaction(tx: Dict) -> Dict:
         """
         Parse Etherscan transaction into our format
         
@@ -132,6 +150,7 @@ class EtherscanService:
             'to_address': tx.get('to'),
             'amount': amount_eth,
             'block_number': int(tx.get('blockNumber', '0')),
+            'block_hash': tx.get('blockHash'),
             'timestamp': tx_date,
             'gas_used': int(tx.get('gasUsed', '0')),
             'gas_price': int(tx.get('gasPrice', '0')),
@@ -159,23 +178,28 @@ class EtherscanService:
         return non_zero
 
 
-# Global instance
-_etherscan_service = None
+# Rate limiters per API key, service instances per (network, API key)
+_rate_limiters = {}
+_etherscan_services = {}
+
+
+def get_etherscan_rate_limiter(api_key: str) -> TokenBucket:
+    """Get or create the token bucket shared by all clients of an API key"""
+    if api_key not in _rate_limiters:
+        _rate_limiters[api_key] = TokenBucket(ETHERSCAN_CALLS_PER_SECOND)
+    return _rate_limiters[api_key]
 
 
 def get_etherscan_service(api_key: str = None, network: str = "sepolia") -> EtherscanService:
-    """Get or create Etherscan service singleton"""
-    global _etherscan_service
-    
-    if _etherscan_service is None or api_key is not None:
-        if api_key is None:
-            # Try to get from environment
-            import os
-            api_key = os.getenv('ETHERSCAN_API_KEY', '')
-        
-        _etherscan_service = EtherscanService(api_key, network)
+    """Get or create Etherscan service for a network (api_key defaults to ETHERSCAN_API_KEY)"""
+    if api_key is None:
+        # Try to get from environment
+        api_key = os.getenv('ETHERSCAN_API_KEY', '')
     
-    return _etherscan_service
+    key = (network, api_key)
+    if key not in _etherscan_services:
+        _etherscan_services[key] = EtherscanService(api_key, network)
+    return _etherscan_services[key]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+"""
+Gas Oracle
+Per-network EIP-1559 fee suggestions built from eth_feeHistory,
+refreshed once per new chain head and served to every caller from memory
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional
+from web3 import AsyncWeb3
+
+from chain_head import get_head_tracker
+
+logger = logging.getLogger(__name__)
+
+# Blocks of fee history to sample and how often to refresh
+FEE_HISTORY_BLOCKS = int(os.getenv('GAS_ORACLE_BLOCKS', '20'))
+GAS_ORACLE_TTL = os.getenv('GAS_ORACLE_TTL')  # seconds without a running head tracker, defaults to the network's block time
+
+
+class GasOracle:
+    """
+    Caches base fee and priority-fee percentiles for one network
+    
+    One eth_feeHistory call per refresh gives the next block's base fee and
+    the 10th/50th/90th percentile tips of recent blocks. A snapshot is
+    reused until the network's head tracker sees a new block, so fees follow
+    every block but cost nothing between blocks; without a running tracker
+    the snapshot expires after one block time instead. Concurrent callers
+    share the same refresh. Networks without eth_feeHistory fall back to a
+    legacy gas price.
+    """
+    
+    # Reward percentiles requested from eth_feeHistory, by speed
+    SPEEDS = {'slow': 10, 'standard': 50, 'fast': 90}
+    
+    def __init__(self, network: str, w3: AsyncWeb3, block_time: float = 12):
+        """
+        Initialize gas oracle
+        
+        Args:
+            network: Network name
+            w3: AsyncWeb3 connected to the network
+            block_time: Expected seconds per block (cache lifetime without a head tracker)
+        """
+        self.network = network
+        self.w3 = w3
+        self.ttl = float(GAS_ORACLE_TTL) if GAS_ORACLE_TTL else block_time
+        
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._fetched_head: Optional[int] = None  # Tracked head when the snapshot was taken
+        self._lock = asyncio.Lock()
+    
+    def _tracked_head(self) -> Optional[int]:
+        """Head from the network's running head tracker, None if it isn't tracking"""
+        tracker = get_head_tracker(self.network)
+        return tracker.number if tracker.is_running and tracker.is_fresh else None
+    
+    def _is_fresh(self) -> bool:
+        if self._snapshot is None:
+            return False
+        head = self._tracked_head()
+        if head is not None and self._fetched_head is not None:
+            # Base fee and tips only change with a new block
+            return head <= self._fetched_head
+        return time.monotonic() - self._fetched_at < self.ttl
+    
+    async def _fetch_snapshot(self) -> Dict[str, Any]:
+        """Read fee history (or gas price on legacy networks) from the node"""
+        percentiles = list(self.SPEEDS.values())
+        try:
+            history = await self.w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', percentiles)
+            
+            # Last entry is the base fee of the next (pending) block
+            base_fee = history['baseFeePerGas'][-1]
+            newest_block = history['oldestBlock'] + len(history['gasUsedRatio']) - 1
+            
+            # Median tip per percentile across sampled blocks; skip empty blocks (all-zero rewards)
+            rewards = [r for r in history.get('reward', []) if any(r)]
+            tips = {}
+            for i, speed in enumerate(self.SPEEDS):
+                samples = sorted(r[i] for r in rewards)
+                tips[speed] = samples[len(samples) // 2] if samples else self.w3.to_wei(1, 'gwei')
+            
+            return {
+                'type': 'eip1559',
+                'block_number': newest_block,
+                'base_fee': base_fee,
+                'priority_fees': tips
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ eth_feeHistory unavailable on {self.network} ({e}), using legacy gas price")
+            gas_price = await self.w3.eth.gas_price
+            return {
+                'type': 'legacy',
+                'block_number': None,
+                # Add 20% buffer to avoid "underpriced" errors
+                'gas_price': int(gas_price * 1.2)
+            }
+    
+    async def refresh(self) -> Dict[str, Any]:
+        """Fetch fresh fee data unless another caller just did"""
+        async with self._lock:
+            if not self._is_fresh():
+                head = self._tracked_head()
+                self._snapshot = await self._fetch_snapshot()
+                self._fetched_at = time.monotonic()
+                self._fetched_head = max(head or 0, self._snapshot['block_number'] or 0) or None
+            return self._snapshot
+    
+    async def get_fees(self, speed: str = 'standard') -> Dict[str, Any]:
+        """
+        Get fee suggestion for a transaction
+        
+        Args:
+            speed: 'slow', 'standard' or 'fast'
+        
+        Returns:
+            Dict with type ('eip1559' or 'legacy'), max_fee_per_gas, max_priority_fee_per_gas,
+            base_fee_per_gas and gas_price (expected price per gas actually paid), all in wei
+        """
+        if speed not in self.SPEEDS:
+            raise ValueError(f"Unknown speed: {speed}. Supported: {list(self.SPEEDS.keys())}")
+        
+        snapshot = self._snapshot if self._is_fresh() else await self.refresh()
+        
+        if snapshot['type'] == 'legacy':
+            return {
+                'type': 'legacy',
+                'network': self.network,
+                'speed': speed,
+                'block_number': None,
+                'gas_price': snapshot['gas_price'],
+                'max_fee_per_gas': snapshot['gas_price'],
+                'max_priority_fee_per_gas': None,
+                'base_fee_per_gas': None
+            }
+        
+        base_fee = snapshot['base_fee']
+        priority_fee = snapshot['priority_fees'][speed]
+        return {
+            'type': 'eip1559',
+            'network': self.network,
+            'speed': speed,
+            'block_number': snapshot['block_number'],
+            'gas_price': base_fee + priority_fee,
+            # 2x base fee stays valid through several full blocks of base-fee growth
+            'max_fee_per_gas': 2 * base_fee + priority_fee,
+            'max_priority_fee_per_gas': priority_fee,
+            'base_fee_per_gas': base_fee
+        }
+
+
+# Oracle instances per network
+_gas_oracles = {}
+
+
+def get_gas_oracle(network: str, w3: AsyncWeb3, block_time: float = 12) -> GasOracle:
+    """
+    Get or create gas oracle for a network
+    
+    Args:
+        network: Network name
+        w3: AsyncWeb3 used on first creation
+        block_time: Expected seconds per block
+    
+    Returns:
+        GasOracle instance
+    """
+    if network not in _gas_oracles:
+        _gas_oracles[network] = GasOracle(network, w3, block_time)
+    return _gas_oracles[network]
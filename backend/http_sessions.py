@@ -0,0 +1,160 @@
+"""
+HTTP Session Registry
+One keep-alive HTTP session per endpoint origin, shared by every Web3 provider
+and REST client in the backend so no request pays TCP/TLS setup again
+"""
+import os
+import asyncio
+import threading
+import logging
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from aiohttp import ClientSession, TCPConnector
+from web3._utils.http_session_manager import HTTPSessionManager
+
+logger = logging.getLogger(__name__)
+
+# Tunables (all overridable from .env)
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))                     # Connections kept per origin
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))                       # Seconds per request (REST clients)
+HTTP_KEEPALIVE_SECONDS = float(os.getenv('HTTP_KEEPALIVE_SECONDS', '60'))   # Idle time before a connection is dropped
+
+
+def origin(url: str) -> str:
+    """scheme://host[:port] of a URL - connections are pooled per origin"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class SessionRegistry:
+    """
+    Shared HTTP sessions keyed by origin
+    
+    - requests.Session per origin for sync clients (thread-safe connection pool
+      of HTTP_POOL_SIZE connections)
+    - aiohttp.ClientSession per (event loop, origin) for async clients, with
+      keep-alive instead of web3's default force-close connector
+    """
+    
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, keepalive: float = HTTP_KEEPALIVE_SECONDS):
+        """
+        Initialize registry
+        
+        Args:
+            pool_size: Max pooled connections per origin
+            keepalive: Seconds an idle async connection stays open
+        """
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self._sessions: Dict[str, requests.Session] = {}
+        self._async_sessions: Dict[Tuple[int, str], ClientSession] = {}
+        self._lock = threading.Lock()
+    
+    def session(self, url: str) -> requests.Session:
+        """
+        Get the shared requests session for a URL's origin
+        
+        Args:
+            url: Any URL on the origin
+        
+        Returns:
+            Keep-alive requests.Session
+        """
+        key = origin(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                # No adapter retries - callers (RPC pool, Etherscan client) decide how to retry
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+                logger.debug(f"🔗 HTTP session created for {key}")
+            return session
+    
+    async def async_session(self, url: str) -> ClientSession:
+        """
+        Get the shared aiohttp session for a URL's origin on the running loop
+        
+        Args:
+            url: Any URL on the origin
+        
+        Returns:
+            Keep-alive aiohttp.ClientSession
+        """
+        loop = asyncio.get_running_loop()
+        key = (id(loop), origin(url))
+        session = self._async_sessions.get(key)
+        if session is None or session.closed:
+            self._drop_dead_sessions()
+            session = ClientSession(
+                # Web3 expects HTTP errors to raise; the RPC pool fails over on them
+                raise_for_status=True,
+                connector=TCPConnector(
+                    limit_per_host=self.pool_size,
+                    keepalive_timeout=self.keepalive,
+                    ttl_dns_cache=300
+                )
+            )
+            self._async_sessions[key] = session
+            logger.debug(f"🔗 Async HTTP session created for {key[1]}")
+        return session
+    
+    def _drop_dead_sessions(self):
+        """Forget async sessions that are closed or whose event loop has gone"""
+        for key, session in list(self._async_sessions.items()):
+            if session.closed or session._loop.is_closed():
+                self._async_sessions.pop(key, None)
+    
+    async def close(self):
+        """Close every session (call on shutdown from the running loop)"""
+        loop_id = id(asyncio.get_running_loop())
+        for key, session in list(self._async_sessions.items()):
+            if key[0] == loop_id and not session.closed:
+                await session.close()
+            self._async_sessions.pop(key, None)
+        
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+        logger.info("🔌 HTTP sessions closed")
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            'sync_sessions': len(self._sessions),
+            'async_sessions': len(self._async_sessions)
+        }
+
+
+class RegistrySessionManager(HTTPSessionManager):
+    """
+    web3 session manager that hands out the registry's shared sessions
+    
+    web3's HTTPProvider caches sessions per (thread, endpoint) and creates a
+    new one for every thread that doesn't have one yet, so a session passed
+    to the provider is only used by the constructing thread. This manager
+    binds the registry session for each calling thread instead, so executor
+    threads and asyncio.to_thread calls reuse the same keep-alive connections.
+    """
+    
+    def cache_and_return_session(self, endpoint_uri, session=None, request_timeout=None):
+        if session is None:
+            session = get_session_registry().session(endpoint_uri)
+        return super().cache_and_return_session(endpoint_uri, session, request_timeout)
+
+
+# Global registry instance
+_session_registry = None
+
+
+def get_session_registry() -> SessionRegistry:
+    """Get or create session registry singleton"""
+    global _session_registry
+    if _session_registry is None:
+        _session_registry = SessionRegistry()
+    return _session_registry
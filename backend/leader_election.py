@@ -0,0 +1,210 @@
+"""
+Leader Election
+Picks one process among all API workers to run the background services
+(transaction monitor, deposit worker), using a PostgreSQL advisory lock or,
+for SQLite/local runs, an OS file lock
+"""
+import os
+import asyncio
+import logging
+import tempfile
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock key, lock file for non-PostgreSQL databases, seconds between election attempts
+LEADER_LOCK_ID = int(os.getenv('LEADER_LOCK_ID', '72617'))
+LEADER_LOCK_FILE = os.getenv('LEADER_LOCK_FILE', '')
+LEADER_RETRY_SECONDS = float(os.getenv('LEADER_RETRY_SECONDS', '2'))
+
+
+class AdvisoryLock:
+    """
+    Session-level PostgreSQL advisory lock on a dedicated connection
+    
+    The server releases it as soon as the connection's session ends, so a
+    crashed leader's lock is freed without waiting for a timeout.
+    """
+    
+    def __init__(self, lock_id: int = LEADER_LOCK_ID):
+        self.lock_id = lock_id
+        self._connection = None
+    
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free (never blocks)"""
+        if self._connection is None:
+            self._connection = engine.connect()
+        acquired = self._connection.execute(text("SELECT pg_try_advisory_lock(:id)"), {'id': self.lock_id}).scalar()
+        self._connection.commit()
+        if not acquired:
+            self._drop_connection(discard=False)
+        return bool(acquired)
+    
+    def is_held(self) -> bool:
+        """Check the lock's connection is still alive (the lock goes with it)"""
+        if self._connection is None:
+            return False
+        try:
+            self._connection.execute(text("SELECT 1"))
+            self._connection.commit()
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Lost leader lock connection: {e}")
+            self._drop_connection(discard=True)
+            return False
+    
+    def release(self):
+        """
+        Unlock, then return the connection to the pool
+        
+        Closing a pooled connection doesn't end its database session, so the
+        lock has to be released explicitly; if that fails the connection is
+        discarded instead, which ends the session and the lock with it.
+        """
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute(text("SELECT pg_advisory_unlock(:id)"), {'id': self.lock_id})
+            self._connection.commit()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not unlock leader lock, discarding its connection: {e}")
+            self._drop_connection(discard=True)
+            return
+        self._drop_connection(discard=False)
+    
+    def _drop_connection(self, discard: bool):
+        """Close the lock's connection (discard=True closes it for real instead of pooling it)"""
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            if discard:
+                connection.invalidate()
+            connection.close()
+        except Exception:
+            pass
+
+
+class FileLock:
+    """
+    Exclusive OS lock on a file (stand-in for SQLite and local runs)
+    
+    The OS drops it when the holding process exits, however it exits.
+    Only processes on the same machine can see it.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+    
+    def try_acquire(self) -> bool:
+        """Take the lock if it is free (never blocks)"""
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            try:
+                import fcntl
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except ImportError:
+                import msvcrt  # Windows
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+    
+    def is_held(self) -> bool:
+        """A held file lock can't be lost while the process lives"""
+        return self._fd is not None
+    
+    def release(self):
+        """Release the lock"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def default_lock():
+    """Advisory lock on PostgreSQL; otherwise a file lock next to the SQLite file (or in the temp dir)"""
+    if engine.dialect.name == 'postgresql':
+        return AdvisoryLock()
+    path = LEADER_LOCK_FILE
+    if not path:
+        database = engine.url.database if engine.dialect.name == 'sqlite' else None
+        path = f"{database}.leader.lock" if database and database != ':memory:' else os.path.join(tempfile.gettempdir(), 'dpg-leader.lock')
+    return FileLock(path)
+
+
+class LeaderElector:
+    """
+    Runs callbacks when this process becomes or stops being the leader
+    
+    Followers retry the lock every retry_seconds, so when the leader dies
+    (and its lock is freed) another worker takes over within that time.
+    The leader re-checks its lock at the same pace and steps down if it
+    was lost.
+    """
+    
+    def __init__(self, on_elected: Callable[[], None], on_deposed: Callable[[], None], lock=None,
+                 retry_seconds: float = LEADER_RETRY_SECONDS):
+        """
+        Initialize elector
+        
+        Args:
+            on_elected: Called (in the event loop) when leadership is won
+            on_deposed: Called when leadership is lost or given up
+            lock: AdvisoryLock or FileLock (default_lock() if not given)
+            retry_seconds: Seconds between lock attempts / checks
+        """
+        self.on_elected = on_elected
+        self.on_deposed = on_deposed
+        self.lock = lock or default_lock()
+        self.retry_seconds = retry_seconds
+        self.is_leader = False
+        self.running = False
+    
+    async def run(self):
+        """Campaign for leadership until stop() is called"""
+        self.running = True
+        while self.running:
+            try:
+                if not self.is_leader:
+                    if await asyncio.to_thread(self.lock.try_acquire):
+                        self.is_leader = True
+                        logger.info(f"👑 Elected leader (pid {os.getpid()}) - starting background services")
+                        self.on_elected()
+                elif not await asyncio.to_thread(self.lock.is_held):
+                    self.is_leader = False
+                    logger.warning(f"⚠️ Leadership lost (pid {os.getpid()}) - stopping background services")
+                    self.on_deposed()
+            except Exception as e:
+                logger.error(f"❌ Leader election error: {e}")
+            await asyncio.sleep(self.retry_seconds)
+    
+    def stop(self):
+        """Step down and stop campaigning"""
+        self.running = False
+        if self.is_leader:
+            self.is_leader = False
+            self.on_deposed()
+        self.lock.release()
+
+
+# Global elector instance
+_elector = None
+
+
+def get_leader_elector(on_elected: Callable[[], None] = None, on_deposed: Callable[[], None] = None) -> LeaderElector:
+    """Get or create leader elector singleton (callbacks given here replace the current ones)"""
+    global _elector
+    if _elector is None:
+        _elector = LeaderElector(on_elected, on_deposed)
+    elif on_elected is not None:
+        _elector.on_elected, _elector.on_deposed = on_elected, on_deposed
+    return _elector
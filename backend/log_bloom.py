@@ -0,0 +1,74 @@
+"""
+Logs Bloom Filter
+Tests a block header's 2048-bit logsBloom for contract addresses and topics,
+so scans can skip blocks that cannot contain a matching log
+"""
+from typing import Iterable, List
+
+from web3 import Web3
+
+
+def bloom_mask(item: bytes) -> int:
+    """
+    Bits an item sets in a logsBloom (yellow paper M3:2048)
+    
+    Args:
+        item: Raw bytes of a log address (20 bytes) or topic (32 bytes)
+    
+    Returns:
+        Mask with the item's three bits set
+    """
+    digest = Web3.keccak(item)
+    mask = 0
+    for i in (0, 2, 4):
+        mask |= 1 << (((digest[i] << 8) | digest[i + 1]) & 2047)
+    return mask
+
+
+def hex_bytes(value: str) -> bytes:
+    return bytes.fromhex(value[2:] if value.startswith('0x') else value)
+
+
+class BloomQuery:
+    """
+    "Any of these contracts AND this event AND any of these recipients"
+    
+    A False answer is certain (the block has no such log); True only means
+    the block may have one, since bloom filters give false positives.
+    """
+    
+    def __init__(self, addresses: Iterable[str], topic: str, recipient_topics: Iterable[str] = ()):
+        """
+        Initialize query
+        
+        Args:
+            addresses: Log-emitting contract addresses (any may match)
+            topic: Event signature topic (must match)
+            recipient_topics: Indexed topics, e.g. padded recipient addresses (any may match; empty = no constraint)
+        """
+        self.address_masks: List[int] = [bloom_mask(hex_bytes(a)) for a in addresses]
+        self.topic_mask = bloom_mask(hex_bytes(topic))
+        self.recipient_masks: List[int] = [bloom_mask(hex_bytes(t)) for t in recipient_topics]
+    
+    @staticmethod
+    def _has(bloom: int, mask: int) -> bool:
+        return bloom & mask == mask
+    
+    def matches(self, logs_bloom: str) -> bool:
+        """
+        Check a block's logsBloom
+        
+        Args:
+            logs_bloom: Hex logsBloom from the block header
+        
+        Returns:
+            True if the block may contain a matching log
+        """
+        bloom = int(logs_bloom, 16)
+        if not bloom:
+            return False
+        if not self._has(bloom, self.topic_mask):
+            return False
+        if not any(self._has(bloom, mask) for mask in self.address_masks):
+            return False
+        return not self.recipient_masks or any(self._has(bloom, mask) for mask in self.recipient_masks)
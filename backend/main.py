@@ -14,6 +14,13 @@ from wallet_routes import router as wallet_router
 from transaction_routes import router as transaction_router
 from reserves_routes import router as reserves_router
 from transaction_monitor import get_transaction_monitor
+from deposit_worker import get_deposit_worker
+from balance_reconciler import get_balance_reconciler
+from chain_head import start_head_trackers, stop_head_trackers
+from deposit_indexer import close_deposit_indexers
+from token_indexer import close_token_indexers
+from leader_election import get_leader_elector
+from http_sessions import get_session_registry
 
 # Create database tables
 print("🔧 Initializing database tables...")
@@ -51,23 +58,67 @@ app.include_router(transaction_router)
 app.include_router(reserves_router)
 
 
-# Startup event - Start transaction monitor
+# Monitor loop of this worker while it is the leader
+_monitor_task = None
+
+
+def start_leader_services():
+    """Start the services only one worker may run (called when elected)"""
+    global _monitor_task
+    # Start transaction monitor in background
+    _monitor_task = asyncio.create_task(get_transaction_monitor().start())
+    print("✅ Transaction monitor started - will check due pending transactions at each new block")
+    
+    # Index deposits to all custodial wallets as new blocks arrive
+    get_deposit_worker().start()
+    print("✅ Deposit worker started - indexing deposits at each new block")
+    
+    # Compare on-chain balances with the ledger and report drift
+    get_balance_reconciler().start()
+
+
+def stop_leader_services():
+    """Stop the leader-only services (called when leadership is lost or on shutdown)"""
+    global _monitor_task
+    get_transaction_monitor().stop()
+    if _monitor_task is not None:
+        _monitor_task.cancel()
+        _monitor_task = None
+    print("🛑 Transaction monitor stopped")
+    
+    get_deposit_worker().stop()
+    get_balance_reconciler().stop()
+
+
+# Startup event - Start background services
 @app.on_event("startup")
 async def startup_event():
     """Start background services on app startup"""
-    # Start transaction monitor in background
-    monitor = get_transaction_monitor()
-    asyncio.create_task(monitor.start())
-    print("✅ Transaction monitor started - will check pending transactions every 10 seconds")
+    # Track chain heads so confirmation counts are served from memory
+    start_head_trackers()
+    print("✅ Chain head trackers started")
+    
+    # Monitor and deposit worker run in one worker only; the others take over if it dies
+    elector = get_leader_elector(start_leader_services, stop_leader_services)
+    asyncio.create_task(elector.run())
+    print("✅ Leader election started - monitor and deposit worker run in the elected worker")
 
 
-# Shutdown event - Stop transaction monitor
+# Shutdown event - Stop background services
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop background services on app shutdown"""
-    monitor = get_transaction_monitor()
-    monitor.stop()
-    print("🛑 Transaction monitor stopped")
+    # Steps down (stopping leader services) and frees the lock for the next worker
+    get_leader_elector().stop()
+    
+    stop_head_trackers()
+    
+    # Scanner fetch threads live as long as their scanners
+    close_deposit_indexers()
+    close_token_indexers()
+    
+    # Close pooled keep-alive connections
+    await get_session_registry().close()
 
 
 @app.get("/")
@@ -87,6 +138,7 @@ async def health_check():
     return {
         "status": "healthy",
         "service": "dpg-api",
+        "leader": get_leader_elector().is_leader,  # Runs monitor and deposit worker
         "timestamp": datetime.utcnow().isoformat()
     }
 
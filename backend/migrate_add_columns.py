@@ -0,0 +1,99 @@
+"""
+Database Migration: Add columns introduced after a table was first created
+Idempotent - each (table, column, DDL) entry is only applied if the column is missing.
+New tables need no entry here: they are created automatically on backend startup.
+"""
+import psycopg2
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Get database URL from environment
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# (table, column, column DDL) - append new columns at the end
+COLUMNS = [
+    ('transactions', 'block_number', 'BIGINT'),                 # Incremental deposit scans
+    ('transactions', 'block_hash', 'VARCHAR'),
+    ('transactions', 'log_index', 'INTEGER'),                   # Token transfers credited per log
+    ('finalized_receipts', 'effective_gas_price', 'BIGINT'),    # Fee a receipt actually paid
+]
+
+# (index name, table, column)
+INDEXES = [
+    ('ix_transactions_block_number', 'transactions', 'block_number'),
+]
+
+
+def column_exists(cursor, table: str, column: str) -> bool:
+    """Check information_schema for a column"""
+    cursor.execute("""
+        SELECT column_name
+        FROM information_schema.columns
+        WHERE table_name=%s AND column_name=%s;
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def migrate():
+    """Add every missing column in COLUMNS, then create INDEXES"""
+    print("=" * 70)
+    print("🔧 Database Migration: Add missing columns")
+    print("=" * 70)
+    print()
+    
+    try:
+        # Connect to database
+        conn = psycopg2.connect(DATABASE_URL)
+        cursor = conn.cursor()
+        
+        for table, column, column_type in COLUMNS:
+            print(f"📋 Checking if {table}.{column} already exists...")
+            
+            if column_exists(cursor, table, column):
+                print(f"✅ Column '{column}' already exists")
+                continue
+            
+            print(f"➕ Adding '{column}' column to {table} table...")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type};")
+            conn.commit()
+            print("✅ Column added successfully!")
+        
+        for index, table, column in INDEXES:
+            print()
+            print(f"📋 Creating index {index}...")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column});")
+            conn.commit()
+        
+        print()
+        print("🎉 Migration completed successfully!")
+        
+        cursor.close()
+        conn.close()
+        
+        return True
+    
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        return False
+
+
+if __name__ == "__main__":
+    success = migrate()
+    
+    if success:
+        print()
+        print("=" * 70)
+        print("Next Steps:")
+        print("1. ✅ Database migrated")
+        print("2. 🔄 Restart backend: python backend/main.py")
+        print("=" * 70)
+    else:
+        print()
+        print("⚠️  Migration failed. Check error above.")
+    
+    exit(0 if success else 1)
@@ -2,7 +2,7 @@
 Database Models
 Defines all database tables
 """
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, Enum as SQLEnum, ForeignKey, Numeric, BigInteger, Integer, Text
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -112,6 +112,9 @@ class Transaction(Base):
     tx_hash = Column(String, nullable=True)  # Blockchain transaction hash
     reference_id = Column(String, nullable=True)  # External reference
     network = Column(String, nullable=True, default="sepolia")  # Blockchain network
+    block_number = Column(BigInteger, nullable=True, index=True)  # Block the tx was mined in
+    block_hash = Column(String, nullable=True)
+    log_index = Column(Integer, nullable=True)  # Transfer log within the tx (token deposits)
     
     # Metadata
     description = Column(String, nullable=True)
@@ -122,3 +125,96 @@ class Transaction(Base):
     
     def __repr__(self):
         return f"<Transaction {self.type} - {self.amount}>"
+
+class FinalizedReceipt(Base):
+    """Receipt summary of a transaction past the finality depth (never changes)"""
+    __tablename__ = "finalized_receipts"
+    
+    network = Column(String, primary_key=True)
+    tx_hash = Column(String, primary_key=True)
+    
+    # Receipt fields
+    status = Column(String, nullable=False)  # confirmed / failed
+    block_number = Column(BigInteger, nullable=False)
+    block_hash = Column(String, nullable=True)
+    gas_used = Column(BigInteger, nullable=True)
+    effective_gas_price = Column(BigInteger, nullable=True)  # Wei per gas actually paid
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<FinalizedReceipt {self.network} {self.tx_hash}>"
+
+class ScanCheckpoint(Base):
+    """Last block a deposit scan fully processed, per network and scope"""
+    __tablename__ = "scan_checkpoints"
+    
+    network = Column(String, primary_key=True)
+    scope = Column(String, primary_key=True)  # Wallet ID, or a name for multi-wallet scans
+    
+    last_block = Column(BigInteger, nullable=False)
+    last_block_hash = Column(String, nullable=True)
+    
+    # Timestamps
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ScanCheckpoint {self.network}/{self.scope} @ {self.last_block}>"
+
+class IndexedBlock(Base):
+    """Hash of a recently scanned block, kept to find the fork point after a reorg"""
+    __tablename__ = "indexed_blocks"
+    
+    network = Column(String, primary_key=True)
+    number = Column(BigInteger, primary_key=True)
+    
+    hash = Column(String, nullable=False)
+    parent_hash = Column(String, nullable=True)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<IndexedBlock {self.network} #{self.number}>"
+
+class SendQuote(Base):
+    """Prepared blockchain send from /send/quote, usable once until it expires"""
+    __tablename__ = "send_quotes"
+    
+    id = Column(String, primary_key=True, default=generate_uuid)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    wallet_id = Column(String, ForeignKey("wallets.id"), nullable=False)
+    
+    # Send details the quote was prepared for
+    network = Column(String, nullable=False)
+    to_address = Column(String, nullable=False)
+    amount = Column(Numeric(28, 18), nullable=False)
+    
+    # Chain state read when quoting
+    balance = Column(Numeric(28, 18), nullable=False)
+    balance_wei = Column(String, nullable=False)  # Can exceed BIGINT
+    gas_estimate = Column(Text, nullable=False)  # JSON from estimate_gas_fee()
+    
+    # Timestamps
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SendQuote {self.id} - {self.amount}>"
+
+class SenderNonce(Base):
+    """Next nonce of a sending address, shared by every API worker"""
+    __tablename__ = "sender_nonces"
+    
+    network = Column(String, primary_key=True)
+    address = Column(String, primary_key=True)  # Lowercase
+    
+    next_nonce = Column(BigInteger, nullable=False)
+    gaps = Column(Text, nullable=False, default='')  # Comma-separated nonces released below next_nonce
+    
+    # Timestamps
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<SenderNonce {self.network} {self.address} @ {self.next_nonce}>"
@@ -0,0 +1,254 @@
+"""
+Nonce Manager
+Tracks the next nonce per (network, address) in the database so one wallet can pipeline
+many sends, from any API worker, without waiting for each to be mined
+"""
+import asyncio
+import logging
+from typing import Dict, Tuple, Set, Callable, Awaitable, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from database import SessionLocal
+from models import SenderNonce
+from rpc_pool import ALREADY_KNOWN_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+NonceKey = Tuple[str, str]
+
+# Broadcast errors meaning another transaction already holds (or held) the nonce
+NONCE_CONFLICT_MESSAGES = ('nonce', 'replacement transaction underpriced')
+
+
+def is_nonce_conflict(e: Exception) -> bool:
+    """Check whether a broadcast failed because the nonce is taken"""
+    message = str(e).lower()
+    return any(m in message for m in NONCE_CONFLICT_MESSAGES)
+
+
+def is_already_known(e: Exception) -> bool:
+    """Check whether a broadcast failed because the node already has the transaction"""
+    message = str(e).lower()
+    return any(m in message for m in ALREADY_KNOWN_MESSAGES)
+
+
+def _parse_gaps(gaps: str) -> Set[int]:
+    return {int(nonce) for nonce in gaps.split(',') if nonce}
+
+
+def _format_gaps(gaps: Set[int]) -> str:
+    return ','.join(str(nonce) for nonce in sorted(gaps))
+
+
+class NonceManager:
+    """
+    Hands out nonces from the sender_nonces table instead of asking the node before every send
+    
+    - The first send from an address reads its 'pending' transaction count from
+      chain; later sends take the next nonce from the address's row, which is
+      locked while it is read and advanced, so API workers in different
+      processes never hand out the same nonce.
+    - Callers hold lock(network, address) while reserving, signing and broadcasting,
+      so this process's nonces reach the node in order.
+    - A nonce released after the node rejected its transaction becomes a gap
+      and is reused by the next send, so later transactions are not stuck behind it.
+    - resync() re-reads the chain after a nonce conflict; forget() makes the
+      next send do so (after a broadcast whose outcome is unknown).
+    
+    Database work runs in a worker thread.
+    """
+    
+    def __init__(self):
+        self._locks: Dict[NonceKey, asyncio.Lock] = {}
+    
+    @staticmethod
+    def _key(network: str, address: str) -> NonceKey:
+        return (network, address.lower())
+    
+    def lock(self, network: str, address: str) -> asyncio.Lock:
+        """Per-address lock serializing nonce reservation, signing and broadcast in this process"""
+        key = self._key(network, address)
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+    
+    def _locked_row(self, db, key: NonceKey) -> Optional[SenderNonce]:
+        return db.query(SenderNonce).filter(
+            SenderNonce.network == key[0],
+            SenderNonce.address == key[1]
+        ).with_for_update().first()
+    
+    def _next(self, key: NonceKey, initial: Optional[int] = None, consume: bool = True) -> Optional[int]:
+        """
+        Read the next nonce of an address, and with consume take it
+        
+        Args:
+            key: (network, lowercase address)
+            initial: Chain nonce to start from if the address has no row yet
+            consume: Advance the row (reserve) or only read it (prime)
+        
+        Returns:
+            Nonce (lowest gap first), or None if the address has no row and no initial was given
+        """
+        db = SessionLocal()
+        try:
+            row = self._locked_row(db, key)
+            if row is None:
+                if initial is None:
+                    return None
+                row = SenderNonce(network=key[0], address=key[1], next_nonce=initial, gaps='')
+                db.add(row)
+                db.flush()
+            
+            # Fill gaps left by rejected broadcasts first
+            gaps = _parse_gaps(row.gaps)
+            if gaps:
+                nonce = min(gaps)
+                if consume:
+                    row.gaps = _format_gaps(gaps - {nonce})
+                    logger.info(f"📋 Reusing nonce gap {nonce} for {key[1][:10]}...")
+            else:
+                nonce = row.next_nonce
+                if consume:
+                    row.next_nonce = nonce + 1
+            db.commit()
+            return nonce
+        except IntegrityError:
+            # Another worker created the row first - take from it
+            db.rollback()
+            return self._next(key, consume=consume)
+        finally:
+            db.close()
+    
+    def _give_back(self, key: NonceKey, nonce: int):
+        """Roll the counter back, or record a gap below it"""
+        db = SessionLocal()
+        try:
+            row = self._locked_row(db, key)
+            if row is None:
+                return
+            if row.next_nonce == nonce + 1:
+                # Most recent nonce - just roll the counter back
+                row.next_nonce = nonce
+            elif nonce < row.next_nonce:
+                row.gaps = _format_gaps(_parse_gaps(row.gaps) | {nonce})
+            db.commit()
+        finally:
+            db.close()
+    
+    def _set(self, key: NonceKey, next_nonce: Optional[int]):
+        """Overwrite an address's row with a chain nonce (None deletes it)"""
+        db = SessionLocal()
+        try:
+            row = self._locked_row(db, key)
+            if next_nonce is None:
+                if row is not None:
+                    db.delete(row)
+            elif row is None:
+                db.add(SenderNonce(network=key[0], address=key[1], next_nonce=next_nonce, gaps=''))
+            else:
+                row.next_nonce, row.gaps = next_nonce, ''
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            self._set(key, next_nonce)
+        finally:
+            db.close()
+    
+    async def reserve(
+        self,
+        network: str,
+        address: str,
+        fetch_pending_count: Callable[[], Awaitable[int]]
+    ) -> int:
+        """
+        Reserve the next nonce for an address (call while holding lock())
+        
+        Args:
+            network: Network name
+            address: Sender address
+            fetch_pending_count: Coroutine returning the chain's 'pending' tx count,
+                used the first time an address is seen
+        
+        Returns:
+            Nonce to sign with
+        """
+        key = self._key(network, address)
+        nonce = await asyncio.to_thread(self._next, key)
+        if nonce is None:
+            nonce = await asyncio.to_thread(self._next, key, await fetch_pending_count())
+            logger.info(f"📋 Nonce for {address[:10]}... initialized from chain: {nonce}")
+        return nonce
+    
+    async def prime(
+        self,
+        network: str,
+        address: str,
+        fetch_pending_count: Callable[[], Awaitable[int]]
+    ) -> int:
+        """
+        Make sure the address's nonce is stored, without reserving one
+        
+        Lets a quote do the chain lookup up front so the send itself needs no RPC.
+        
+        Returns:
+            The nonce the next reserve() will hand out
+        """
+        key = self._key(network, address)
+        async with self.lock(network, address):
+            nonce = await asyncio.to_thread(self._next, key, None, False)
+            if nonce is None:
+                nonce = await asyncio.to_thread(self._next, key, await fetch_pending_count(), False)
+                logger.info(f"📋 Nonce for {address[:10]}... initialized from chain: {nonce}")
+            return nonce
+    
+    async def release(self, network: str, address: str, nonce: int):
+        """
+        Give back a nonce whose transaction was never accepted by the node
+        
+        Only call this when the node rejected the transaction - after a timeout
+        it may have been broadcast anyway (use forget()).
+        
+        Args:
+            network: Network name
+            address: Sender address
+            nonce: Nonce returned by reserve()
+        """
+        await asyncio.to_thread(self._give_back, self._key(network, address), nonce)
+    
+    async def resync(
+        self,
+        network: str,
+        address: str,
+        fetch_pending_count: Callable[[], Awaitable[int]]
+    ) -> int:
+        """
+        Re-read the next nonce from chain (call while holding lock())
+        
+        Used after nonce conflicts ('nonce too low', 'replacement transaction
+        underpriced'), e.g. when something outside this service sent from the address.
+        
+        Returns:
+            The chain's pending transaction count
+        """
+        chain_nonce = await fetch_pending_count()
+        logger.warning(f"🔄 Nonce resync for {address[:10]}...: chain={chain_nonce}")
+        await asyncio.to_thread(self._set, self._key(network, address), chain_nonce)
+        return chain_nonce
+    
+    async def forget(self, network: str, address: str):
+        """Drop the stored nonce of an address (next send reads from chain again)"""
+        await asyncio.to_thread(self._set, self._key(network, address), None)
+
+
+# Global nonce manager instance
+_nonce_manager = None
+
+
+def get_nonce_manager() -> NonceManager:
+    """Get or create nonce manager singleton"""
+    global _nonce_manager
+    if _nonce_manager is None:
+        _nonce_manager = NonceManager()
+    return _nonce_manager
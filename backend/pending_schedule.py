@@ -0,0 +1,147 @@
+"""
+Pending Transaction Schedule
+Priority queue of pending transactions keyed by next check time, backing off
+as transactions age so old ones don't cost an RPC call every block
+"""
+import os
+import heapq
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Iterable, Tuple, Optional
+
+# Seconds between checks grow with a transaction's age: age x factor, from one block time up to the cap
+PENDING_BACKOFF_FACTOR = float(os.getenv('PENDING_BACKOFF_FACTOR', '0.1'))
+PENDING_MAX_BACKOFF = float(os.getenv('PENDING_MAX_BACKOFF', '600'))
+
+
+class PendingSchedule:
+    """
+    Pending transactions of one network, ordered by when to check them next
+    
+    - New transactions are due immediately.
+    - After a check that leaves a transaction pending, its next check is
+      age x backoff_factor seconds away (at least one block time, at most
+      max_backoff), so a tx sent seconds ago is checked every block and one
+      pending for days every few minutes.
+    - Once a transaction's sender and nonce are known, promote() makes it
+      due as soon as the sender's confirmed nonce passes it (it or a
+      replacement was mined).
+    
+    Entries are dicts: id, tx_hash, created_at, next_check, sender, nonce, passed.
+    """
+    
+    def __init__(self, block_time: float, backoff_factor: float = PENDING_BACKOFF_FACTOR, max_backoff: float = PENDING_MAX_BACKOFF):
+        """
+        Initialize schedule
+        
+        Args:
+            block_time: Network block time in seconds (shortest interval)
+            backoff_factor: Interval as a fraction of the transaction's age
+            max_backoff: Longest interval in seconds
+        """
+        self.block_time = block_time
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max(max_backoff, block_time)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[Tuple[float, str]] = []
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def _push(self, entry: Dict[str, Any], next_check: float):
+        entry['next_check'] = next_check
+        heapq.heappush(self._heap, (next_check, entry['id']))
+    
+    def sync(self, rows: Iterable[Tuple[str, str, Optional[datetime]]], now: float = None):
+        """
+        Match the schedule to the currently pending transactions
+        
+        Args:
+            rows: (id, tx_hash, created_at) of every pending transaction
+            now: Current time.time() (new transactions are due at it)
+        """
+        now = time.time() if now is None else now
+        pending = set()
+        for tx_id, tx_hash, created_at in rows:
+            pending.add(tx_id)
+            if tx_id not in self.entries:
+                entry = {
+                    'id': tx_id,
+                    'tx_hash': tx_hash,
+                    # created_at is stored as naive UTC
+                    'created_at': created_at.replace(tzinfo=timezone.utc).timestamp() if created_at else now,
+                    'sender': None,
+                    'nonce': None,
+                    'passed': False
+                }
+                self.entries[tx_id] = entry
+                self._push(entry, now)
+        
+        # Resolved elsewhere (or by us); their heap items are skipped when popped
+        for tx_id in set(self.entries) - pending:
+            del self.entries[tx_id]
+    
+    def pop_due(self, now: float = None) -> List[Dict[str, Any]]:
+        """
+        Take every entry whose next check time has come
+        
+        Returns:
+            Due entries (reschedule() the ones still pending, remove() the rest)
+        """
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_check, tx_id = heapq.heappop(self._heap)
+            entry = self.entries.get(tx_id)
+            if entry is not None and entry['next_check'] == next_check:
+                entry['next_check'] = None
+                due.append(entry)
+        return due
+    
+    def waiting_senders(self) -> Dict[str, int]:
+        """
+        Senders of scheduled (not due) entries with a known nonce
+        
+        Returns:
+            Sender address -> lowest waiting nonce
+        """
+        senders = {}
+        for entry in self.entries.values():
+            if entry['nonce'] is None or entry['passed'] or entry['next_check'] is None:
+                continue
+            sender = entry['sender']
+            senders[sender] = min(senders.get(sender, entry['nonce']), entry['nonce'])
+        return senders
+    
+    def promote(self, confirmed_nonces: Dict[str, int], now: float = None) -> int:
+        """
+        Make entries due now if their sender's confirmed nonce has passed them
+        
+        Args:
+            confirmed_nonces: Sender address -> confirmed ('latest') transaction count
+        
+        Returns:
+            Number of entries promoted
+        """
+        now = time.time() if now is None else now
+        promoted = 0
+        for entry in self.entries.values():
+            confirmed = confirmed_nonces.get(entry['sender'])
+            if (entry['nonce'] is not None and confirmed is not None and entry['nonce'] < confirmed
+                    and not entry['passed'] and entry['next_check'] is not None and entry['next_check'] > now):
+                # Once only - a replaced tx never gets a receipt and goes back to its backoff
+                entry['passed'] = True
+                self._push(entry, now)
+                promoted += 1
+        return promoted
+    
+    def reschedule(self, entry: Dict[str, Any], now: float = None):
+        """Schedule the next check of a still-pending entry, backing off with its age"""
+        now = time.time() if now is None else now
+        age = max(0.0, now - entry['created_at'])
+        interval = min(max(self.block_time, age * self.backoff_factor), self.max_backoff)
+        self._push(entry, now + interval)
+    
+    def remove(self, entry: Dict[str, Any]):
+        """Drop a resolved entry"""
+        self.entries.pop(entry['id'], None)
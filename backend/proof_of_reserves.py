@@ -16,6 +16,7 @@ from web3 import Web3
 
 from models import User, Wallet, Transaction, TransactionType
 from reserve_config import get_reserve_wallets
+from blockchain_service import chunked, read_batch_results, get_rpc_pool
 
 
 class MerkleTree:
@@ -124,22 +125,77 @@ class OnChainReserveTracker:
         'USDC': '0x94a9D9AC8a22534E3FaCa9F4e7F2E2cf85d5E4C8',  # Sepolia USDC
     }
     
+    # Multicall3 - deployed at the same address on Ethereum, Sepolia, Polygon, Amoy
+    MULTICALL3_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+    
+    # Multicall3 ABI (minimal - aggregate3 + getEthBalance)
+    MULTICALL3_ABI = [
+        {
+            "inputs": [
+                {
+                    "components": [
+                        {"name": "target", "type": "address"},
+                        {"name": "allowFailure", "type": "bool"},
+                        {"name": "callData", "type": "bytes"}
+                    ],
+                    "name": "calls",
+                    "type": "tuple[]"
+                }
+            ],
+            "name": "aggregate3",
+            "outputs": [
+                {
+                    "components": [
+                        {"name": "success", "type": "bool"},
+                        {"name": "returnData", "type": "bytes"}
+                    ],
+                    "name": "returnData",
+                    "type": "tuple[]"
+                }
+            ],
+            "stateMutability": "payable",
+            "type": "function"
+        },
+        {
+            "inputs": [{"name": "addr", "type": "address"}],
+            "name": "getEthBalance",
+            "outputs": [{"name": "balance", "type": "uint256"}],
+            "stateMutability": "view",
+            "type": "function"
+        }
+    ]
+    
+    # Max sub-calls per aggregate3 eth_call (keeps us well under node gas caps)
+    MULTICALL_CHUNK_SIZE = int(os.getenv('MULTICALL_CHUNK_SIZE', '500'))
+    
+    # Token decimals never change - cached per lowercased contract address for the process
+    # lifetime (shared with TokenTransferIndexer)
+    _token_decimals: Dict[str, int] = {}
+    
     def __init__(self):
-        """Initialize Web3 connection using environment variable"""
-        # Get RPC URL from environment (try multiple variable names)
-        rpc_url = (
-            os.getenv('ETH_RPC_URL') or 
-            os.getenv('SEPOLIA_RPC_URL') or
-            'https://sepolia.infura.io/v3/YOUR_INFURA_KEY'
-        )
-        
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
+        """Initialize Web3 connection on the shared Sepolia provider pool"""
+        # Endpoints come from SEPOLIA_RPC_URLS / SEPOLIA_RPC_URL / ETH_RPC_URL
+        pool = get_rpc_pool('sepolia')
+        self.w3 = Web3(pool.provider())
         
         if not self.w3.is_connected():
-            raise ConnectionError(f"Failed to connect to Ethereum RPC: {rpc_url}")
+            raise ConnectionError(f"Failed to connect to Ethereum RPC: {[e.url for e in pool.endpoints]}")
         
         # Load reserve wallets from config
         self.reserve_wallets = get_reserve_wallets()
+        
+        # Build contract objects once instead of per balance lookup
+        self.multicall = self.w3.eth.contract(
+            address=self.w3.to_checksum_address(self.MULTICALL3_ADDRESS),
+            abi=self.MULTICALL3_ABI
+        )
+        self.token_contracts = {
+            token: self.w3.eth.contract(
+                address=self.w3.to_checksum_address(token_address),
+                abi=self.ERC20_ABI
+            )
+            for token, token_address in self.TESTNET_TOKENS.items()
+        }
     
     def get_eth_balance(self, address: str) -> Decimal:
         """
@@ -160,6 +216,32 @@ class OnChainReserveTracker:
             print(f"Error fetching ETH balance for {address}: {e}")
             return Decimal('0')
     
+    def get_eth_balances(self, addresses: List[str]) -> Dict[str, Decimal]:
+        """
+        Get ETH balances for many addresses with batched eth_getBalance calls
+        
+        Args:
+            addresses: Ethereum addresses
+            
+        Returns:
+            Dict of address -> balance in ETH (0 for lookups that failed)
+        """
+        balances = {address: Decimal('0') for address in addresses}
+        
+        for chunk in chunked(list(balances.keys())):
+            try:
+                calls = [
+                    ('eth_getBalance', [self.w3.to_checksum_address(address), 'latest'])
+                    for address in chunk
+                ]
+                results = read_batch_results(self.w3.provider.make_batch_request(calls), chunk)
+                for address, balance_hex in results.items():
+                    balances[address] = Decimal(str(self.w3.from_wei(int(balance_hex, 16), 'ether')))
+            except Exception as e:
+                print(f"Error fetching ETH balances for {len(chunk)} addresses: {e}")
+        
+        return balances
+    
     def get_token_balance(self, address: str, token: str) -> Decimal:
         """
         Get ERC-20 token balance for an address
@@ -172,28 +254,18 @@ class OnChainReserveTracker:
             Token balance as Decimal
         """
         try:
-            if token not in self.TESTNET_TOKENS:
+            if token not in self.token_contracts:
                 print(f"Unknown token: {token}")
                 return Decimal('0')
             
-            token_contract_address = self.TESTNET_TOKENS[token]
+            contract = self.token_contracts[token]
             checksum_address = self.w3.to_checksum_address(address)
-            checksum_token = self.w3.to_checksum_address(token_contract_address)
-            
-            # Create contract instance
-            contract = self.w3.eth.contract(
-                address=checksum_token,
-                abi=self.ERC20_ABI
-            )
             
             # Get balance
             balance_raw = contract.functions.balanceOf(checksum_address).call()
             
-            # Get decimals (most tokens use 6 or 18)
-            try:
-                decimals = contract.functions.decimals().call()
-            except:
-                decimals = 6  # Default for USDT/USDC
+            # Decimals are cached per contract (most tokens use 6 or 18)
+            decimals = self.get_token_decimals([token])[token]
             
             # Convert to human-readable format
             balance = Decimal(balance_raw) / Decimal(10 ** decimals)
@@ -203,6 +275,122 @@ class OnChainReserveTracker:
             print(f"Error fetching {token} balance for {address}: {e}")
             return Decimal('0')
     
+    def _aggregate(self, calls: List[Tuple[str, bool, str]]) -> List[Tuple[bool, bytes]]:
+        """
+        Execute sub-calls through Multicall3 aggregate3
+        
+        Args:
+            calls: List of (target, allowFailure, callData) tuples
+            
+        Returns:
+            List of (success, returnData) tuples in call order
+        """
+        results = []
+        for i in range(0, len(calls), self.MULTICALL_CHUNK_SIZE):
+            chunk = calls[i:i + self.MULTICALL_CHUNK_SIZE]
+            results.extend(self.multicall.functions.aggregate3(chunk).call())
+        return results
+    
+    def get_token_decimals(self, tokens: List[str]) -> Dict[str, int]:
+        """
+        Get decimals for tokens, reading uncached ones in a single Multicall3 call
+        
+        Args:
+            tokens: Token symbols (USDT, USDC)
+            
+        Returns:
+            Dict of token -> decimals (6 if the contract could not be read)
+        """
+        cache = OnChainReserveTracker._token_decimals
+        missing = [
+            token for token in tokens
+            if token in self.token_contracts and self.token_contracts[token].address.lower() not in cache
+        ]
+        
+        if missing:
+            calls = [
+                (self.token_contracts[token].address, True, self.token_contracts[token].encode_abi('decimals'))
+                for token in missing
+            ]
+            try:
+                for token, (success, return_data) in zip(missing, self._aggregate(calls)):
+                    if success and return_data:
+                        cache[self.token_contracts[token].address.lower()] = self.w3.codec.decode(['uint8'], return_data)[0]
+            except Exception as e:
+                print(f"Error fetching token decimals: {e}")
+        
+        # Default for USDT/USDC when decimals() could not be read (not cached, retried next time)
+        return {
+            token: cache.get(self.token_contracts[token].address.lower(), 6)
+            for token in tokens if token in self.token_contracts
+        }
+    
+    def get_reserve_balances(self, currencies: List[str] = None) -> Dict[str, Dict[str, Decimal]]:
+        """
+        Get balances of every reserve wallet for every currency in one Multicall3 eth_call
+        
+        ETH balances use Multicall3.getEthBalance, tokens use balanceOf, so the
+        RPC cost is the same for 1 or 200 reserve wallets. Falls back to
+        per-address lookups if Multicall3 is unavailable.
+        
+        Args:
+            currencies: Currency codes to read (default: all configured)
+            
+        Returns:
+            Dict of currency -> {address: balance}
+        """
+        currencies = currencies or list(self.reserve_wallets.keys())
+        balances = {currency: {} for currency in currencies}
+        
+        keys = []
+        calls = []
+        for currency in currencies:
+            for address in self.reserve_wallets.get(currency, []):
+                # Currencies we can't read on this chain report 0 (same as get_token_balance)
+                balances[currency][address] = Decimal('0')
+                checksum_address = self.w3.to_checksum_address(address)
+                
+                if currency == 'ETH':
+                    call_data = self.multicall.encode_abi('getEthBalance', args=[checksum_address])
+                    calls.append((self.multicall.address, True, call_data))
+                elif currency in self.token_contracts:
+                    contract = self.token_contracts[currency]
+                    call_data = contract.encode_abi('balanceOf', args=[checksum_address])
+                    calls.append((contract.address, True, call_data))
+                else:
+                    continue
+                keys.append((currency, address))
+        
+        if not calls:
+            return balances
+        
+        decimals = self.get_token_decimals([c for c in currencies if c in self.token_contracts])
+        
+        try:
+            results = self._aggregate(calls)
+        except Exception as e:
+            print(f"⚠️ Multicall3 unavailable ({e}), falling back to per-address lookups")
+            for currency in currencies:
+                addresses = self.reserve_wallets.get(currency, [])
+                if currency == 'ETH':
+                    balances[currency].update(self.get_eth_balances(addresses))
+                else:
+                    for address in addresses:
+                        balances[currency][address] = self.get_token_balance(address, currency)
+            return balances
+        
+        for (currency, address), (success, return_data) in zip(keys, results):
+            if not success or not return_data:
+                print(f"Error fetching {currency} balance for {address}: call reverted")
+                continue
+            raw = self.w3.codec.decode(['uint256'], return_data)[0]
+            if currency == 'ETH':
+                balances[currency][address] = Decimal(str(self.w3.from_wei(raw, 'ether')))
+            else:
+                balances[currency][address] = Decimal(raw) / Decimal(10 ** decimals[currency])
+        
+        return balances
+    
     def get_total_reserves(self, currency: str) -> Decimal:
         """
         Get total on-chain reserves for a currency
@@ -216,15 +404,13 @@ class OnChainReserveTracker:
         if currency not in self.reserve_wallets:
             return Decimal('0')
         
+        balances = self.get_reserve_balances([currency])[currency]
+        return self._sum_reserves(currency, balances)
+    
+    def _sum_reserves(self, currency: str, balances: Dict[str, Decimal]) -> Decimal:
+        """Total a currency's reserve wallet balances"""
         total = Decimal('0')
-        addresses = self.reserve_wallets[currency]
-        
-        for address in addresses:
-            if currency == 'ETH':
-                balance = self.get_eth_balance(address)
-            else:
-                balance = self.get_token_balance(address, currency)
-            
+        for address, balance in balances.items():
             total += balance
             print(f"📊 {currency} Reserve Wallet {address}: {balance}")
         
@@ -239,8 +425,11 @@ class OnChainReserveTracker:
         """
         reserves = {}
         
+        # One aggregated eth_call for all wallets and currencies
+        all_balances = self.get_reserve_balances()
+        
         for currency in self.reserve_wallets.keys():
-            total = self.get_total_reserves(currency)
+            total = self._sum_reserves(currency, all_balances[currency])
             reserves[currency] = {
                 'total': str(total),
                 'wallets': self.reserve_wallets[currency],
@@ -250,6 +439,18 @@ class OnChainReserveTracker:
         return reserves
 
 
+# Shared tracker instance (connection and contract objects built once)
+_reserve_tracker = None
+
+
+def get_reserve_tracker() -> OnChainReserveTracker:
+    """Get or create on-chain reserve tracker singleton"""
+    global _reserve_tracker
+    if _reserve_tracker is None:
+        _reserve_tracker = OnChainReserveTracker()
+    return _reserve_tracker
+
+
 class ProofOfReservesService:
     """Service to calculate and verify proof of reserves"""
     
@@ -389,7 +590,7 @@ class ProofOfReservesService:
         
         if include_onchain:
             try:
-                tracker = OnChainReserveTracker()
+                tracker = get_reserve_tracker()
                 onchain_reserves = tracker.verify_all_reserves()
                 
                 # Compare database vs on-chain for crypto currencies
@@ -0,0 +1,72 @@
+"""
+Rate Limiting
+Token bucket used to keep RPC and API clients inside a provider's
+requests-per-second budget
+"""
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+    
+    Holds up to `burst` tokens and refills at `rate` tokens per second.
+    acquire() blocks until enough tokens are available (async_acquire()
+    waits without blocking the event loop). A rate of 0 or less disables
+    limiting.
+    """
+    
+    def __init__(self, rate: float, burst: float = None):
+        """
+        Initialize bucket
+        
+        Args:
+            rate: Tokens added per second (0 = unlimited)
+            burst: Max tokens held (defaults to one second of rate)
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def reserve(self, tokens: float = 1) -> float:
+        """
+        Take tokens now, going into debt if needed
+        
+        Args:
+            tokens: Tokens to take (requests larger than the burst are allowed)
+        
+        Returns:
+            Seconds the caller should wait before using them
+        """
+        if self.unlimited:
+            return 0.0
+        
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+    
+    def acquire(self, tokens: float = 1):
+        """Block until `tokens` fit in the budget"""
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+    
+    async def async_acquire(self, tokens: float = 1):
+        """Wait until `tokens` fit in the budget (async callers)"""
+        wait = self.reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
@@ -0,0 +1,265 @@
+"""
+Receipt Cache
+Bounded LRU of receipts for transactions past the network's finality depth,
+optionally backed by the finalized_receipts table
+"""
+import os
+import asyncio
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Max receipts kept in memory, and whether to persist them to the database
+RECEIPT_CACHE_SIZE = int(os.getenv('RECEIPT_CACHE_SIZE', '10000'))
+RECEIPT_CACHE_PERSIST = os.getenv('RECEIPT_CACHE_PERSIST', 'false').lower() == 'true'
+
+
+def finality_depth(network: str) -> int:
+    """Confirmations after which a receipt is cached ({NETWORK}_FINALITY_DEPTH overrides the network default)"""
+    from blockchain_service import BlockchainService
+    
+    override = os.getenv(f'{network.upper()}_FINALITY_DEPTH')
+    if override:
+        return int(override)
+    return BlockchainService.NETWORKS.get(network, {}).get('finality_depth', 12)
+
+
+def receipt_summary(receipt: Any) -> Dict[str, Any]:
+    """Fields we keep from a web3 receipt"""
+    block_hash = receipt.get('blockHash')
+    return {
+        'status': 'confirmed' if receipt['status'] == 1 else 'failed',
+        'block_number': receipt['blockNumber'],
+        'block_hash': block_hash.to_0x_hex() if hasattr(block_hash, 'to_0x_hex') else block_hash,
+        'gas_used': receipt['gasUsed'],
+        'effective_gas_price': receipt.get('effectiveGasPrice')
+    }
+
+
+class ReceiptCache:
+    """
+    LRU cache of finalized receipt summaries keyed by (network, tx_hash)
+    
+    Only receipts at least finality_depth(network) blocks deep are stored,
+    so a cached entry can never be invalidated by a reorg. With persistence
+    on, memory misses fall back to the database and entries survive restarts;
+    the async_ methods run those queries in a worker thread.
+    """
+    
+    def __init__(self, max_size: int = RECEIPT_CACHE_SIZE, persist: bool = RECEIPT_CACHE_PERSIST):
+        """
+        Initialize receipt cache
+        
+        Args:
+            max_size: Max entries kept in memory
+            persist: Also store entries in the finalized_receipts table
+        """
+        self.max_size = max_size
+        self.persist = persist
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def _key(network: str, tx_hash: str) -> Tuple[str, str]:
+        return (network, tx_hash.lower())
+    
+    def _remember(self, key: Tuple[str, str], summary: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = summary
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def _memory_lookup(self, network: str, tx_hashes: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """Split tx hashes into (tx hash -> summary found in memory, hashes not in memory)"""
+        found, missing = {}, []
+        with self._lock:
+            for tx_hash in tx_hashes:
+                key = self._key(network, tx_hash)
+                summary = self._entries.get(key)
+                if summary is not None:
+                    self._entries.move_to_end(key)
+                    found[tx_hash] = summary
+                else:
+                    missing.append(tx_hash)
+            self.hits += len(found)
+        return found, missing
+    
+    def _remember_loaded(self, network: str, loaded: Dict[str, Dict[str, Any]], looked_up: int):
+        """Keep summaries read from the database in memory and count the lookup"""
+        for tx_hash, summary in loaded.items():
+            self._remember(self._key(network, tx_hash), summary)
+        self.hits += len(loaded)
+        self.misses += looked_up - len(loaded)
+    
+    def get_many(self, network: str, tx_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Look up finalized receipts
+        
+        Memory misses are read from the database in one query when
+        persistence is on.
+        
+        Args:
+            network: Network name
+            tx_hashes: Transaction hashes
+        
+        Returns:
+            Dict of tx hash (as passed in) -> receipt summary (status,
+            block_number, block_hash, gas_used, effective_gas_price) for the
+            cached ones only
+        """
+        found, missing = self._memory_lookup(network, tx_hashes)
+        loaded = self._load_many(network, missing) if self.persist and missing else {}
+        self._remember_loaded(network, loaded, len(missing))
+        found.update(loaded)
+        return found
+    
+    async def async_get_many(self, network: str, tx_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """get_many() for the event loop - the database query runs in a worker thread"""
+        found, missing = self._memory_lookup(network, tx_hashes)
+        loaded = await asyncio.to_thread(self._load_many, network, missing) if self.persist and missing else {}
+        self._remember_loaded(network, loaded, len(missing))
+        found.update(loaded)
+        return found
+    
+    def get(self, network: str, tx_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a finalized receipt
+        
+        Args:
+            network: Network name
+            tx_hash: Transaction hash
+        
+        Returns:
+            Receipt summary (see get_many()) or None
+        """
+        return self.get_many(network, [tx_hash]).get(tx_hash)
+    
+    def _finalized(self, network: str, receipts: List[Tuple[str, Any, int]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Keep the receipts past the finality depth in memory; returns their summaries by key"""
+        depth = finality_depth(network)
+        summaries = {}
+        for tx_hash, receipt, confirmations in receipts:
+            if confirmations >= depth:
+                key = self._key(network, tx_hash)
+                summaries[key] = receipt_summary(receipt)
+                self._remember(key, summaries[key])
+        return summaries
+    
+    def put_many(self, network: str, receipts: List[Tuple[str, Any, int]]) -> int:
+        """
+        Cache the receipts that are past the finality depth
+        
+        With persistence on, they are written to the database in one commit.
+        
+        Args:
+            network: Network name
+            receipts: (tx_hash, web3 receipt, confirmations at the current head) tuples
+        
+        Returns:
+            Number of receipts cached
+        """
+        summaries = self._finalized(network, receipts)
+        if self.persist and summaries:
+            self._store_many(summaries)
+        return len(summaries)
+    
+    async def async_put_many(self, network: str, receipts: List[Tuple[str, Any, int]]) -> int:
+        """put_many() for the event loop - the database write runs in a worker thread"""
+        summaries = self._finalized(network, receipts)
+        if self.persist and summaries:
+            await asyncio.to_thread(self._store_many, summaries)
+        return len(summaries)
+    
+    def put(self, network: str, tx_hash: str, receipt: Any, confirmations: int) -> bool:
+        """
+        Cache a receipt if it is past the finality depth
+        
+        Args:
+            network: Network name
+            tx_hash: Transaction hash
+            receipt: web3 receipt
+            confirmations: Confirmations at the current head
+        
+        Returns:
+            True if the receipt was cached
+        """
+        return self.put_many(network, [(tx_hash, receipt, confirmations)]) == 1
+    
+    def _load_many(self, network: str, tx_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Read finalized receipts from the database with one IN query"""
+        from database import SessionLocal
+        from models import FinalizedReceipt
+        
+        by_key = {tx_hash.lower(): tx_hash for tx_hash in tx_hashes}
+        db = SessionLocal()
+        try:
+            rows = db.query(FinalizedReceipt).filter(
+                FinalizedReceipt.network == network,
+                FinalizedReceipt.tx_hash.in_(list(by_key))
+            ).all()
+            return {
+                by_key[row.tx_hash]: {
+                    'status': row.status,
+                    'block_number': row.block_number,
+                    'block_hash': row.block_hash,
+                    'gas_used': row.gas_used,
+                    'effective_gas_price': row.effective_gas_price
+                }
+                for row in rows
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ Receipt cache DB read failed: {e}")
+            return {}
+        finally:
+            db.close()
+    
+    def _store_many(self, summaries: Dict[Tuple[str, str], Dict[str, Any]]):
+        """Write finalized receipts to the database in one commit (skips rows already stored)"""
+        from database import SessionLocal
+        from models import FinalizedReceipt
+        
+        db = SessionLocal()
+        try:
+            networks = {network for network, _ in summaries}
+            stored = set(db.query(FinalizedReceipt.network, FinalizedReceipt.tx_hash).filter(
+                FinalizedReceipt.network.in_(networks),
+                FinalizedReceipt.tx_hash.in_([tx_hash for _, tx_hash in summaries])
+            ).all())
+            db.add_all([
+                FinalizedReceipt(network=key[0], tx_hash=key[1], **summary)
+                for key, summary in summaries.items() if key not in stored
+            ])
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Receipt cache DB write failed: {e}")
+        finally:
+            db.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit counts"""
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'persist': self.persist
+        }
+
+
+# Global receipt cache instance
+_receipt_cache = None
+
+
+def get_receipt_cache() -> ReceiptCache:
+    """Get or create receipt cache singleton"""
+    global _receipt_cache
+    if _receipt_cache is None:
+        _receipt_cache = ReceiptCache()
+    return _receipt_cache
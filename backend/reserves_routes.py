@@ -2,6 +2,7 @@
 Proof of Reserves Routes
 Public endpoints for transparency and auditing
 """
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import Dict
@@ -43,8 +44,10 @@ async def get_proof_of_reserves_report(
     5. On-chain verification that reserve wallets match database
     """
     try:
-        report = ProofOfReservesService.get_proof_of_reserves_report(
-            db, 
+        # The on-chain part makes blocking RPC calls - run the report in a thread
+        report = await asyncio.to_thread(
+            ProofOfReservesService.get_proof_of_reserves_report,
+            db,
             include_onchain=include_onchain
         )
         return report
@@ -136,10 +139,11 @@ async def get_onchain_verification(db: Session = Depends(get_db)):
     on Etherscan/Polygonscan and confirm the platform holds what it claims.
     """
     try:
-        from proof_of_reserves import OnChainReserveTracker
+        from proof_of_reserves import get_reserve_tracker
         
-        tracker = OnChainReserveTracker()
-        onchain_reserves = tracker.verify_all_reserves()
+        tracker = get_reserve_tracker()
+        # One blocking RPC balance call per reserve wallet - run it off the event loop
+        onchain_reserves = await asyncio.to_thread(tracker.verify_all_reserves)
         
         # Get database reserves for comparison
         db_reserves = ProofOfReservesService.calculate_total_reserves(db)
@@ -0,0 +1,458 @@
+"""
+RPC Provider Pool
+Routes JSON-RPC traffic for a network across several endpoints (Infura, Alchemy, public RPCs)
+with latency-weighted routing, automatic failover, per-endpoint circuit breakers
+and per-endpoint concurrency caps
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+import logging
+from contextlib import contextmanager, asynccontextmanager
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+
+from aiohttp import ClientTimeout
+from web3 import Web3, AsyncWeb3
+from web3.providers.base import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from http_sessions import get_session_registry, RegistrySessionManager
+
+logger = logging.getLogger(__name__)
+
+# Tunables (all overridable from .env)
+RPC_TIMEOUT = float(os.getenv('RPC_TIMEOUT', '10'))                        # Seconds per HTTP request
+RPC_MAX_CONCURRENCY = int(os.getenv('RPC_MAX_CONCURRENCY', '20'))          # In-flight requests per endpoint
+RPC_BREAKER_FAILURES = int(os.getenv('RPC_BREAKER_FAILURES', '5'))         # Consecutive failures before opening
+RPC_BREAKER_RESET_SECONDS = float(os.getenv('RPC_BREAKER_RESET_SECONDS', '30'))  # Open -> half-open delay
+
+# JSON-RPC error codes/messages that mean "this endpoint is throttling us", not "your call is bad"
+RATE_LIMIT_CODES = {-32005, 429}
+RATE_LIMIT_MESSAGES = ('rate limit', 'too many requests', 'limit exceeded', 'capacity exceeded')
+
+# eth_getLogs errors meaning "narrow the block range" - some providers send them with -32005 too
+RESULT_LIMIT_MESSAGES = ('query returned more than', 'too many results', 'response size', 'block range', 'range is too large')
+
+# eth_sendRawTransaction errors meaning the node already holds this exact signed transaction
+ALREADY_KNOWN_MESSAGES = ('already known', 'known transaction', 'alreadyknown', 'already imported')
+
+# EWMA smoothing factor for latency and error rate
+EWMA_ALPHA = 0.3
+
+
+def rpc_urls_from_env(name: str, default: str) -> List[str]:
+    """
+    Read RPC endpoints for a network from the environment
+    
+    Checks {NAME}_RPC_URLS (comma-separated, in priority order), then {NAME}_RPC_URL,
+    then falls back to the given default.
+    
+    Args:
+        name: Env prefix, e.g. 'SEPOLIA'
+        default: URL to use when nothing is configured
+    
+    Returns:
+        List of endpoint URLs
+    """
+    urls = os.getenv(f'{name}_RPC_URLS')
+    if urls:
+        parsed = [url.strip() for url in urls.split(',') if url.strip()]
+        if parsed:
+            return parsed
+    return [os.getenv(f'{name}_RPC_URL', default)]
+
+
+def is_rate_limited(response: Any) -> bool:
+    """Check whether a JSON-RPC response (or batch) is a throttling error"""
+    if not isinstance(response, dict) or 'error' not in response:
+        return False
+    error = response['error']
+    if not isinstance(error, dict):
+        return 'rate limit' in str(error).lower()
+    message = str(error.get('message', '')).lower()
+    if any(m in message for m in RESULT_LIMIT_MESSAGES):
+        return False
+    return error.get('code') in RATE_LIMIT_CODES or any(m in message for m in RATE_LIMIT_MESSAGES)
+
+
+def is_result_limit_error(error: Any) -> bool:
+    """Check whether a JSON-RPC error asks for a smaller eth_getLogs range"""
+    message = str(error.get('message', '') if isinstance(error, dict) else error).lower()
+    return any(m in message for m in RESULT_LIMIT_MESSAGES)
+
+
+def known_as_sent(response: Any, params: Any) -> Any:
+    """
+    Turn an 'already known' answer to eth_sendRawTransaction into a success
+    
+    A send that timed out may still have reached its endpoint, and the pool
+    then resends it elsewhere. Nodes that already hold the transaction reject
+    the copy, but it is our transaction, so the caller gets its hash.
+    
+    Args:
+        response: JSON-RPC response from the pool
+        params: Request params ([raw signed transaction])
+    
+    Returns:
+        The response, or a result carrying the transaction hash
+    """
+    if not isinstance(response, dict) or not isinstance(response.get('error'), dict):
+        return response
+    message = str(response['error'].get('message', '')).lower()
+    if not any(m in message for m in ALREADY_KNOWN_MESSAGES):
+        return response
+    
+    raw = params[0]
+    tx_hash = Web3.keccak(hexstr=raw) if isinstance(raw, str) else Web3.keccak(raw)
+    logger.info(f"📨 Node already has transaction {tx_hash.to_0x_hex()} - treating the resend as sent")
+    return {'jsonrpc': '2.0', 'id': response.get('id'), 'result': tx_hash.to_0x_hex()}
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker
+    
+    CLOSED    - requests flow normally
+    OPEN      - endpoint skipped until reset_timeout has passed
+    HALF_OPEN - a single probe request is let through; success closes, failure re-opens
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, failure_threshold: int = RPC_BREAKER_FAILURES, reset_timeout: float = RPC_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+    
+    def available(self) -> bool:
+        """Whether a request could be sent now (does not claim the probe slot)"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self.probe_in_flight
+    
+    def allow_request(self) -> bool:
+        """Whether a request may be sent now (claims the probe slot when half-open)"""
+        if self.state == self.CLOSED:
+            return True
+        
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+        
+        if self.state == self.HALF_OPEN and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        
+        return False
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+    
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class RPCEndpoint:
+    """A single RPC endpoint with health stats, circuit breaker and concurrency cap"""
+    
+    def __init__(self, url: str, max_concurrency: int = RPC_MAX_CONCURRENCY, timeout: float = RPC_TIMEOUT):
+        """
+        Initialize endpoint
+        
+        Args:
+            url: HTTP(S) JSON-RPC URL
+            max_concurrency: Max in-flight requests to this endpoint
+            timeout: Per-request timeout in seconds
+        """
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.breaker = CircuitBreaker()
+        
+        # Health stats (EWMA)
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        
+        self._lock = threading.Lock()
+        self._thread_slots = threading.BoundedSemaphore(max_concurrency)
+        self._async_slots = asyncio.Semaphore(max_concurrency)
+        
+        # Child providers do the actual HTTP work; retries are disabled because
+        # the pool fails over to the next endpoint instead of hammering this one.
+        # Both use the shared keep-alive sessions from the session registry, in every thread.
+        self.provider = Web3.HTTPProvider(
+            url,
+            request_kwargs={'timeout': timeout},
+            exception_retry_configuration=None
+        )
+        self.provider._request_session_manager = RegistrySessionManager()
+        self.async_provider = AsyncWeb3.AsyncHTTPProvider(
+            url,
+            request_kwargs={'timeout': ClientTimeout(total=timeout)},
+            exception_retry_configuration=None
+        )
+        self._session_loop = None
+    
+    def __repr__(self):
+        return f"<RPCEndpoint {self.url} {self.breaker.state} {self.latency * 1000:.0f}ms>"
+    
+    @property
+    def score(self) -> float:
+        """Lower is better: observed latency inflated by recent error rate"""
+        return (self.latency + 0.001) * (1 + 10 * self.error_rate)
+    
+    @property
+    def saturated(self) -> bool:
+        return self.in_flight >= self.max_concurrency
+    
+    def available(self) -> bool:
+        with self._lock:
+            return self.breaker.available()
+    
+    def allow_request(self) -> bool:
+        with self._lock:
+            return self.breaker.allow_request()
+    
+    def record_success(self, latency: float):
+        with self._lock:
+            self.requests += 1
+            self.latency = latency if self.latency == 0.0 else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * latency
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate
+            self.breaker.record_success()
+    
+    def record_failure(self):
+        with self._lock:
+            self.requests += 1
+            self.failures += 1
+            self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA
+            self.breaker.record_failure()
+    
+    @contextmanager
+    def slot(self):
+        """Hold one of this endpoint's concurrency slots (threads)"""
+        self._thread_slots.acquire()
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._thread_slots.release()
+    
+    async def ensure_async_session(self):
+        """Hand the registry's keep-alive session to the async provider (once per event loop)"""
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            session = await get_session_registry().async_session(self.url)
+            await self.async_provider.cache_async_session(session)
+            self._session_loop = loop
+    
+    @asynccontextmanager
+    async def async_slot(self):
+        """Hold one of this endpoint's concurrency slots (asyncio)"""
+        async with self._async_slots:
+            with self._lock:
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'state': self.breaker.state,
+            'latency_ms': round(self.latency * 1000, 1),
+            'error_rate': round(self.error_rate, 3),
+            'requests': self.requests,
+            'failures': self.failures,
+            'in_flight': self.in_flight
+        }
+
+
+class RPCPool:
+    """Pool of RPC endpoints for one network"""
+    
+    def __init__(self, network: str, urls: List[str], max_concurrency: int = RPC_MAX_CONCURRENCY, timeout: float = RPC_TIMEOUT):
+        """
+        Initialize pool
+        
+        Args:
+            network: Network name (for logging)
+            urls: Endpoint URLs, in priority order
+            max_concurrency: Max in-flight requests per endpoint
+            timeout: Per-request timeout in seconds
+        """
+        if not urls:
+            raise ValueError(f"No RPC endpoints configured for {network}")
+        
+        self.network = network
+        self.endpoints = [RPCEndpoint(url, max_concurrency, timeout) for url in urls]
+    
+    def candidates(self) -> List[RPCEndpoint]:
+        """
+        Order endpoints for the next request
+        
+        The first pick is weighted-random by 1/score among endpoints whose breaker
+        allows traffic (fast, healthy endpoints get most requests while slower ones
+        keep being measured); the rest follow by score as failover targets.
+        Saturated endpoints are moved to the back.
+        """
+        available = [endpoint for endpoint in self.endpoints if endpoint.available()]
+        if not available:
+            return []
+        
+        ranked = sorted(available, key=lambda endpoint: (endpoint.saturated, endpoint.score))
+        unsaturated = [endpoint for endpoint in ranked if not endpoint.saturated]
+        if len(unsaturated) > 1:
+            first = random.choices(unsaturated, weights=[1 / endpoint.score for endpoint in unsaturated])[0]
+            ranked.remove(first)
+            ranked.insert(0, first)
+        return ranked
+    
+    def _unavailable(self, last_error: Optional[Exception]) -> ConnectionError:
+        if last_error is None:
+            return ConnectionError(f"All RPC endpoints for {self.network} are unavailable (circuit open)")
+        return ConnectionError(f"All RPC endpoints for {self.network} failed: {last_error}")
+    
+    def _handle_error(self, endpoint: RPCEndpoint, error: Exception):
+        was_open = endpoint.breaker.state == CircuitBreaker.OPEN
+        endpoint.record_failure()
+        logger.warning(f"⚠️ RPC {endpoint.url} failed ({self.network}): {error}")
+        if not was_open and endpoint.breaker.state == CircuitBreaker.OPEN:
+            logger.warning(f"🔌 Circuit opened for {endpoint.url}")
+    
+    def call(self, send: Callable[[RPCEndpoint], Any]) -> Any:
+        """
+        Run a request against the best endpoint, failing over on errors
+        
+        Args:
+            send: Function that performs the request on a given endpoint
+        
+        Returns:
+            The first successful (non-throttled) response
+        """
+        last_error = None
+        for endpoint in self.candidates():
+            if not endpoint.allow_request():
+                continue
+            with endpoint.slot():
+                start = time.monotonic()
+                try:
+                    response = send(endpoint)
+                except Exception as e:
+                    self._handle_error(endpoint, e)
+                    last_error = e
+                    continue
+            
+            if is_rate_limited(response):
+                last_error = ConnectionError(f"Rate limited: {response['error']}")
+                self._handle_error(endpoint, last_error)
+                continue
+            
+            endpoint.record_success(time.monotonic() - start)
+            return response
+        
+        raise self._unavailable(last_error)
+    
+    async def async_call(self, send: Callable[[RPCEndpoint], Awaitable[Any]]) -> Any:
+        """
+        Async version of call()
+        
+        Args:
+            send: Coroutine function that performs the request on a given endpoint
+        
+        Returns:
+            The first successful (non-throttled) response
+        """
+        last_error = None
+        for endpoint in self.candidates():
+            if not endpoint.allow_request():
+                continue
+            async with endpoint.async_slot():
+                start = time.monotonic()
+                try:
+                    await endpoint.ensure_async_session()
+                    response = await send(endpoint)
+                except Exception as e:
+                    self._handle_error(endpoint, e)
+                    last_error = e
+                    continue
+            
+            if is_rate_limited(response):
+                last_error = ConnectionError(f"Rate limited: {response['error']}")
+                self._handle_error(endpoint, last_error)
+                continue
+            
+            endpoint.record_success(time.monotonic() - start)
+            return response
+        
+        raise self._unavailable(last_error)
+    
+    def provider(self) -> 'PooledHTTPProvider':
+        """Web3 provider that routes through this pool"""
+        return PooledHTTPProvider(self)
+    
+    def async_provider(self) -> 'AsyncPooledHTTPProvider':
+        """AsyncWeb3 provider that routes through this pool"""
+        return AsyncPooledHTTPProvider(self)
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Health stats for every endpoint"""
+        return [endpoint.stats() for endpoint in self.endpoints]
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Web3 provider backed by an RPCPool"""
+    
+    def __init__(self, pool: RPCPool, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.pool = pool
+    
+    def __str__(self):
+        return f"RPC pool {self.pool.network} ({len(self.pool.endpoints)} endpoints)"
+    
+    def make_request(self, method, params):
+        response = self.pool.call(lambda endpoint: endpoint.provider.make_request(method, params))
+        return known_as_sent(response, params) if method == 'eth_sendRawTransaction' else response
+    
+    def make_batch_request(self, batch_requests):
+        return self.pool.call(lambda endpoint: endpoint.provider.make_batch_request(batch_requests))
+
+
+class AsyncPooledHTTPProvider(AsyncJSONBaseProvider):
+    """AsyncWeb3 provider backed by an RPCPool"""
+    
+    def __init__(self, pool: RPCPool, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.pool = pool
+    
+    def __str__(self):
+        return f"Async RPC pool {self.pool.network} ({len(self.pool.endpoints)} endpoints)"
+    
+    async def make_request(self, method, params):
+        response = await self.pool.async_call(lambda endpoint: endpoint.async_provider.make_request(method, params))
+        return known_as_sent(response, params) if method == 'eth_sendRawTransaction' else response
+    
+    async def make_batch_request(self, batch_requests):
+        return await self.pool.async_call(lambda endpoint: endpoint.async_provider.make_batch_request(batch_requests))
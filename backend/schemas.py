@@ -135,13 +135,12 @@ class TransferRequest(BaseModel):
     amount: float = Field(..., gt=0)
     description: Optional[str] = None
 
-class SendRequest(BaseModel):
-    """Schema for sending to external blockchain address"""
+class SendQuoteRequest(BaseModel):
+    """Schema for quoting a send to external blockchain address"""
     wallet_id: str
     to_address: str = Field(..., min_length=26, max_length=64)
     amount: float = Field(..., gt=0)
     network: str = Field(..., pattern="^(sepolia|amoy|ethereum|polygon)$")
-    description: Optional[str] = None
     
     @field_validator('to_address')
     @classmethod
@@ -162,6 +161,11 @@ class SendRequest(BaseModel):
             raise ValueError('Address must start with 0x (Ethereum) or 1/3/bc1 (Bitcoin)')
         return v
 
+class SendRequest(SendQuoteRequest):
+    """Schema for sending to external blockchain address"""
+    description: Optional[str] = None
+    quote_id: Optional[str] = None  # From /send/quote - skips the balance and fee lookups
+
 class TransactionResponse(BaseModel):
     """Schema for transaction response"""
     id: str
@@ -0,0 +1,112 @@
+"""
+Send Quotes
+Short-lived, single-use quotes for blockchain sends: the balance check, fee
+and nonce are prepared by /send/quote so /send only signs and broadcasts
+"""
+import os
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional, Dict, Any
+
+from sqlalchemy.orm import Session
+
+from models import SendQuote
+
+# Quotes expire quickly - fees move every block
+QUOTE_TTL_SECONDS = int(os.getenv('QUOTE_TTL_SECONDS', '30'))
+
+
+class QuoteStore:
+    """
+    Quote store with expiry; each quote can be used once
+    
+    Quotes are rows in the send_quotes table, so /send finds a quote whatever
+    API worker created it. Taking a quote deletes its row, and only the
+    request whose DELETE removed it may use it.
+    """
+    
+    def __init__(self, ttl: int = QUOTE_TTL_SECONDS):
+        """
+        Initialize quote store
+        
+        Args:
+            ttl: Seconds a quote stays valid
+        """
+        self.ttl = ttl
+    
+    def create(self, db: Session, quote: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store a quote (and drop expired ones)
+        
+        Args:
+            db: Database session (committed here)
+            quote: Prepared send (user_id, wallet_id, network, to_address, amount,
+                gas_estimate, balance, balance_wei)
+        
+        Returns:
+            The stored quote with quote_id and expires_at added
+        """
+        now = datetime.utcnow()
+        row = SendQuote(
+            user_id=quote['user_id'],
+            wallet_id=quote['wallet_id'],
+            network=quote['network'],
+            to_address=quote['to_address'],
+            amount=quote['amount'],
+            balance=quote['balance'],
+            balance_wei=str(quote['balance_wei']),
+            gas_estimate=json.dumps(quote['gas_estimate']),
+            expires_at=now + timedelta(seconds=self.ttl)
+        )
+        db.query(SendQuote).filter(SendQuote.expires_at <= now).delete(synchronize_session=False)
+        db.add(row)
+        db.commit()
+        
+        return dict(quote, quote_id=row.id, expires_at=row.expires_at)
+    
+    def take(self, db: Session, quote_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove and return a quote (so it can't be sent twice)
+        
+        Args:
+            db: Database session (committed here)
+            quote_id: Quote ID from create()
+        
+        Returns:
+            The quote, or None if unknown, expired or already taken
+        """
+        row = db.get(SendQuote, quote_id)
+        if row is None:
+            return None
+        quote = {
+            'quote_id': row.id,
+            'user_id': row.user_id,
+            'wallet_id': row.wallet_id,
+            'network': row.network,
+            'to_address': row.to_address,
+            'amount': Decimal(str(row.amount)),
+            'balance': Decimal(str(row.balance)),
+            'balance_wei': int(row.balance_wei),
+            'gas_estimate': json.loads(row.gas_estimate),
+            'expires_at': row.expires_at
+        }
+        
+        # Concurrent takes both read the row; only one DELETE removes it
+        deleted = db.query(SendQuote).filter(SendQuote.id == quote_id).delete(synchronize_session=False)
+        db.commit()
+        if not deleted or quote['expires_at'] <= datetime.utcnow():
+            return None
+        return quote
+
+
+# Global quote store instance
+_quote_store = None
+
+
+def get_quote_store() -> QuoteStore:
+    """Get or create quote store singleton"""
+    global _quote_store
+    if _quote_store is None:
+        _quote_store = QuoteStore()
+    return _quote_store
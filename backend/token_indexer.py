@@ -0,0 +1,373 @@
+"""
+Token Transfer Indexer
+Finds ERC-20 (USDT/USDC) deposits with eth_getLogs Transfer queries filtered
+to our addresses, sizing block ranges to what the provider will return
+"""
+import os
+import logging
+from decimal import Decimal
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from web3 import Web3
+
+from blockchain_service import get_rpc_pool, chunked, read_batch_results
+from chain_head import get_head_tracker
+from proof_of_reserves import OnChainReserveTracker
+from rpc_pool import is_result_limit_error
+from log_bloom import BloomQuery
+from transaction_scanner import TransactionScanner, AddressIndex, load_checkpoint, save_checkpoint
+
+logger = logging.getLogger(__name__)
+
+# keccak256("Transfer(address,address,uint256)")
+TRANSFER_TOPIC = Web3.keccak(text='Transfer(address,address,uint256)').to_0x_hex()
+
+# decimals() selector
+DECIMALS_SELECTOR = '0x313ce567'
+
+# Tunables (all overridable from .env)
+TOKEN_LOG_RANGE = int(os.getenv('TOKEN_LOG_RANGE', '2000'))                  # Starting blocks per eth_getLogs query
+TOKEN_LOG_MAX_RANGE = int(os.getenv('TOKEN_LOG_MAX_RANGE', '10000'))         # Largest range the indexer grows to
+TOKEN_LOG_TARGET = int(os.getenv('TOKEN_LOG_TARGET', '1000'))                # Logs per query; under half of this grows the range
+TOKEN_LOG_ADDRESS_CHUNK = int(os.getenv('TOKEN_LOG_ADDRESS_CHUNK', '500'))   # Recipient addresses per query (topics[2] OR-list)
+TOKEN_SCAN_METHOD = os.getenv('TOKEN_SCAN_METHOD', 'logs')                     # 'logs' (eth_getLogs) or 'bloom' (headers + receipts)
+
+# JSON-RPC errors meaning the node doesn't serve eth_getLogs at all
+LOGS_UNAVAILABLE_MESSAGES = ('method not found', 'not supported', 'does not exist', 'not available')
+
+
+class LogsUnavailableError(Exception):
+    """The node doesn't serve eth_getLogs (the indexer switches to bloom scanning)"""
+
+
+def address_topic(address: str) -> str:
+    """32-byte topic encoding of an address"""
+    return '0x' + '0' * 24 + address.lower()[2:]
+
+
+def topic_address(topic: str) -> str:
+    """Checksum address from a 32-byte topic"""
+    return Web3.to_checksum_address('0x' + topic[-40:])
+
+
+class TokenTransferIndexer:
+    """
+    Scans Transfer logs of known token contracts for transfers to our addresses
+    
+    One eth_getLogs query covers a whole block range for every token and
+    (up to TOKEN_LOG_ADDRESS_CHUNK) recipients at once. The range halves
+    when the provider answers "too many results" and doubles again while
+    results stay sparse, so the indexer settles on the largest range the
+    provider accepts.
+    
+    On nodes without eth_getLogs (or with TOKEN_SCAN_METHOD=bloom) it scans
+    block headers instead and fetches receipts only for blocks whose
+    logsBloom may hold a Transfer from our tokens to our addresses.
+    """
+    
+    def __init__(self, network: str = 'sepolia', tokens: Dict[str, str] = None):
+        """
+        Initialize indexer
+        
+        Args:
+            network: Network name
+            tokens: Token symbol -> contract address (defaults to the Sepolia test tokens)
+        """
+        self.network = network
+        self.tokens = tokens if tokens is not None else dict(OnChainReserveTracker.TESTNET_TOKENS)
+        self.symbols = {address.lower(): symbol for symbol, address in self.tokens.items()}
+        
+        self.pool = get_rpc_pool(network)
+        self.w3 = Web3(self.pool.provider())
+        self.head = get_head_tracker(network)
+        
+        self.range = TOKEN_LOG_RANGE
+        self.method = TOKEN_SCAN_METHOD
+        self._block_scanner: Optional[TransactionScanner] = None
+    
+    def close(self):
+        """Shut down the block scanner's fetch threads (if a bloom scan created one)"""
+        if self._block_scanner is not None:
+            self._block_scanner.close()
+    
+    def get_decimals(self) -> Dict[str, int]:
+        """
+        Get decimals per token symbol, reading uncached ones in one batch
+        
+        Returns:
+            Dict of symbol -> decimals (6 if the contract could not be read)
+        """
+        # Shared with the reserve tracker - one cache per contract for the process
+        cache = OnChainReserveTracker._token_decimals
+        missing = [symbol for symbol, address in self.tokens.items() if address.lower() not in cache]
+        
+        if missing:
+            calls = [
+                ('eth_call', [{'to': self.tokens[symbol], 'data': DECIMALS_SELECTOR}, 'latest'])
+                for symbol in missing
+            ]
+            try:
+                results = read_batch_results(self.w3.provider.make_batch_request(calls), missing)
+                for symbol, data in results.items():
+                    if data and data != '0x':
+                        cache[self.tokens[symbol].lower()] = int(data, 16)
+            except Exception as e:
+                logger.warning(f"⚠️ Error fetching token decimals: {e}")
+        
+        # Default for USDT/USDC when decimals() could not be read (not cached, retried next time)
+        return {symbol: cache.get(address.lower(), 6) for symbol, address in self.tokens.items()}
+    
+    def _get_logs(self, from_block: int, to_block: int, topics: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        One eth_getLogs query for Transfers to `topics` recipients
+        
+        Returns:
+            Raw logs, or None if the provider says the range holds too many results
+        """
+        response = self.w3.provider.make_request('eth_getLogs', [{
+            'fromBlock': hex(from_block),
+            'toBlock': hex(to_block),
+            'address': list(self.tokens.values()),
+            'topics': [TRANSFER_TOPIC, None, topics]
+        }])
+        
+        if 'error' in response:
+            error = response['error']
+            if is_result_limit_error(error):
+                return None
+            message = str(error.get('message', '') if isinstance(error, dict) else error).lower()
+            if (isinstance(error, dict) and error.get('code') == -32601) or any(m in message for m in LOGS_UNAVAILABLE_MESSAGES):
+                raise LogsUnavailableError(f"eth_getLogs unavailable: {error}")
+            raise ValueError(f"eth_getLogs failed: {error}")
+        return response['result']
+    
+    def iter_transfer_logs(self, from_block: int, to_block: int, recipients: Iterable[str]) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Stream Transfer logs to the recipients, one block range at a time
+        
+        Args:
+            from_block: First block number
+            to_block: Last block number (inclusive)
+            recipients: Addresses to match as the Transfer `to`
+        
+        Yields:
+            (last block of the range, raw logs in that range) in block order
+        """
+        topics = [address_topic(address) for address in recipients]
+        if not topics or not self.tokens:
+            return
+        
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.range - 1, to_block)
+            
+            logs = []
+            for chunk in chunked(topics, TOKEN_LOG_ADDRESS_CHUNK):
+                result = self._get_logs(start, end, chunk)
+                if result is None:
+                    break
+                logs.extend(result)
+            else:
+                # Sparse results - try a bigger range next time
+                if len(logs) < TOKEN_LOG_TARGET // 2 and self.range < TOKEN_LOG_MAX_RANGE:
+                    self.range = min(self.range * 2, TOKEN_LOG_MAX_RANGE)
+                yield end, logs
+                start = end + 1
+                continue
+            
+            if end == start:
+                raise ValueError(f"Too many Transfer logs in block {start} on {self.network}")
+            self.range = max(1, (end - start + 1) // 2)
+            logger.info(f"✂️ Too many logs in blocks {start}-{end}, range now {self.range} blocks")
+    
+    def iter_bloom_transfers(
+        self,
+        from_block: int,
+        to_block: int,
+        indexes: Dict[str, AddressIndex],
+        decimals: Dict[str, int]
+    ) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Find Transfers by scanning block headers and receipts of candidate blocks
+        
+        Headers go through the scanner's batched pipeline; a block's
+        receipts are fetched only when its logsBloom may contain one of our
+        tokens, the Transfer topic and one of our recipients.
+        
+        Args:
+            from_block: First block number
+            to_block: Last block number (inclusive)
+            indexes: Token symbol -> addresses of that token's wallets
+            decimals: Token symbol -> decimals
+        
+        Yields:
+            (block number, deposits in that block) for every block, in order
+        """
+        if self._block_scanner is None:
+            self._block_scanner = TransactionScanner(network=self.network)
+        
+        recipients = set()
+        for index in indexes.values():
+            recipients.update(index.addresses)
+        bloom = BloomQuery(
+            [self.tokens[symbol] for symbol in indexes],
+            TRANSFER_TOPIC,
+            [address_topic(address) for address in recipients]
+        )
+        
+        for block in self._block_scanner.iter_blocks(from_block, to_block, bloom=bloom):
+            block_deposits = []
+            for receipt in block.get('receipts', {}).values():
+                for log in receipt.get('logs', []):
+                    deposit = self.parse_transfer(log, indexes, decimals)
+                    if deposit:
+                        block_deposits.append(deposit)
+            yield int(block['number'], 16), block_deposits
+    
+    def parse_transfer(self, log: Dict[str, Any], indexes: Dict[str, AddressIndex], decimals: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        """
+        Turn a raw Transfer log into a deposit dict if it pays one of our wallets
+        
+        Args:
+            log: Raw eth_getLogs entry
+            indexes: Token symbol -> addresses of that token's wallets
+            decimals: Token symbol -> decimals
+        
+        Returns:
+            Deposit dict, or None if the log isn't a deposit to an indexed wallet
+        """
+        topics = log.get('topics', [])
+        if log.get('removed') or len(topics) != 3 or topics[0].lower() != TRANSFER_TOPIC:
+            return None
+        
+        symbol = self.symbols.get(log['address'].lower())
+        index = indexes.get(symbol)
+        to_address = topic_address(log['topics'][2])
+        if index is None or to_address not in index:
+            return None
+        
+        value = int(log['data'], 16) if log['data'] not in ('0x', '') else 0
+        if value <= 0:
+            return None
+        
+        return {
+            'wallet_id': index.wallet_id(to_address),
+            'tx_hash': log['transactionHash'],
+            'log_index': int(log['logIndex'], 16),
+            'from_address': topic_address(log['topics'][1]),
+            'to_address': to_address,
+            'currency': symbol,
+            'token_address': Web3.to_checksum_address(log['address']),
+            'amount': Decimal(value) / Decimal(10 ** decimals[symbol]),
+            'block_number': int(log['blockNumber'], 16),
+            'block_hash': log['blockHash'].lower()
+        }
+    
+    def scan(self, indexes: Dict[str, AddressIndex], from_block: int, to_block: Union[int, str] = "latest") -> Dict[str, Any]:
+        """
+        Scan a block range for token deposits
+        
+        Stops at the first range that fails, so last_block is always the end
+        of a fully scanned range.
+        
+        Args:
+            indexes: Token symbol -> addresses of that token's wallets
+            from_block: First block number
+            to_block: Last block (number or "latest")
+        
+        Returns:
+            Dict with deposits and last_block (None if nothing was scanned)
+        """
+        head = self.head.block_number()
+        end_block = head if to_block == "latest" else min(int(to_block), head)
+        indexes = {symbol: index for symbol, index in indexes.items() if symbol in self.tokens and len(index)}
+        
+        recipients = set()
+        for index in indexes.values():
+            recipients.update(index.addresses)
+        
+        deposits = []
+        last_block = None
+        if not recipients or from_block > end_block:
+            return {'deposits': deposits, 'last_block': last_block}
+        
+        logger.info(f"🔍 Scanning {', '.join(indexes)} Transfer logs ({self.method}) in blocks {from_block} to {end_block} for {len(recipients)} address(es)...")
+        decimals = self.get_decimals()
+        
+        def found(deposit):
+            deposits.append(deposit)
+            logger.info(f"  💰 Found deposit: {deposit['amount']} {deposit['currency']} to {deposit['to_address'][:10]}... in block {deposit['block_number']}")
+        
+        try:
+            start = from_block
+            if self.method == 'logs':
+                try:
+                    for range_end, logs in self.iter_transfer_logs(start, end_block, recipients):
+                        for log in logs:
+                            deposit = self.parse_transfer(log, indexes, decimals)
+                            if deposit:
+                                found(deposit)
+                        last_block = range_end
+                except LogsUnavailableError as e:
+                    logger.warning(f"⚠️ {e} on {self.network}, scanning block blooms instead")
+                    self.method = 'bloom'
+                    start = last_block + 1 if last_block is not None else from_block
+            
+            if self.method == 'bloom':
+                for block_number, block_deposits in self.iter_bloom_transfers(start, end_block, indexes, decimals):
+                    for deposit in block_deposits:
+                        found(deposit)
+                    last_block = block_number
+        except Exception as e:
+            # Resume from the last complete range next time
+            logger.warning(f"⚠️ Token log scan stopped after block {last_block}: {e}")
+        
+        logger.info(f"✅ Found {len(deposits)} token deposits")
+        return {'deposits': deposits, 'last_block': last_block}
+    
+    def scan_from_checkpoint(self, db, indexes: Dict[str, AddressIndex], scope: str, overlap: int = 0) -> Dict[str, Any]:
+        """
+        Scan from the saved checkpoint up to the head, then move the checkpoint
+        
+        The last `overlap` blocks before the checkpoint are scanned again, so
+        transfers re-mined by a reorg below the checkpoint are still seen
+        (callers drop deposits they already have). The checkpoint is added
+        to the session but not committed.
+        
+        Args:
+            db: Database session
+            indexes: Token symbol -> addresses of that token's wallets
+            scope: Checkpoint scope (wallet ID, or a name for multi-wallet scans)
+            overlap: Blocks before the checkpoint to rescan
+        
+        Returns:
+            Dict with deposits and last_block
+        """
+        checkpoint = load_checkpoint(db, self.network, scope)
+        if checkpoint:
+            from_block = max(0, checkpoint.last_block + 1 - overlap)
+        else:
+            # First scan covers the last 10000 blocks, like the native scanner
+            from_block = max(0, self.head.block_number() - 10000)
+        
+        result = self.scan(indexes, from_block)
+        if result['last_block'] is not None:
+            save_checkpoint(db, self.network, scope, result['last_block'])
+        return result
+
+
+# Indexer instances per network
+_token_indexers = {}
+
+
+def get_token_indexer(network: str = 'sepolia') -> TokenTransferIndexer:
+    """Get or create token transfer indexer for a network"""
+    if network not in _token_indexers:
+        _token_indexers[network] = TokenTransferIndexer(network)
+    return _token_indexers[network]
+
+
+def close_token_indexers():
+    """Shut down scanner threads of every token indexer (call on app shutdown)"""
+    for indexer in _token_indexers.values():
+        indexer.close()
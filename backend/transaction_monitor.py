@@ -2,185 +2,310 @@
 Transaction Monitor
 Background service to monitor pending blockchain transactions and update their status
 """
+import os
+import time
 import asyncio
 import logging
+from collections import defaultdict
 from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Any
+from sqlalchemy import case
 from sqlalchemy.orm import Session
+from web3 import Web3
 from database import SessionLocal
-from models import Transaction, TransactionStatus
-from blockchain_service import get_blockchain_service
+from models import Transaction, TransactionStatus, TransactionType, Wallet
+from async_blockchain_service import get_async_blockchain_service
+from blockchain_service import BlockchainService
+from chain_head import get_head_tracker
+from pending_schedule import PendingSchedule
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Rows per fetch when loading the pending set, and ids per bulk status UPDATE
+MONITOR_BATCH_SIZE = int(os.getenv('MONITOR_BATCH_SIZE', '500'))
+
+
+def receipt_fee(status_info: Dict[str, Any]) -> Optional[Decimal]:
+    """Gas actually paid according to a receipt, in ETH (None if the receipt doesn't say)"""
+    if status_info.get('gas_used') is None or status_info.get('effective_gas_price') is None:
+        return None
+    fee_wei = status_info['gas_used'] * status_info['effective_gas_price']
+    return Decimal(str(Web3.from_wei(fee_wei, 'ether')))
+
 
 class TransactionMonitor:
-    """Monitor and update pending transaction statuses"""
+    """
+    Monitor and update pending transaction statuses
+    
+    Pending transactions are loaded every check_interval seconds into a
+    PendingSchedule per network. Each network's task wakes only when a new
+    block arrives and checks the transactions that are due - new ones every
+    block, older ones less often - plus any whose sender's confirmed nonce
+    has passed them. RPC load follows block production, not backlog size.
+    """
     
     def __init__(self, check_interval: int = 30):
         """
         Initialize monitor
         
         Args:
-            check_interval: Seconds between checks (default 30)
+            check_interval: Seconds between reloads of the pending set (default 30)
         """
         self.check_interval = check_interval
         self.running = False
+        self.schedules: Dict[str, PendingSchedule] = {}
+        self.generation = 0  # Bumped by start() and stop(): outcomes checked in an earlier term are dropped
+        self._tasks: Dict[str, asyncio.Task] = {}
     
     async def start(self):
         """Start monitoring loop"""
         self.running = True
+        self.generation += 1
         logger.info("🔍 Transaction monitor started")
         
         while self.running:
             try:
-                await self.check_pending_transactions()
-                await asyncio.sleep(self.check_interval)
+                await self.refresh()
             except Exception as e:
                 logger.error(f"❌ Error in transaction monitor: {e}")
-                await asyncio.sleep(self.check_interval)
+            await asyncio.sleep(self.check_interval)
     
-    async def check_pending_transactions(self):
-        """Check all pending transactions and update their status"""
-        db: Session = SessionLocal()
+    def load_pending(self) -> Dict[str, List[tuple]]:
+        """
+        Load pending transactions with a tx_hash, grouped by network
+        
+        Only the columns the schedule needs are read, streamed from the
+        cursor MONITOR_BATCH_SIZE rows at a time (no ORM objects).
         
+        Returns:
+            Network -> (id, tx_hash, created_at) rows
+        """
+        by_network: Dict[str, List[tuple]] = {}
+        db: Session = SessionLocal()
         try:
-            # Get all pending transactions with tx_hash
-            pending_txs = db.query(Transaction).filter(
+            # Pending deposits are confirmed and credited by the deposit indexer
+            rows = db.query(Transaction.id, Transaction.tx_hash, Transaction.network, Transaction.created_at).filter(
                 Transaction.status == TransactionStatus.PENDING,
+                Transaction.type != TransactionType.DEPOSIT,
                 Transaction.tx_hash.isnot(None)
-            ).all()
+            ).yield_per(MONITOR_BATCH_SIZE)
             
-            if pending_txs:
-                logger.info(f"📋 Checking {len(pending_txs)} pending transaction(s)")
-                
-                for tx in pending_txs:
-                    try:
-                        # Get network from transaction (default to sepolia)
-                        network = tx.network or 'sepolia'
-                        
-                        # Get blockchain service
-                        blockchain = get_blockchain_service(network)
-                        
-                        # Check transaction status on blockchain
-                        status_info = blockchain.get_transaction_status(tx.tx_hash)
-                        
-                        # Update if status changed
-                        if status_info['status'] == 'confirmed':
-                            tx.status = TransactionStatus.COMPLETED
-                            tx.completed_at = datetime.utcnow()
-                            logger.info(f"✅ Transaction {tx.tx_hash[:10]}... confirmed!")
-                            
-                        elif status_info['status'] == 'failed':
-                            tx.status = TransactionStatus.FAILED
-                            tx.completed_at = datetime.utcnow()
-                            logger.warning(f"❌ Transaction {tx.tx_hash[:10]}... failed")
-                        
-                        # Still pending - log confirmations
-                        elif status_info['status'] == 'pending':
-                            logger.debug(f"⏳ Transaction {tx.tx_hash[:10]}... still pending")
-                        
-                    except Exception as e:
-                        logger.error(f"❌ Error checking tx {tx.tx_hash}: {e}")
-                        continue
+            for tx_id, tx_hash, network, created_at in rows:
+                # Default to sepolia
+                by_network.setdefault(network or 'sepolia', []).append((tx_id, tx_hash, created_at))
+        finally:
+            db.close()
+        return by_network
+    
+    def schedule(self, network: str) -> PendingSchedule:
+        """Get or create a network's schedule"""
+        if network not in self.schedules:
+            self.schedules[network] = PendingSchedule(BlockchainService.NETWORKS[network]['block_time'])
+        return self.schedules[network]
+    
+    async def refresh(self):
+        """Sync schedules with the database and start a task for each network with pending transactions"""
+        by_network = await asyncio.to_thread(self.load_pending)
+        for network in set(by_network) | set(self.schedules):
+            if network not in BlockchainService.NETWORKS:
+                logger.warning(f"⚠️ {len(by_network[network])} pending transaction(s) on unknown network {network}")
+                continue
+            self.schedule(network).sync(by_network.get(network, []))
             
-            # Note: Automatic incoming transaction detection is disabled
-            # Use the manual sync endpoint instead: POST /api/v1/wallets/{id}/sync-blockchain
-            # await self.check_incoming_transactions(db)
+            task = self._tasks.get(network)
+            if self.running and by_network.get(network) and (task is None or task.done()):
+                self._tasks[network] = asyncio.get_running_loop().create_task(self.follow(network))
+    
+    async def follow(self, network: str):
+        """Check a network's due transactions at every new block, until stop() is called"""
+        tracker = get_head_tracker(network)
+        tracker.ensure_started()
+        
+        while self.running:
+            if await tracker.wait_for_new_head(timeout=self.check_interval) is None:
+                continue
+            try:
+                await self.check_network(network)
+            except Exception as e:
+                logger.error(f"❌ Error checking pending transactions on {network}: {e}")
+    
+    async def check_pending_transactions(self):
+        """Check every pending transaction now, regardless of schedule"""
+        try:
+            await self.refresh()
+            networks = [network for network, schedule in self.schedules.items() if len(schedule)]
             
-            # Commit all changes
-            db.commit()
+            # Networks are checked concurrently; a failing network doesn't hold up the others
+            results = await asyncio.gather(
+                *(self.check_network(network, check_all=True) for network in networks),
+                return_exceptions=True
+            )
+            for network, result in zip(networks, results):
+                if isinstance(result, Exception):
+                    logger.error(f"❌ Error checking pending transactions on {network}: {result}")
             
+            # Incoming deposits are handled by the deposit worker; balance drift by the balance reconciler
+        
         except Exception as e:
             logger.error(f"❌ Error in check_pending_transactions: {e}")
-            db.rollback()
-        finally:
-            db.close()
     
-    async def check_incoming_transactions(self, db: Session):
-        """Check for incoming transactions to wallet addresses"""
+    async def check_network(self, network: str, check_all: bool = False):
+        """
+        Check a network's due transactions with batched receipt lookups
+        
+        Args:
+            network: Network name
+            check_all: Check every scheduled transaction, not just due ones
+        """
+        schedule = self.schedule(network)
+        generation = self.generation if self.running else None  # Manual checks aren't tied to leadership
+        blockchain = await get_async_blockchain_service(network)
+        now = time.time()
+        
+        # A sender's confirmed nonce passing a waiting tx means it (or a replacement) was mined
+        senders = schedule.waiting_senders()
+        if senders and not check_all:
+            promoted = schedule.promote(await blockchain.get_confirmed_nonces(list(senders)), now)
+            if promoted:
+                logger.info(f"⏩ {promoted} transaction(s) on {network} passed by their sender's nonce")
+        
+        due = schedule.pop_due(float('inf') if check_all else now)
+        if not due:
+            return
+        
         try:
-            from models import Wallet, TransactionType
-            from decimal import Decimal
+            # One batched receipt lookup for everything due
+            statuses = await blockchain.get_transaction_statuses([entry['tx_hash'] for entry in due])
             
-            # Get all crypto wallets with addresses
-            wallets = db.query(Wallet).filter(
-                Wallet.address.isnot(None)
-            ).all()
+            outcomes = {}
+            fees = {}
+            blocks = {}
+            still_pending = []
+            for entry in due:
+                status_info = statuses[entry['tx_hash']]
+                if status_info['status'] in ('confirmed', 'failed'):
+                    outcomes[entry['id']] = status_info['status']
+                    schedule.remove(entry)
+                    blocks[entry['id']] = status_info.get('block_number')
+                    fee = receipt_fee(status_info)
+                    if fee is not None:
+                        fees[entry['id']] = fee
+                else:
+                    still_pending.append(entry)
             
-            for wallet in wallets:
-                try:
-                    # Determine network from currency
-                    network_map = {
-                        "ETH": "sepolia",
-                        "MATIC": "amoy"
-                    }
-                    network = network_map.get(wallet.currency_code, "sepolia")
-                    
-                    # Get blockchain service
-                    blockchain = get_blockchain_service(network)
-                    
-                    # Get current balance from blockchain
-                    current_blockchain_balance = blockchain.get_balance(wallet.address)
-                    
-                    # Calculate total deposits and withdrawals from transaction history
-                    total_deposits = Decimal('0')
-                    total_withdrawals = Decimal('0')
-                    
-                    wallet_transactions = db.query(Transaction).filter(
-                        Transaction.wallet_id == wallet.id
-                    ).all()
-                    
-                    for tx in wallet_transactions:
-                        if tx.type == TransactionType.DEPOSIT:
-                            total_deposits += tx.amount
-                        elif tx.type == TransactionType.WITHDRAWAL:
-                            total_withdrawals += (tx.amount + tx.fee)
-                    
-                    # Expected balance = deposits - withdrawals
-                    expected_balance = total_deposits - total_withdrawals
+            # Learn sender and nonce once, so later blocks can promote them
+            unknown = [entry['tx_hash'] for entry in still_pending if entry['nonce'] is None]
+            if unknown:
+                nonces = await blockchain.get_transaction_nonces(unknown)
+                for entry in still_pending:
+                    if entry['tx_hash'] in nonces:
+                        entry.update(nonces[entry['tx_hash']])
+        finally:
+            for entry in due:
+                if entry['id'] in schedule.entries and entry['next_check'] is None:
+                    schedule.reschedule(entry, now)
+        
+        logger.debug(f"⏳ {network}: checked {len(due)}, {len(due) - len(outcomes)} still pending, {len(schedule)} scheduled")
+        if outcomes:
+            await asyncio.to_thread(self.apply_outcomes, outcomes, fees=fees, blocks=blocks, generation=generation)
+    
+    def apply_outcomes(self, outcomes: Dict[str, str], batch_size: int = MONITOR_BATCH_SIZE,
+                       fees: Dict[str, Decimal] = None, blocks: Dict[str, int] = None,
+                       generation: Optional[int] = None) -> Dict[str, int]:
+        """
+        Store confirmed / failed outcomes with bulk UPDATEs
+        
+        Each batch of ids locks its still-pending rows, updates them with one
+        UPDATE ... WHERE id IN (...) and is committed on its own, so row locks
+        are held briefly and rows resolved elsewhere in the meantime are left
+        alone. Receipt fees replace the estimated fee, and the difference
+        (estimate - actual) goes back to the sending wallets with one more
+        UPDATE in the same commit. With a generation, batches not yet
+        committed are dropped once the monitor was stopped (or restarted)
+        after that generation - this worker is no longer the leader.
+        
+        Args:
+            outcomes: Transaction ID -> 'confirmed' or 'failed'
+            batch_size: Ids per UPDATE
+            fees: Transaction ID -> fee paid according to the receipt
+            blocks: Transaction ID -> block the transaction was mined in
+            generation: self.generation when the outcomes were checked (None: always store)
+        
+        Returns:
+            Number of rows updated per outcome
+        """
+        statuses = {'confirmed': TransactionStatus.COMPLETED, 'failed': TransactionStatus.FAILED}
+        fees = fees or {}
+        blocks = {tx_id: block for tx_id, block in (blocks or {}).items() if block is not None}
+        updated = {'confirmed': 0, 'failed': 0}
+        
+        db: Session = SessionLocal()
+        try:
+            for outcome, status in statuses.items():
+                ids = [tx_id for tx_id, result in outcomes.items() if result == outcome]
+                for i in range(0, len(ids), batch_size):
+                    # Stored fees are the estimates the wallets were debited by at send time
+                    rows = db.query(Transaction.id, Transaction.wallet_id, Transaction.fee).filter(
+                        Transaction.id.in_(ids[i:i + batch_size]),
+                        Transaction.status == TransactionStatus.PENDING
+                    ).with_for_update().all()
+                    if not rows:
+                        continue
+                    batch = [row.id for row in rows]
                     
-                    # If blockchain balance > expected balance, we missed a deposit!
-                    if current_blockchain_balance > expected_balance:
-                        missed_deposit = current_blockchain_balance - expected_balance
-                        
-                        # Only create deposit if amount is significant (> 0.000001)
-                        if missed_deposit > Decimal('0.000001'):
-                            logger.info(f"💰 Detected incoming deposit to {wallet.currency_code} wallet!")
-                            logger.info(f"   Address: {wallet.address[:10]}...")
-                            logger.info(f"   Amount: +{missed_deposit} {wallet.currency_code}")
-                            logger.info(f"   Blockchain: {current_blockchain_balance}, Expected: {expected_balance}")
-                            
-                            # Create deposit transaction record
-                            new_tx = Transaction(
-                                wallet_id=wallet.id,
-                                type=TransactionType.DEPOSIT,
-                                amount=Decimal(str(missed_deposit)),
-                                status=TransactionStatus.COMPLETED,
-                                description=f"Incoming {wallet.currency_code} deposit",
-                                network=network,
-                                completed_at=datetime.utcnow()
-                            )
-                            db.add(new_tx)
-                            
-                            logger.info(f"✅ Created deposit transaction record for +{missed_deposit} {wallet.currency_code}")
+                    values = {
+                        Transaction.status: status,
+                        Transaction.completed_at: datetime.utcnow()
+                    }
+                    batch_fees = {tx_id: fees[tx_id] for tx_id in batch if tx_id in fees}
+                    if batch_fees:
+                        values[Transaction.fee] = case(batch_fees, value=Transaction.id, else_=Transaction.fee)
+                    batch_blocks = {tx_id: blocks[tx_id] for tx_id in batch if tx_id in blocks}
+                    if batch_blocks:
+                        values[Transaction.block_number] = case(batch_blocks, value=Transaction.id,
+                                                                else_=Transaction.block_number)
+                    count = db.query(Transaction).filter(
+                        Transaction.id.in_(batch)
+                    ).update(values, synchronize_session=False)
                     
-                    # Always sync wallet balance to blockchain
-                    if wallet.balance != current_blockchain_balance:
-                        wallet.balance = current_blockchain_balance
-                        
-                except Exception as e:
-                    logger.error(f"❌ Error checking incoming for wallet {wallet.id}: {e}")
-                    import traceback
-                    logger.error(traceback.format_exc())
-                    continue
+                    refunds = defaultdict(Decimal)
+                    for tx_id, wallet_id, estimate in rows:
+                        if tx_id in batch_fees:
+                            refunds[wallet_id] += Decimal(str(estimate or 0)) - batch_fees[tx_id]
+                    refunds = {wallet_id: delta for wallet_id, delta in refunds.items() if delta}
+                    if refunds:
+                        db.query(Wallet).filter(Wallet.id.in_(list(refunds))).update(
+                            {Wallet.balance: Wallet.balance + case(refunds, value=Wallet.id, else_=0)},
+                            synchronize_session=False
+                        )
                     
-        except Exception as e:
-            logger.error(f"❌ Error in check_incoming_transactions: {e}")
+                    if generation is not None and (not self.running or self.generation != generation):
+                        db.rollback()
+                        logger.info("🛑 Discarded transaction outcomes after the monitor stopped")
+                        return updated
+                    db.commit()
+                    updated[outcome] += count
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        
+        if updated['confirmed']:
+            logger.info(f"✅ {updated['confirmed']} transaction(s) confirmed")
+        if updated['failed']:
+            logger.warning(f"❌ {updated['failed']} transaction(s) failed")
+        return updated
     
     def stop(self):
         """Stop monitoring loop"""
         self.running = False
+        self.generation += 1
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks = {}
         logger.info("🛑 Transaction monitor stopped")
 
 
@@ -192,7 +317,7 @@ def get_transaction_monitor() -> TransactionMonitor:
     """Get or create transaction monitor singleton"""
     global _monitor
     if _monitor is None:
-        _monitor = TransactionMonitor(check_interval=10)  # Check every 10 seconds
+        _monitor = TransactionMonitor(check_interval=10)  # Reload the pending set every 10 seconds
     return _monitor
 
 
@@ -2,7 +2,7 @@
 Transaction Routes
 Handles deposits, withdrawals, transfers, and transaction history
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from decimal import Decimal
@@ -11,11 +11,14 @@ from database import get_db
 from models import User, Wallet
 from schemas import (
     DepositRequest, WithdrawalRequest, TransferRequest, SendRequest,
-    TransactionResponse, SuccessResponse
+    SendQuoteRequest, TransactionResponse, SuccessResponse
 )
 from auth_routes import get_current_user
 from transaction_service import TransactionService
-from blockchain_service import get_blockchain_service
+from async_blockchain_service import get_async_blockchain_service
+from send_quotes import get_quote_store
+from transaction_monitor import get_transaction_monitor, receipt_fee
+import asyncio
 import os
 import logging
 
@@ -188,6 +191,104 @@ async def transfer_funds(
         )
 
 
+@router.post("/send/quote")
+async def quote_send(
+    quote_data: SendQuoteRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Prepare a blockchain send and return a short-lived quote
+    
+    - **wallet_id**: Source wallet ID
+    - **to_address**: Destination blockchain address
+    - **amount**: Amount to send
+    - **network**: Blockchain network (sepolia, amoy, ethereum, polygon)
+    
+    Balance, gas fee and nonce are prepared concurrently. Pass the returned
+    quote_id to /send (with the same wallet, address, amount and network)
+    before it expires; the send then only signs and broadcasts.
+    """
+    # Verify wallet belongs to user
+    wallet = db.query(Wallet).filter(
+        Wallet.id == quote_data.wallet_id,
+        Wallet.user_id == current_user.id
+    ).first()
+    
+    if not wallet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wallet not found or does not belong to you"
+        )
+    
+    if not wallet.address or not wallet.private_key_encrypted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="This wallet doesn't have a blockchain address. Please create a crypto wallet first."
+        )
+    
+    # Check wallet balance
+    amount = Decimal(str(quote_data.amount))
+    if wallet.balance < amount:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient balance. Available: {wallet.balance}, Required: {amount}"
+        )
+    
+    blockchain = await get_async_blockchain_service(quote_data.network)
+    
+    if not blockchain.is_valid_address(quote_data.to_address):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Ethereum address: {quote_data.to_address}. Please check the address and try again."
+        )
+    
+    try:
+        prepared = await blockchain.quote_transaction(
+            from_address=wallet.address,
+            to_address=quote_data.to_address,
+            amount=amount
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to prepare transaction: {str(e)}"
+        )
+    
+    gas_estimate = prepared['gas_estimate']
+    total_needed = amount + Decimal(gas_estimate['total_fee_eth'])
+    if prepared['balance'] < total_needed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient blockchain balance. You have {prepared['balance']} ETH but need {total_needed} ETH (including gas fee of {gas_estimate['total_fee_eth']} ETH). Please deposit testnet ETH first."
+        )
+    
+    quote = get_quote_store().create(db, {
+        'user_id': current_user.id,
+        'wallet_id': wallet.id,
+        'network': quote_data.network,
+        'to_address': quote_data.to_address,
+        'amount': amount,
+        'gas_estimate': gas_estimate,
+        'balance': prepared['balance'],
+        'balance_wei': prepared['balance_wei']
+    })
+    
+    return {
+        "quote_id": quote['quote_id'],
+        "expires_at": quote['expires_at'].isoformat(),
+        "wallet_id": wallet.id,
+        "to_address": quote_data.to_address,
+        "amount": str(amount),
+        "network": quote_data.network,
+        "gas_fee": gas_estimate['total_fee_eth'],
+        "max_gas_fee": gas_estimate['max_fee_eth'],
+        "total_needed": str(total_needed),
+        "blockchain_balance": str(prepared['balance']),
+        "nonce": prepared['nonce']
+    }
+
+
 @router.post("/send", status_code=status.HTTP_201_CREATED)
 async def send_to_address(
     send_data: SendRequest,
@@ -202,6 +303,7 @@ async def send_to_address(
     - **amount**: Amount to send
     - **network**: Blockchain network (sepolia, amoy, ethereum, polygon)
     - **description**: Optional description
+    - **quote_id**: Optional quote from /send/quote (single use)
     
     ⚠️ This sends REAL blockchain transactions on testnet/mainnet
     """
@@ -217,21 +319,24 @@ async def send_to_address(
             detail="Wallet not found or does not belong to you"
         )
     
-    # Check for pending transactions from this wallet (cooldown check)
-    from models import Transaction, TransactionStatus
-    from datetime import datetime, timedelta
-    
-    pending_tx = db.query(Transaction).filter(
-        Transaction.wallet_id == send_data.wallet_id,
-        Transaction.status == TransactionStatus.PENDING,
-        Transaction.tx_hash.isnot(None)  # Only check blockchain transactions
-    ).first()
-    
-    if pending_tx:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail=f"⏳ You have a pending transaction. Please wait 10-15 seconds for it to confirm before sending another. Check status: https://sepolia.etherscan.io/tx/{pending_tx.tx_hash}"
-        )
+    # A quote carries the balance check and fees, so only sign + broadcast remain
+    quote = None
+    if send_data.quote_id:
+        quote = get_quote_store().take(db, send_data.quote_id)
+        if not quote:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Quote not found or expired. Request a new quote."
+            )
+        if (quote['user_id'] != current_user.id
+                or quote['wallet_id'] != send_data.wallet_id
+                or quote['network'] != send_data.network
+                or quote['to_address'].lower() != send_data.to_address.lower()
+                or quote['amount'] != Decimal(str(send_data.amount))):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Send details don't match the quote. Request a new quote."
+            )
     
     # Check wallet balance
     amount = Decimal(str(send_data.amount))
@@ -250,7 +355,7 @@ async def send_to_address(
             )
         
         # Get blockchain service for the specified network
-        blockchain = get_blockchain_service(send_data.network)
+        blockchain = await get_async_blockchain_service(send_data.network)
         
         # Validate address format
         if not blockchain.is_valid_address(send_data.to_address):
@@ -276,28 +381,35 @@ async def send_to_address(
                 detail=f"Failed to decrypt wallet key: {str(e)}"
             )
         
-        # Get wallet's actual blockchain balance
-        try:
-            blockchain_balance = blockchain.get_balance(wallet.address)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to fetch balance from blockchain: {str(e)}"
+        # Get wallet's actual blockchain balance and estimate gas fee concurrently
+        # (already done by the quote if there is one)
+        if quote:
+            balance_result, gas_result = quote['balance'], quote['gas_estimate']
+        else:
+            balance_result, gas_result = await asyncio.gather(
+                blockchain.get_balance(wallet.address, 'pending'),  # Same block tag as quotes
+                blockchain.estimate_gas_fee(
+                    from_address=wallet.address,
+                    to_address=send_data.to_address,
+                    amount=amount
+                ),
+                return_exceptions=True
             )
         
-        # Estimate gas fee first
-        try:
-            gas_estimate = blockchain.estimate_gas_fee(
-                from_address=wallet.address,
-                to_address=send_data.to_address,
-                amount=amount
+        if isinstance(balance_result, Exception):
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch balance from blockchain: {str(balance_result)}"
             )
-        except Exception as e:
+        if isinstance(gas_result, Exception):
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to estimate gas: {str(e)}"
+                detail=f"Failed to estimate gas: {str(gas_result)}"
             )
         
+        blockchain_balance = balance_result
+        gas_estimate = gas_result
+        
         # Check if user has enough ETH for amount + gas
         total_needed = amount + Decimal(gas_estimate['total_fee_eth'])
         if blockchain_balance < total_needed:
@@ -307,10 +419,12 @@ async def send_to_address(
             )
         
         # Send blockchain transaction using USER's wallet
-        tx_result = blockchain.send_transaction(
+        tx_result = await blockchain.send_transaction(
             private_key=private_key,
             to_address=send_data.to_address,
-            amount=amount
+            amount=amount,
+            fees=gas_estimate['fees'],  # Reuse the quoted fees, no second gas price lookup
+            balance_wei=quote['balance_wei'] if quote else None
         )
         
         # Create transaction record in database
@@ -329,10 +443,15 @@ async def send_to_address(
             created_at=datetime.utcnow()
         )
         
-        # Update database balance to match blockchain (sync)
-        wallet.balance = blockchain_balance - total_needed
-        
         db.add(transaction)
+        
+        # One atomic UPDATE against the stored balance, so concurrent sends and
+        # deposit credits can't overwrite each other. The chain balance isn't
+        # copied in: it already includes deposits the indexer holds as pending
+        # and credits separately once they are confirmed.
+        db.query(Wallet).filter(Wallet.id == wallet.id).update({
+            Wallet.balance: Wallet.balance - total_needed
+        }, synchronize_session=False)
         db.commit()
         db.refresh(transaction)
         
@@ -347,7 +466,7 @@ async def send_to_address(
             "explorer_url": tx_result['explorer_url'],
             "note": "Transaction is pending confirmation. Check Etherscan for status."
         }
-        
+    
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -457,19 +576,20 @@ async def check_transaction_status(
                 )
         
         # Get blockchain service
-        blockchain = get_blockchain_service(network)
+        blockchain = await get_async_blockchain_service(network)
         
         # Check status on blockchain
-        status_info = blockchain.get_transaction_status(tx_hash)
+        status_info = await blockchain.get_transaction_status(tx_hash)
         
-        # Update database if status changed
+        # Update database if status changed - same path as the monitor, so the receipt fee is settled too
         if transaction and status_info['status'] != 'pending':
-            from models import TransactionStatus
-            if status_info['status'] == 'confirmed':
-                transaction.status = TransactionStatus.COMPLETED
-            elif status_info['status'] == 'failed':
-                transaction.status = TransactionStatus.FAILED
-            db.commit()
+            fee = receipt_fee(status_info)
+            await asyncio.to_thread(
+                get_transaction_monitor().apply_outcomes,
+                {transaction.id: status_info['status']},
+                fees={transaction.id: fee} if fee is not None else None,
+                blocks={transaction.id: status_info.get('block_number')}
+            )
         
         return {
             "tx_hash": tx_hash,
@@ -479,7 +599,7 @@ async def check_transaction_status(
             "explorer_url": f"{blockchain.network_config['explorer']}/tx/{tx_hash}",
             "network": network
         }
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -520,10 +640,10 @@ async def sync_wallet_balance(
     
     try:
         # Get blockchain service (default to sepolia for now)
-        blockchain = get_blockchain_service('sepolia')
+        blockchain = await get_async_blockchain_service('sepolia')
         
         # Get real balance from blockchain
-        blockchain_balance = blockchain.get_balance(wallet.address)
+        blockchain_balance = await blockchain.get_balance(wallet.address)
         
         # Store old balance for comparison
         old_balance = wallet.balance
@@ -542,7 +662,7 @@ async def sync_wallet_balance(
             "difference": str(blockchain_balance - old_balance),
             "network": "sepolia"
         }
-        
+    
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -592,7 +712,7 @@ async def cleanup_incorrect_deposits(
             "deleted_count": count,
             "note": "Real incoming transactions are tracked when you receive funds"
         }
-        
+    
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -604,20 +724,29 @@ async def cleanup_incorrect_deposits(
 @router.post("/scan-deposits/{wallet_id}")
 async def scan_for_deposits(
     wallet_id: str,
+    wait: bool = False,
+    timeout: float = 30,
+    since_block: int = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Scan blockchain for incoming deposits using Etherscan API
+    Get deposits the background deposit worker has indexed for a wallet
     
-    This fetches REAL transaction history from Etherscan and creates
-    deposit records for any incoming transactions we haven't tracked yet.
+    The worker follows the chain head and records deposits as they arrive,
+    so this only reads the database. Deposits are pending until the
+    network's confirmation depth; the wallet balance is credited when they
+    confirm.
+    
+    - **wait**: Wait (up to `timeout` seconds) until the current head is indexed
+    - **since_block**: Deposits in blocks after this one (default: pending deposits);
+      pass back `indexed_block` from the previous response to get only new ones
     """
-    logger.info(f"🔍 Starting deposit scan for wallet {wallet_id}")
     try:
         from models import Transaction, TransactionType, TransactionStatus
-        from etherscan_service import get_etherscan_service
-        import os
+        from chain_head import get_head_tracker
+        from deposit_worker import get_deposit_worker, deposit_scope, indexed_block
+        from receipt_cache import finality_depth
         
         # Get wallet
         wallet = db.query(Wallet).filter(
@@ -643,164 +772,118 @@ async def scan_for_deposits(
             "MATIC": "amoy"
         }
         network = network_map.get(wallet.currency_code, "sepolia")
-        
-        # For Amoy/MATIC, use TransactionScanner instead of Etherscan
-        if network == "amoy":
-            logger.info(f"🟣 Using TransactionScanner for Amoy/MATIC deposits")
-            from transaction_scanner import TransactionScanner
-            
-            scanner = TransactionScanner(network='amoy')
-            
-            # Get the last block we scanned (or start from recent blocks)
-            last_tx = db.query(Transaction).filter(
-                Transaction.wallet_id == wallet_id,
-                Transaction.type == TransactionType.DEPOSIT,
-                Transaction.tx_hash.isnot(None)
-            ).order_by(Transaction.created_at.desc()).first()
-            
-            from_block = 0  # Will scan last 10000 blocks by default
-            if last_tx and hasattr(last_tx, 'block_number') and last_tx.block_number:
-                from_block = int(last_tx.block_number) + 1
-            
-            # Scan blockchain for incoming transactions
-            logger.info(f"🔎 Scanning Amoy blockchain for MATIC deposits to {wallet.address[:10]}...")
-            deposits = scanner.get_incoming_transactions(wallet.address, from_block=from_block)
-            logger.info(f"📊 Found {len(deposits)} MATIC deposits from blockchain")
-            
-            if not deposits:
-                return {
-                    "message": "📭 No incoming MATIC deposits found on Amoy blockchain",
-                    "deposits_found": 0
-                }
-            
-            # Check which deposits we already have
-            existing_hashes = set(
-                tx.tx_hash for tx in db.query(Transaction).filter(
-                    Transaction.wallet_id == wallet_id,
-                    Transaction.tx_hash.isnot(None)
-                ).all()
+        scope = deposit_scope(wallet.currency_code)
+        
+        head = await get_head_tracker(network).async_block_number()
+        if wait:
+            caught_up = await get_deposit_worker().wait_until_indexed(db, network, head, scope=scope, timeout=timeout)
+            if not caught_up:
+                logger.warning(f"⏳ Deposit worker hasn't reached block {head} on {network} after {timeout}s")
+            db.expire_all()  # Pick up balances credited while waiting
+        
+        query = db.query(Transaction).filter(
+            Transaction.wallet_id == wallet_id,
+            Transaction.type == TransactionType.DEPOSIT
+        )
+        if since_block is not None:
+            query = query.filter(
+                Transaction.block_number > since_block,
+                Transaction.status != TransactionStatus.CANCELLED
             )
-            
-            new_deposits = []
-            for deposit in deposits:
-                if deposit['tx_hash'] not in existing_hashes:
-                    # Create transaction record
-                    tx = Transaction(
-                        wallet_id=wallet_id,
-                        type=TransactionType.DEPOSIT,
-                        amount=float(deposit['amount']),
-                        currency_code='MATIC',
-                        status=TransactionStatus.COMPLETED,
-                        tx_hash=deposit['tx_hash'],
-                        description=f"MATIC deposit from {deposit['from_address'][:10]}...",
-                        network='amoy'
-                    )
-                    db.add(tx)
-                    
-                    # Update wallet balance
-                    wallet.balance += Decimal(str(deposit['amount']))
-                    
-                    new_deposits.append({
-                        'amount': str(deposit['amount']),
-                        'tx_hash': deposit['tx_hash'],
-                        'from': deposit['from_address']
-                    })
-                    
-                    logger.info(f"✅ Added MATIC deposit: {deposit['amount']} MATIC (tx: {deposit['tx_hash'][:10]}...)")
-            
-            if new_deposits:
-                db.commit()
-                logger.info(f"💾 Saved {len(new_deposits)} new MATIC deposits to database")
-            
-            return {
-                "message": f"✅ Scan complete! Found {len(new_deposits)} new MATIC deposits",
-                "deposits_found": len(new_deposits),
-                "new_deposits": new_deposits,
-                "network": "amoy"
-            }
-        
-        # Get Etherscan service with API key from environment
-        api_key = os.getenv('ETHERSCAN_API_KEY')
-        logger.info(f"📡 Using Etherscan API key: {api_key[:10]}..." if api_key else "⚠️ No API key found!")
-        
-        etherscan = get_etherscan_service(api_key=api_key, network=network)
-        
-        # Fetch incoming deposits from Etherscan
-        logger.info(f"🔎 Scanning blockchain for deposits to {wallet.address[:10]}...")
-        deposits = etherscan.get_latest_incoming_deposits(wallet.address)
-        logger.info(f"📊 Found {len(deposits)} deposits from Etherscan")
+        else:
+            query = query.filter(Transaction.status == TransactionStatus.PENDING)
+        deposits = query.order_by(Transaction.block_number.desc()).limit(100).all()
+        
+        last_indexed = indexed_block(db, network, scope)
+        result = {
+            "deposits_found": len(deposits),
+            "total_amount": str(sum((tx.amount for tx in deposits), Decimal('0'))),
+            "currency": wallet.currency_code,
+            "new_balance": str(wallet.balance),
+            "pending": sum(1 for tx in deposits if tx.status == TransactionStatus.PENDING),
+            "confirmations_required": finality_depth(network),
+            "indexed_block": last_indexed,
+            "head_block": head,
+            "network": network,
+            "deposits": [
+                {
+                    "amount": str(tx.amount),
+                    "description": tx.description,
+                    "tx_hash": tx.tx_hash,
+                    "block_number": tx.block_number,
+                    "date": tx.created_at.isoformat(),
+                    "status": tx.status.value
+                }
+                for tx in deposits
+            ]
+        }
         
         if not deposits:
-            return {
-                "message": "📭 No incoming deposits found on blockchain",
-                "deposits_found": 0
-            }
-        
-        # Check which deposits we already have
-        existing_hashes = set(
-            tx.tx_hash for tx in db.query(Transaction).filter(
-                Transaction.wallet_id == wallet_id,
-                Transaction.tx_hash.isnot(None)
-            ).all()
-        )
-        
-        new_deposits = []
-        for deposit in deposits:
-            if deposit['tx_hash'] not in existing_hashes:
-                # Create new deposit transaction
-                new_tx = Transaction(
-                    wallet_id=wallet_id,
-                    type=TransactionType.DEPOSIT,
-                    amount=deposit['amount'],
-                    fee=Decimal('0'),  # No fee for receiving
-                    status=TransactionStatus.COMPLETED,
-                    tx_hash=deposit['tx_hash'],
-                    network=network,
-                    description=f"Deposit from {deposit['from_address'][:10]}...",
-                    completed_at=deposit['timestamp']
-                )
-                db.add(new_tx)
-                new_deposits.append(deposit)
-        
-        if new_deposits:
-            db.commit()
-            
-            # Update wallet balance from blockchain
-            blockchain = get_blockchain_service(network)
-            wallet.balance = blockchain.get_balance(wallet.address)
-            db.commit()
-            
-            total_amount = sum(d['amount'] for d in new_deposits)
-            
-            return {
-                "message": f"✅ Found {len(new_deposits)} new deposit(s)!",
-                "deposits_found": len(new_deposits),
-                "total_amount": str(total_amount),
-                "currency": wallet.currency_code,
-                "new_balance": str(wallet.balance),
-                "deposits": [
-                    {
-                        "amount": str(d['amount']),
-                        "from": d['from_address'],
-                        "tx_hash": d['tx_hash'],
-                        "date": d['timestamp'].isoformat()
-                    }
-                    for d in new_deposits
-                ]
-            }
+            result["message"] = "📭 No new deposits found on blockchain"
+            if last_indexed is None or last_indexed < head:
+                result["note"] = f"Deposit indexing is at block {last_indexed}, head is {head}"
         else:
-            return {
-                "message": "✅ All deposits already tracked",
-                "deposits_found": 0,
-                "note": "No new deposits to add"
-            }
-        
+            result["message"] = f"✅ Found {len(deposits)} deposit(s)!"
+        return result
+    
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         import traceback
-        logger.error(f"Error scanning deposits: {traceback.format_exc()}")
+        logger.error(f"Error reading deposits: {traceback.format_exc()}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error scanning for deposits: {str(e)}"
+            detail=f"Error reading deposits: {str(e)}"
         )
 
+
+@router.post("/sync-history/{wallet_id}", status_code=status.HTTP_202_ACCEPTED)
+async def sync_deposit_history(
+    wallet_id: str,
+    background_tasks: BackgroundTasks,
+    full: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Backfill a wallet's deposit history from Etherscan in the background
+    
+    Covers history older than the deposit worker's scan window (e.g. for
+    imported addresses). Resumes from the wallet's last Etherscan sync
+    unless **full** is set. Deposits are recorded as pending and credited by
+    the deposit worker once confirmed; poll /scan-deposits for results.
+    """
+    from async_etherscan_service import get_async_etherscan_service
+    
+    wallet = db.query(Wallet).filter(
+        Wallet.id == wallet_id,
+        Wallet.user_id == current_user.id
+    ).first()
+    
+    if not wallet:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Wallet not found"
+        )
+    
+    network_map = {
+        "ETH": "sepolia",
+        "MATIC": "amoy"
+    }
+    if not wallet.address or wallet.currency_code not in network_map:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="History sync is only available for ETH and MATIC wallets with a blockchain address"
+        )
+    network = network_map[wallet.currency_code]
+    
+    etherscan = get_async_etherscan_service(network)
+    background_tasks.add_task(etherscan.sync_wallets, {wallet.address: wallet.id}, full)
+    
+    logger.info(f"📜 Queued {'full ' if full else ''}Etherscan history sync for wallet {wallet_id}")
+    return {
+        "message": "✅ History sync started",
+        "wallet_id": wallet_id,
+        "network": network,
+        "full_history": full
+    }
@@ -1,11 +1,15 @@
 """
 Transaction Scanner using Infura RPC
-Scans blockchain for incoming ETH/MATIC transfers using eth_getLogs
+Scans blockchain for incoming ETH/MATIC transfers using batched block downloads
+(plain value transfers emit no logs, so eth_getLogs can't find them)
 Supports multiple networks: Sepolia (ETH), Amoy (MATIC)
 """
 from web3 import Web3
 import logging
-from typing import List, Dict
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Iterable, Iterator, Union, Tuple, Any
 from decimal import Decimal
 from datetime import datetime
 import os
@@ -13,53 +17,174 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from rpc_pool import RPCPool
+from rate_limit import TokenBucket
+from log_bloom import BloomQuery
+from block_cache import get_block_cache
+from receipt_cache import finality_depth
+from blockchain_service import get_rpc_pool, read_batch_results, chunked, RPC_BATCH_LIMIT
+from chain_head import get_head_tracker
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Block fetch pipeline (all overridable from .env)
+SCAN_BATCH_SIZE = int(os.getenv('SCAN_BATCH_SIZE', '20'))              # Blocks per JSON-RPC batch
+SCAN_CONCURRENCY = int(os.getenv('SCAN_CONCURRENCY', '8'))             # Batches in flight
+SCAN_CALLS_PER_SECOND = float(os.getenv('SCAN_CALLS_PER_SECOND', '0')) # RPC call budget (0 = unlimited)
+
+
+class ChainReorgError(Exception):
+    """A scanned block doesn't build on the block scanned before it"""
+    
+    def __init__(self, network: str, block_number: int, expected_parent: str, parent: str):
+        super().__init__(
+            f"Chain reorg on {network} at block {block_number}: "
+            f"parent {parent} doesn't match scanned block {expected_parent}"
+        )
+        self.network = network
+        self.block_number = block_number
+
+
+def load_checkpoint(db, network: str, scope: str):
+    """Get the saved scan checkpoint for (network, scope), or None"""
+    from models import ScanCheckpoint
+    return db.get(ScanCheckpoint, (network, scope))
+
+
+def save_checkpoint(db, network: str, scope: str, block_number: int, block_hash: str = None):
+    """
+    Record the last fully scanned block for (network, scope)
+    
+    Adds to the session without committing - commit together with the
+    deposits found up to that block.
+    """
+    from models import ScanCheckpoint
+    
+    checkpoint = db.get(ScanCheckpoint, (network, scope))
+    if checkpoint is None:
+        checkpoint = ScanCheckpoint(network=network, scope=scope, last_block=block_number)
+        db.add(checkpoint)
+    checkpoint.last_block = block_number
+    checkpoint.last_block_hash = block_hash
+    return checkpoint
+
+
+class AddressIndex:
+    """In-memory hash index of custodial addresses (lowercased) -> wallet ID"""
+    
+    def __init__(self, addresses: Dict[str, Optional[str]] = None):
+        """
+        Initialize index
+        
+        Args:
+            addresses: Mapping of address -> wallet ID
+        """
+        self._wallets: Dict[str, Optional[str]] = {}
+        for address, wallet_id in (addresses or {}).items():
+            self.add(address, wallet_id)
+    
+    @classmethod
+    def from_db(cls, db, currency_code: str = None) -> 'AddressIndex':
+        """
+        Load every custodial wallet address from the database
+        
+        Args:
+            db: Database session
+            currency_code: Only wallets of this currency (e.g. 'ETH', 'MATIC')
+        
+        Returns:
+            AddressIndex of all matching wallets
+        """
+        from models import Wallet
+        
+        query = db.query(Wallet.id, Wallet.address).filter(Wallet.address.isnot(None))
+        if currency_code:
+            query = query.filter(Wallet.currency_code == currency_code)
+        return cls({address: wallet_id for wallet_id, address in query.all()})
+    
+    def add(self, address: str, wallet_id: Optional[str] = None):
+        self._wallets[address.lower()] = wallet_id
+    
+    def wallet_id(self, address: str) -> Optional[str]:
+        return self._wallets.get(address.lower())
+    
+    @property
+    def addresses(self) -> Iterable[str]:
+        return self._wallets.keys()
+    
+    def __contains__(self, address: str) -> bool:
+        return address.lower() in self._wallets
+    
+    def __len__(self) -> int:
+        return len(self._wallets)
+
 
 class TransactionScanner:
     """Scan blockchain for transactions using Web3/Infura"""
     
-    # Network configurations
+    # Network configurations (RPC endpoints come from BlockchainService.NETWORKS / the shared pool)
     NETWORKS = {
         'sepolia': {
-            'rpc_url': os.getenv("SEPOLIA_RPC_URL", "https://sepolia.infura.io/v3/01888b56d7994053a61d869173139fb2"),
             'name': 'Sepolia Testnet',
             'currency': 'ETH'
         },
         'amoy': {
-            'rpc_url': os.getenv("AMOY_RPC_URL", "https://polygon-amoy.infura.io/v3/01888b56d7994053a61d869173139fb2"),
             'name': 'Amoy Testnet',
             'currency': 'MATIC'
         }
     }
     
-    def __init__(self, network: str = 'sepolia', rpc_url: str = None):
+    def __init__(
+        self,
+        network: str = 'sepolia',
+        rpc_url: str = None,
+        batch_size: int = SCAN_BATCH_SIZE,
+        concurrency: int = SCAN_CONCURRENCY,
+        calls_per_second: float = SCAN_CALLS_PER_SECOND
+    ):
         """
         Initialize scanner with Web3 provider
         
         Args:
             network: Network name ('sepolia' or 'amoy')
             rpc_url: Custom RPC URL (overrides network config)
+            batch_size: Blocks requested per JSON-RPC batch
+            concurrency: Batches in flight at once
+            calls_per_second: RPC call budget for block fetching (0 = unlimited)
         """
         self.network = network.lower() if network else 'sepolia'
         
-        # Use custom RPC URL or get from network config
-        if rpc_url:
-            self.rpc_url = rpc_url
-        elif self.network in self.NETWORKS:
-            self.rpc_url = self.NETWORKS[self.network]['rpc_url']
-        else:
+        if self.network not in self.NETWORKS:
             logger.warning(f"Unknown network '{self.network}', defaulting to Sepolia")
             self.network = 'sepolia'
-            self.rpc_url = self.NETWORKS['sepolia']['rpc_url']
         
-        self.w3 = Web3(Web3.HTTPProvider(self.rpc_url))
+        # Use custom RPC URL or the network's shared provider pool
+        if rpc_url:
+            self.pool = RPCPool(self.network, [rpc_url])
+        else:
+            self.pool = get_rpc_pool(self.network)
+        
+        self.w3 = Web3(self.pool.provider())
+        self.head = get_head_tracker(self.network)
+        
+        self.batch_size = max(1, min(batch_size, RPC_BATCH_LIMIT))
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = TokenBucket(calls_per_second)
+        self.block_receipts_supported: Optional[bool] = None  # eth_getBlockReceipts, learned on first use
+        
+        # Fetch threads live as long as the scanner, so scans start with warm threads and connections
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # Finalized blocks are read from / written to the on-disk cache when enabled
+        self.block_cache = get_block_cache(self.network)
+        self.finality_depth = finality_depth(self.network)
         logger.info(f"🌐 Connected to {self.NETWORKS.get(self.network, {}).get('name', 'Unknown')}: {self.w3.is_connected()}")
     
     def get_incoming_transactions(self, address: str, from_block: int = 0, to_block: str = "latest") -> List[Dict]:
         """
-        Get incoming transactions for an address using eth_getLogs
+        Get incoming transactions for an address
         
         Args:
             address: Ethereum address to scan
@@ -70,66 +195,409 @@ class TransactionScanner:
             List of incoming transaction dictionaries
         """
         try:
-            address = Web3.to_checksum_address(address)
+            index = AddressIndex({address: None})
+            return self.scan_blocks(index, from_block=from_block, to_block=to_block)
+        except Exception as e:
+            logger.error(f"❌ Error scanning transactions: {e}")
+            return []
+    
+    def scan_blocks(self, index: 'AddressIndex', from_block: int = 0, to_block: Union[int, str] = "latest") -> List[Dict]:
+        """
+        Scan a block range once for deposits to any address in the index
+        
+        Each block is downloaded a single time and every transaction's recipient
+        is looked up in the index's hash set, so the cost grows with the number
+        of blocks, not blocks x wallets.
+        
+        Args:
+            index: Custodial addresses to match (see AddressIndex.from_db)
+            from_block: Starting block number (0 = last 10000 blocks)
+            to_block: Ending block (number or "latest")
+            
+        Returns:
+            List of deposit dictionaries, each tagged with the receiving wallet_id
+        """
+        return self._scan(index, from_block, to_block)['deposits']
+    
+    def _scan(
+        self,
+        index: 'AddressIndex',
+        from_block: int,
+        to_block: Union[int, str],
+        parent_hash: str = None,
+        keep_hashes: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Scan blocks in order, stopping at the first block that can't be read
+        
+        Args:
+            index: Addresses to match
+            from_block: Starting block number (0 = last 10000 blocks)
+            to_block: Ending block (number or "latest")
+            parent_hash: Hash of block from_block - 1, if known. Every block
+                must build on the one before it, or ChainReorgError is raised.
+            keep_hashes: Return (number, hash, parent_hash) of this many of
+                the last scanned blocks
+        
+        Returns:
+            Dict with deposits, last_block and last_hash (last fully processed
+            block, None if nothing was processed) and blocks (kept hashes)
+        """
+        # Get current block (cached by the head tracker)
+        current_block = self.head.block_number()
+        logger.info(f"📊 Current block: {current_block}")
+        
+        end_block = current_block if to_block == "latest" else min(int(to_block), current_block)
+        
+        # If from_block is 0, start from recent blocks (last 10000)
+        if from_block == 0:
+            from_block = max(0, end_block - 10000)
+        
+        logger.info(f"🔍 Scanning blocks {from_block} to {end_block} for {len(index)} address(es)...")
+        
+        currency = self.NETWORKS.get(self.network, {}).get('currency', 'ETH')
+        deposits = []
+        last_block, last_hash = None, None
+        recent = deque(maxlen=keep_hashes)
+        
+        for block in self.iter_blocks(from_block, end_block, index):
+            block_num = int(block['number'], 16)
+            block_hash = block['hash'].lower()
+            
+            expected_parent = last_hash or parent_hash
+            if expected_parent and block['parentHash'].lower() != expected_parent:
+                raise ChainReorgError(self.network, block_num, expected_parent, block['parentHash'])
+            
+            try:
+                # Receipts were fetched by the pipeline for blocks with matches
+                block_deposits = []
+                for tx in self._matching_transactions(block, index):
+                    value = int(tx['value'], 16)
+                    receipt = block['receipts'][tx['hash'].lower()]
+                    
+                    if int(receipt['status'], 16) == 1:  # Successful transaction
+                        to_address = Web3.to_checksum_address(tx['to'])
+                        block_deposits.append({
+                            'wallet_id': index.wallet_id(to_address),
+                            'tx_hash': tx['hash'],
+                            'from_address': Web3.to_checksum_address(tx['from']),
+                            'to_address': to_address,
+                            'amount': Decimal(value) / Decimal(10**18),
+                            'block_number': block_num,
+                            'block_hash': block_hash,
+                            'timestamp': datetime.fromtimestamp(int(block['timestamp'], 16)),
+                            'gas_used': int(receipt['gasUsed'], 16),
+                            'gas_price': int(tx['gasPrice'], 16) if tx.get('gasPrice') else None,
+                            'confirmations': current_block - block_num
+                        })
+                        
+                        logger.info(f"  💰 Found deposit: {value / 10**18} {currency} to {to_address[:10]}... in block {block_num}")
             
-            # Get current block
-            current_block = self.w3.eth.block_number
-            logger.info(f"📊 Current block: {current_block}")
+            except Exception as e:
+                # Stop here so a resumed scan retries this block instead of skipping it
+                logger.warning(f"⚠️ Error processing block {block_num}, stopping scan there: {e}")
+                break
             
-            # If from_block is 0, start from recent blocks (last 10000)
-            if from_block == 0:
-                from_block = max(0, current_block - 10000)
+            deposits.extend(block_deposits)
+            last_block, last_hash = block_num, block_hash
+            if keep_hashes:
+                recent.append((block_num, block_hash, block['parentHash'].lower()))
+        
+        logger.info(f"✅ Found {len(deposits)} incoming transactions")
+        return {
+            'deposits': deposits,
+            'last_block': last_block,
+            'last_hash': last_hash,
+            'blocks': list(recent)
+        }
+    
+    @staticmethod
+    def _matching_transactions(block: Dict[str, Any], index: 'AddressIndex') -> List[Dict[str, Any]]:
+        """Transactions in a raw block that send value to an indexed address"""
+        return [
+            tx for tx in block['transactions']
+            if tx.get('to') and tx['to'] in index and int(tx['value'], 16) > 0
+        ]
+    
+    def _batch(self, calls: List[Tuple[str, list]], keys: List[Any]) -> Dict[Any, Any]:
+        """Send one JSON-RPC batch within the call budget and key the results"""
+        self.rate_limiter.acquire(len(calls))
+        return read_batch_results(self.w3.provider.make_batch_request(calls), keys)
+    
+    def _fetch_receipts(self, matched: Dict[int, List[str]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Fetch receipts for the blocks that contain matches
+        
+        Uses one eth_getBlockReceipts call per block where the node supports
+        it, otherwise one eth_getTransactionReceipt per matched transaction -
+        either way sent as a single batch.
+        
+        Args:
+            matched: Block number -> matched transaction hashes
             
-            logger.info(f"🔍 Scanning blocks {from_block} to {to_block}...")
+        Returns:
+            Block number -> {lowercased tx hash: raw receipt}
+        """
+        receipts: Dict[int, Dict[str, Any]] = {}
+        missing = list(matched)
+        
+        if self.block_receipts_supported is not False:
+            results = self._batch([('eth_getBlockReceipts', [hex(n)]) for n in missing], missing)
+            for n, block_receipts in results.items():
+                if block_receipts is not None:
+                    receipts[n] = {r['transactionHash'].lower(): r for r in block_receipts}
+            
+            if not receipts and self.block_receipts_supported is None:
+                logger.info(f"ℹ️ eth_getBlockReceipts unavailable on {self.network}, using per-transaction receipts")
+                self.block_receipts_supported = False
+            elif receipts:
+                self.block_receipts_supported = True
+            missing = [n for n in missing if n not in receipts]
+        
+        if missing:
+            keys = [(n, tx_hash) for n in missing for tx_hash in matched[n]]
+            results = self._batch([('eth_getTransactionReceipt', [tx_hash]) for _, tx_hash in keys], keys)
+            for (n, tx_hash), receipt in results.items():
+                if receipt is not None:
+                    receipts.setdefault(n, {})[tx_hash.lower()] = receipt
+        
+        return receipts
+    
+    def _fetch_batch(
+        self,
+        block_numbers: List[int],
+        index: Optional['AddressIndex'] = None,
+        bloom: Optional[BloomQuery] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Fetch blocks with one JSON-RPC batch request
+        
+        With an index, blocks holding matching transactions also get their
+        receipts attached under 'receipts' (one more batch per call, and only
+        for those blocks). With a bloom query, only headers are fetched and
+        blocks whose logsBloom may match get all their receipts attached.
+        
+        Blocks in the block cache are read from disk (with their cached
+        receipts) and only missing receipts go to the node. Finalized blocks
+        fetched with full transactions are added to the cache.
+        
+        Returns:
+            Raw blocks in order, cut short at the first block the node
+            didn't return (error, not yet mined, or a receipt missing)
+        """
+        cached = self.block_cache.get_many(block_numbers) if self.block_cache else {}
+        
+        to_fetch = [n for n in block_numbers if n not in cached]
+        results = {}
+        if to_fetch:
+            calls = [('eth_getBlockByNumber', [hex(n), bloom is None]) for n in to_fetch]
+            results = self._batch(calls, to_fetch)
+        
+        blocks = []
+        for n in block_numbers:
+            block = cached.get(n) or results.get(n)
+            if block is None:
+                break
+            blocks.append(block)
+        
+        matched = {}
+        if bloom is not None:
+            # Header-only pass: transactions are hashes here (objects for cached blocks)
+            for block in blocks:
+                if block['transactions'] and bloom.matches(block['logsBloom']):
+                    matched[int(block['number'], 16)] = [
+                        tx if isinstance(tx, str) else tx['hash'] for tx in block['transactions']
+                    ]
+        elif index is not None:
+            for block in blocks:
+                hashes = [tx['hash'] for tx in self._matching_transactions(block, index)]
+                if hashes:
+                    matched[int(block['number'], 16)] = hashes
+        
+        # Cached blocks may already hold the receipts we need
+        missing = {
+            n: hashes for n, hashes in matched.items()
+            if any(tx_hash.lower() not in cached.get(n, {}).get('receipts', {}) for tx_hash in hashes)
+        }
+        receipts = self._fetch_receipts(missing) if missing else {}
+        
+        for i, block in enumerate(blocks):
+            n = int(block['number'], 16)
+            if n not in missing:
+                continue
+            block_receipts = dict(block.get('receipts', {}), **receipts.get(n, {}))
+            if any(tx_hash.lower() not in block_receipts for tx_hash in missing[n]):
+                # Don't hand out a block with an unknown deposit status
+                blocks = blocks[:i]
+                break
+            block['receipts'] = block_receipts
+        
+        if self.block_cache:
+            self._cache_blocks(blocks, cached, set(missing))
+        return blocks
+    
+    def _cache_blocks(self, blocks: List[Dict[str, Any]], cached: Dict[int, Dict[str, Any]], new_receipts: set):
+        """Store finalized blocks that are new to the cache or gained receipts"""
+        final = self.head.block_number() - self.finality_depth
+        for block in blocks:
+            n = int(block['number'], 16)
+            if n > final:
+                break
+            if n in cached:
+                if n in new_receipts:
+                    self.block_cache.put(block)
+            elif block['transactions'] and isinstance(block['transactions'][0], str):
+                continue  # Header only - nothing to rescan from
+            else:
+                self.block_cache.put(block)
+    
+    def iter_blocks(
+        self,
+        from_block: int,
+        to_block: int,
+        index: Optional['AddressIndex'] = None,
+        bloom: Optional[BloomQuery] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream blocks in order through a bounded fetch pipeline
+        
+        Blocks are requested batch_size per JSON-RPC batch with up to
+        concurrency batches in flight, within the rate limiter's budget.
+        Blocks are yielded strictly in block order; the stream ends early at
+        the first block that couldn't be fetched.
+        
+        Args:
+            from_block: First block number
+            to_block: Last block number (inclusive)
+            index: If given, blocks with transactions to these addresses
+                carry their receipts under 'receipts' (keyed by lowercased tx hash)
+            bloom: If given, only headers are downloaded, and blocks whose
+                logsBloom may match carry all their receipts under 'receipts'
             
-            # Get all blocks in range and check transactions
-            incoming_txs = []
+        Yields:
+            Raw block dicts (hex-encoded fields; full transactions unless
+            scanning by bloom)
+        """
+        batches = iter([
+            list(range(start, min(start + self.batch_size, to_block + 1)))
+            for start in range(from_block, to_block + 1, self.batch_size)
+        ])
+        
+        executor = self.executor
+        in_flight = deque()
+        try:
+            for batch in batches:
+                in_flight.append((batch, executor.submit(self._fetch_batch, batch, index, bloom)))
+                if len(in_flight) >= self.concurrency:
+                    break
             
-            # Scan in chunks to avoid timeout
-            chunk_size = 1000
-            for start in range(from_block, current_block + 1, chunk_size):
-                end = min(start + chunk_size - 1, current_block)
+            while in_flight:
+                batch, future = in_flight.popleft()
+                try:
+                    blocks = future.result()
+                except Exception as e:
+                    logger.warning(f"⚠️ Error fetching blocks {batch[0]}-{batch[-1]}: {e}")
+                    return
                 
-                logger.info(f"  Scanning chunk {start} to {end}...")
+                # Keep the pipeline full while this batch is matched
+                next_batch = next(batches, None)
+                if next_batch is not None:
+                    in_flight.append((next_batch, executor.submit(self._fetch_batch, next_batch, index, bloom)))
                 
-                # Get blocks in this range
-                for block_num in range(start, end + 1):
-                    try:
-                        block = self.w3.eth.get_block(block_num, full_transactions=True)
-                        
-                        # Check each transaction in the block
-                        for tx in block.transactions:
-                            # Check if this is an incoming transaction
-                            if tx.to and tx.to.lower() == address.lower() and tx.value > 0:
-                                # Get transaction receipt for status
-                                receipt = self.w3.eth.get_transaction_receipt(tx.hash)
-                                
-                                if receipt.status == 1:  # Successful transaction
-                                    currency = self.NETWORKS.get(self.network, {}).get('currency', 'ETH')
-                                    incoming_txs.append({
-                                        'tx_hash': tx.hash.hex(),
-                                        'from_address': tx['from'],
-                                        'to_address': tx.to,
-                                        'amount': Decimal(tx.value) / Decimal(10**18),
-                                        'block_number': tx.blockNumber,
-                                        'timestamp': datetime.fromtimestamp(block.timestamp),
-                                        'gas_used': receipt.gasUsed,
-                                        'gas_price': tx.gasPrice,
-                                        'confirmations': current_block - tx.blockNumber
-                                    })
-                                    
-                                    logger.info(f"  💰 Found deposit: {tx.value / 10**18} {currency} in block {tx.blockNumber}")
-                    
-                    except Exception as e:
-                        logger.debug(f"Error checking block {block_num}: {e}")
-                        continue
+                yield from blocks
+                if len(blocks) < len(batch):
+                    logger.warning(f"⚠️ Block {batch[len(blocks)]} unavailable, stopping scan there")
+                    return
+        finally:
+            # Drop prefetched batches nobody will read
+            for _, future in in_flight:
+                future.cancel()
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """The scanner's fetch thread pool (created on first use, again after close())"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"scan-{self.network}")
+            return self._executor
+    
+    def close(self):
+        """Shut down the fetch threads"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+    
+    def get_block_hashes(self, block_numbers: List[int]) -> Dict[int, str]:
+        """
+        Get the canonical hashes of blocks (headers only, batched)
+        
+        Args:
+            block_numbers: Block numbers
+            
+        Returns:
+            Dict of block number -> lowercased hash. Blocks the node didn't
+            return are left out.
+        """
+        hashes = {}
+        for chunk in chunked(list(block_numbers), self.batch_size):
+            results = self._batch([('eth_getBlockByNumber', [hex(n), False]) for n in chunk], chunk)
+            for n, block in results.items():
+                if block is not None:
+                    hashes[n] = block['hash'].lower()
+        return hashes
+    
+    def scan_from_checkpoint(self, db, index: 'AddressIndex', scope: str, keep_hashes: int = 0) -> Dict[str, Any]:
+        """
+        Scan from the block after the saved checkpoint up to the head, then move the checkpoint
+        
+        The checkpoint is added to the session but not committed, so the caller
+        can commit it together with the deposits it stores. If the chain no
+        longer builds on the checkpoint's block hash, ChainReorgError is raised
+        and the checkpoint is left alone.
+        
+        Args:
+            db: Database session
+            index: Addresses to match
+            scope: Checkpoint scope (wallet ID, or a name for multi-wallet scans)
+            keep_hashes: Also return this many of the last scanned block hashes
             
-            logger.info(f"✅ Found {len(incoming_txs)} incoming transactions")
-            return incoming_txs
+        Returns:
+            Dict with deposits (tagged with wallet_id), last_block, last_hash and blocks
+        """
+        checkpoint = load_checkpoint(db, self.network, scope)
+        from_block = checkpoint.last_block + 1 if checkpoint else 0
+        
+        if checkpoint and from_block > self.head.block_number():
+            logger.info(f"⏭️ {self.network}/{scope} already scanned up to block {checkpoint.last_block}")
+            return {'deposits': [], 'last_block': None, 'last_hash': None, 'blocks': []}
+        
+        result = self._scan(
+            index, from_block, "latest",
+            parent_hash=checkpoint.last_block_hash if checkpoint else None,
+            keep_hashes=keep_hashes
+        )
+        if result['last_block'] is not None:
+            save_checkpoint(db, self.network, scope, result['last_block'], result['last_hash'])
+        return result
+    
+    def scan_custodial_deposits(self, db, from_block: int = 0, to_block: Union[int, str] = "latest") -> List[Dict]:
+        """
+        Scan a block range once for deposits to every custodial wallet on this network
+        
+        Args:
+            db: Database session (wallet addresses are loaded from Wallet.address)
+            from_block: Starting block number
+            to_block: Ending block (number or "latest")
             
-        except Exception as e:
-            logger.error(f"❌ Error scanning transactions: {e}")
+        Returns:
+            List of deposit dictionaries tagged with wallet_id
+        """
+        currency = self.NETWORKS.get(self.network, {}).get('currency', 'ETH')
+        index = AddressIndex.from_db(db, currency_code=currency)
+        if not index:
             return []
+        return self.scan_blocks(index, from_block=from_block, to_block=to_block)
     
     def get_recent_deposits(self, address: str, blocks_back: int = 10000) -> List[Dict]:
         """
@@ -142,7 +610,7 @@ class TransactionScanner:
         Returns:
             List of deposit transactions
         """
-        current_block = self.w3.eth.block_number
+        current_block = self.head.block_number()
         from_block = max(0, current_block - blocks_back)
         
         return self.get_incoming_transactions(address, from_block=from_block)
@@ -157,7 +625,7 @@ def get_transaction_scanner(rpc_url: str = None) -> TransactionScanner:
     global _scanner
     
     if _scanner is None:
-        _scanner = TransactionScanner(rpc_url)
+        _scanner = TransactionScanner(rpc_url=rpc_url)
     
     return _scanner
 
@@ -2,6 +2,7 @@
 Wallet Routes
 Handles wallet creation and management endpoints
 """
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
@@ -140,11 +141,11 @@ async def import_wallet(
         encrypted_key = encrypt_private_key(private_key)
         
         # Get blockchain balance
-        from blockchain_service import get_blockchain_service
+        from async_blockchain_service import get_async_blockchain_service
         network_map = {"ETH": "sepolia", "MATIC": "amoy"}
         network = network_map.get(currency_code, "sepolia")
-        blockchain = get_blockchain_service(network)
-        balance = blockchain.get_balance(public_address)
+        blockchain = await get_async_blockchain_service(network)
+        balance = await blockchain.get_balance(public_address)
         
         # Create wallet record
         new_wallet = Wallet(
@@ -249,7 +250,8 @@ async def get_wallet_balance_live(
         }
         network = network_map.get(wallet.currency_code, "mainnet")
         
-        balance_info = get_wallet_balance(wallet.address, network)
+        # Blocking RPC call - keep it off the event loop
+        balance_info = await asyncio.to_thread(get_wallet_balance, wallet.address, network)
         
         return {
             "wallet_id": wallet.id,
@@ -327,7 +329,7 @@ async def sync_wallet_from_blockchain(
         )
     
     # Get blockchain balance
-    from blockchain_service import get_blockchain_service
+    from async_blockchain_service import get_async_blockchain_service
     
     # Map currency to network
     network_map = {
@@ -336,8 +338,8 @@ async def sync_wallet_from_blockchain(
     }
     network = network_map.get(wallet.currency_code, "sepolia")
     
-    blockchain = get_blockchain_service(network)
-    blockchain_balance = blockchain.get_balance(wallet.address)
+    blockchain = await get_async_blockchain_service(network)
+    blockchain_balance = await blockchain.get_balance(wallet.address)
     
     # Update database balance
     wallet.balance = blockchain_balance
@@ -11,6 +11,7 @@ from dotenv import load_dotenv
 
 # Import enterprise-grade encryption
 from crypto_manager import encrypt_private_key, decrypt_private_key, get_crypto_manager
+from http_sessions import RegistrySessionManager, HTTP_TIMEOUT
 
 load_dotenv()
 
@@ -45,6 +46,30 @@ def generate_ethereum_wallet() -> Tuple[str, str]:
     return account.address, private_key
 
 
+# RPC endpoints (you can use Infura, Alchemy, or public RPCs)
+BALANCE_RPC_URLS = {
+    "mainnet": "https://eth.llamarpc.com",  # Public RPC
+    "sepolia": "https://rpc.sepolia.org",
+    "polygon": "https://polygon-rpc.com",
+}
+
+# One Web3 client per network, reused across requests
+_balance_clients: Dict[str, Web3] = {}
+
+
+def get_balance_client(network: str) -> Web3:
+    """Get or create the Web3 client for a network (shared keep-alive session)"""
+    if network not in BALANCE_RPC_URLS:
+        network = "mainnet"
+    
+    if network not in _balance_clients:
+        url = BALANCE_RPC_URLS[network]
+        provider = Web3.HTTPProvider(url, request_kwargs={'timeout': HTTP_TIMEOUT})
+        provider._request_session_manager = RegistrySessionManager()
+        _balance_clients[network] = Web3(provider)
+    return _balance_clients[network]
+
+
 def get_wallet_balance(address: str, network: str = "mainnet") -> Dict:
     """
     Get wallet balance from blockchain
@@ -56,18 +81,10 @@ def get_wallet_balance(address: str, network: str = "mainnet") -> Dict:
     Returns:
         Dict with balance information
     """
-    # RPC endpoints (you can use Infura, Alchemy, or public RPCs)
-    rpc_urls = {
-        "mainnet": "https://eth.llamarpc.com",  # Public RPC
-        "sepolia": "https://rpc.sepolia.org",
-        "polygon": "https://polygon-rpc.com",
-    }
-    
     try:
-        w3 = Web3(Web3.HTTPProvider(rpc_urls.get(network, rpc_urls["mainnet"])))
-        
-        if not w3.is_connected():
-            return {"error": "Failed to connect to network", "balance": "0"}
+        # Reused client - no per-call connection setup or is_connected probe;
+        # an unreachable node surfaces as an exception below
+        w3 = get_balance_client(network)
         
         # Get balance in Wei
         balance_wei = w3.eth.get_balance(address)
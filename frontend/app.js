@@ -1878,6 +1878,9 @@ function copyReceiveAddress() {
     });
 }
 
+// Last block the deposit worker had indexed per wallet, for incremental auto-scans
+const lastIndexedBlock = {};
+
 // Auto-scan for deposits in background (silent, no alerts)
 async function autoScanDeposits() {
     try {
@@ -1891,7 +1894,10 @@ async function autoScanDeposits() {
         // Scan each crypto wallet silently
         for (const wallet of cryptoWallets) {
             try {
-                const response = await fetch(`${API_URL}/api/v1/transactions/scan-deposits/${wallet.id}`, {
+                // Only ask for deposits indexed since the last poll
+                const since = lastIndexedBlock[wallet.id];
+                const query = since !== undefined ? `?since_block=${since}` : '';
+                const response = await fetch(`${API_URL}/api/v1/transactions/scan-deposits/${wallet.id}${query}`, {
                     method: 'POST',
                     headers: {
                         'Authorization': `Bearer ${authToken}`,
@@ -1900,6 +1906,9 @@ async function autoScanDeposits() {
                 });
                 
                 const data = await response.json();
+                if (response.ok && data.indexed_block !== null) {
+                    lastIndexedBlock[wallet.id] = data.indexed_block;
+                }
                 
                 if (response.ok && data.deposits_found > 0) {
                     console.log(`💰 Auto-detected ${data.deposits_found} new deposit(s) in ${wallet.currency_code} wallet!`);
@@ -1920,13 +1929,14 @@ async function autoScanDeposits() {
     }
 }
 
-// Scan for incoming deposits using Etherscan API (manual button)
+// Show deposits indexed for a wallet (manual button)
 async function scanForDeposits(walletId) {
     try {
         // Show scanning indicator
         console.log('🔍 Scanning blockchain for deposits...');
         
-        const response = await fetch(`${API_URL}/api/v1/transactions/scan-deposits/${walletId}`, {
+        // Wait until the deposit worker has caught up with the chain head
+        const response = await fetch(`${API_URL}/api/v1/transactions/scan-deposits/${walletId}?wait=true`, {
             method: 'POST',
             headers: {
                 'Authorization': `Bearer ${authToken}`,
@@ -1947,7 +1957,7 @@ async function scanForDeposits(walletId) {
             // Then show results
             if (data.deposits_found > 0) {
                 const depositList = data.deposits.map(d => 
-                    `  💰 ${d.amount} ETH from ${d.from.substring(0, 10)}...`
+                    `  💰 ${d.amount} ${data.currency} (${d.status}) - ${d.description}`
                 ).join('\n');
                 
                 alert(
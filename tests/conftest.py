@@ -0,0 +1,74 @@
+"""
+Shared Test Fixtures
+Scratch SQLite database per test (never the one from .env) and a wallet factory
+"""
+import os
+import sys
+import uuid
+import tempfile
+from decimal import Decimal
+
+import pytest
+
+# Placeholder until a test binds its own database - set before database.py reads it
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='dpg-test-'), 'unused.db')}"
+
+# Add backend directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    """Bind SessionLocal to a fresh SQLite file in tmp_path with every table created"""
+    from sqlalchemy import create_engine
+    import database
+    import models  # noqa: F401 - registers the tables on Base
+    
+    engine = create_engine(f"sqlite:///{tmp_path / 'dpg.db'}", connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(bind=engine)
+    database.SessionLocal.configure(bind=engine)
+    try:
+        yield engine
+    finally:
+        database.SessionLocal.configure(bind=database.engine)
+        engine.dispose()
+
+
+@pytest.fixture
+def db(scratch_db):
+    """Session on the scratch database"""
+    from database import SessionLocal
+    
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def make_wallet(scratch_db):
+    """
+    Factory for crypto wallets with a committed transaction history
+    
+    Call as make_wallet(db, currency='ETH', history=[(type, status, amount, fee, on_chain, network), ...])
+    """
+    from models import User, Wallet, WalletType, Transaction
+    
+    def make(db, currency: str = 'ETH', history: list = ()) -> Wallet:
+        user = User(email=f"test{uuid.uuid4().hex[:10]}@example.com", password_hash='x')
+        db.add(user)
+        db.flush()
+        wallet = Wallet(user_id=user.id, currency_code=currency, wallet_type=WalletType.CRYPTO,
+                        balance=Decimal('0'), address='0x' + uuid.uuid4().hex + uuid.uuid4().hex[:8])
+        db.add(wallet)
+        db.flush()
+        for tx_type, status, amount, fee, on_chain, network in history:
+            db.add(Transaction(wallet_id=wallet.id, type=tx_type, status=status, amount=Decimal(amount),
+                               fee=Decimal(fee), tx_hash='0x' + uuid.uuid4().hex * 2 if on_chain else None,
+                               network=network))
+        db.commit()
+        return wallet
+    
+    return make
@@ -0,0 +1,126 @@
+"""
+Balance Reconciler Tests
+Ledger math behind expected balances, receipt fees stored by the monitor,
+and drift reports against scripted on-chain balances
+No Infura key or running API server needed: python -m pytest tests/test_balance_reconciler.py
+"""
+import asyncio
+from decimal import Decimal
+
+import balance_reconciler
+from balance_reconciler import BalanceReconciler, expected_balances_query
+from transaction_monitor import TransactionMonitor
+from models import Wallet, Transaction, TransactionType, TransactionStatus
+
+DEPOSIT, WITHDRAWAL = TransactionType.DEPOSIT, TransactionType.WITHDRAWAL
+PENDING, COMPLETED, FAILED = TransactionStatus.PENDING, TransactionStatus.COMPLETED, TransactionStatus.FAILED
+
+
+def expected(db, wallet_ids) -> dict:
+    rows = expected_balances_query(db, 'ETH', 'sepolia').filter(Wallet.id.in_(wallet_ids)).all()
+    return {wallet_id: (Decimal(str(amount)).quantize(Decimal('1e-9')), in_flight)
+            for wallet_id, _, amount, in_flight in rows}
+
+
+def test_ledger_counts_only_on_chain_rows_of_the_network(db, make_wallet):
+    wallet = make_wallet(db, history=[
+        (DEPOSIT, COMPLETED, '2', '0', True, 'sepolia'),
+        (DEPOSIT, PENDING, '0.3', '0', True, 'sepolia'),       # Mined, waiting for confirmations
+        (DEPOSIT, COMPLETED, '100', '0', False, 'sepolia'),    # /deposit ledger entry
+        (WITHDRAWAL, COMPLETED, '5', '0', False, 'sepolia'),   # /withdraw ledger entry
+        (WITHDRAWAL, COMPLETED, '0.5', '0.01', True, 'sepolia'),
+        (WITHDRAWAL, FAILED, '1', '0.002', True, 'sepolia'),   # Reverted - only gas spent
+        (DEPOSIT, COMPLETED, '3', '0', True, 'mainnet'),
+        (DEPOSIT, COMPLETED, '0.25', '0', True, None),         # Recorded before networks were stored
+    ])
+    empty = make_wallet(db, history=[])
+    sending = make_wallet(db, history=[
+        (DEPOSIT, COMPLETED, '1', '0', True, 'sepolia'),
+        (WITHDRAWAL, PENDING, '0.4', '0.001', True, 'sepolia'),
+        (WITHDRAWAL, PENDING, '9', '0', False, 'sepolia'),     # Internal, never in flight
+    ])
+    
+    assert expected(db, [wallet.id, empty.id, sending.id]) == {
+        wallet.id: (Decimal('2.038'), 0),
+        empty.id: (Decimal('0'), 0),
+        sending.id: (Decimal('0.599'), 1),
+    }
+
+
+def test_resolved_withdrawal_keeps_the_receipt_fee(db, make_wallet):
+    wallet = make_wallet(db, history=[
+        (DEPOSIT, COMPLETED, '1', '0', True, 'sepolia'),
+        (WITHDRAWAL, PENDING, '0.4', '0.001', True, 'sepolia'),  # Estimate quoted by /send
+        (WITHDRAWAL, PENDING, '0.1', '0.001', True, 'sepolia'),
+    ])
+    confirmed, failed = [tx.id for tx in db.query(Transaction).filter(
+        Transaction.wallet_id == wallet.id, Transaction.type == WITHDRAWAL).order_by(Transaction.amount.desc())]
+    
+    updated = TransactionMonitor().apply_outcomes({confirmed: 'confirmed', failed: 'failed'},
+                                                  fees={confirmed: Decimal('0.00042')},
+                                                  blocks={confirmed: 100, failed: 90})
+    assert updated == {'confirmed': 1, 'failed': 1}
+    
+    db.expire_all()
+    fees = {tx.id: (tx.status, Decimal(str(tx.fee))) for tx in db.query(Transaction).filter(Transaction.id.in_([confirmed, failed]))}
+    assert fees[confirmed] == (COMPLETED, Decimal('0.00042'))
+    assert fees[failed] == (FAILED, Decimal('0.001'))  # No receipt fee given - estimate kept
+    assert expected(db, [wallet.id]) == {wallet.id: (Decimal('0.59858'), 0)}
+    
+    # The wallet was debited the 0.001 estimate at send time - the rest comes back
+    db.refresh(wallet)
+    assert Decimal(str(wallet.balance)) == Decimal('0.00058')
+    
+    # Resolving the same outcome again changes nothing
+    assert TransactionMonitor().apply_outcomes({confirmed: 'confirmed'}, fees={confirmed: Decimal('0')}) == {'confirmed': 0, 'failed': 0}
+
+
+def test_ledger_stops_at_the_compared_block(db, make_wallet):
+    wallet = make_wallet(db, history=[
+        (DEPOSIT, COMPLETED, '1', '0', True, 'sepolia'),
+        (WITHDRAWAL, COMPLETED, '0.4', '0.001', True, 'sepolia'),
+        (WITHDRAWAL, COMPLETED, '0.1', '0.001', True, 'sepolia'),
+    ])
+    rows = db.query(Transaction).filter(Transaction.wallet_id == wallet.id).order_by(Transaction.amount.desc()).all()
+    for tx, block in zip(rows, (80, 100, None)):  # Last one resolved before blocks were stored
+        tx.block_number = block
+    db.commit()
+    
+    def expected_at(block):
+        (_, _, amount, _), = expected_balances_query(db, 'ETH', 'sepolia', block).filter(Wallet.id == wallet.id).all()
+        return Decimal(str(amount)).quantize(Decimal('1e-9'))
+    
+    assert expected_at(None) == Decimal('0.498')
+    assert expected_at(100) == Decimal('0.498')
+    assert expected_at(99) == Decimal('0.899')  # Withdrawal mined at 100 not in the balance at 99 yet
+
+
+def test_reconcile_reports_drift(db, make_wallet):
+    matching = make_wallet(db, history=[(DEPOSIT, COMPLETED, '1.5', '0', True, 'sepolia')])
+    drifted = make_wallet(db, history=[(DEPOSIT, COMPLETED, '2', '0', True, 'sepolia')])
+    in_flight = make_wallet(db, history=[(WITHDRAWAL, PENDING, '1', '0', True, 'sepolia')])
+    ours = {matching.id, drifted.id, in_flight.id}
+    onchain = {matching.address: Decimal('1.5'), drifted.address: Decimal('1.75'), in_flight.address: Decimal('0')}
+    
+    class ScriptedChain:
+        async def get_balances(self, addresses, block):
+            return {address: onchain[address] for address in addresses if address in onchain}
+    
+    async def chain(network):
+        return ScriptedChain()
+    
+    reconciler = BalanceReconciler(networks=['sepolia'])
+    reconciler.load_expected = lambda network: (
+        [row for row in BalanceReconciler.load_expected(reconciler, network)[0] if row[0] in ours], 'latest'
+    )
+    original = balance_reconciler.get_async_blockchain_service
+    try:
+        balance_reconciler.get_async_blockchain_service = chain
+        report = asyncio.run(reconciler.reconcile('sepolia'))
+    finally:
+        balance_reconciler.get_async_blockchain_service = original
+    
+    assert (report['checked'], report['drifted'], report['in_flight']) == (2, 1, 1)
+    assert report['drifts'][0]['wallet_id'] == drifted.id
+    assert Decimal(report['drifts'][0]['drift']) == Decimal('-0.25')
+
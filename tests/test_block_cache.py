@@ -0,0 +1,91 @@
+"""
+Block Cache Tests
+Segment files written and read back across segment boundaries and restarts,
+records re-stored with more receipts, and rescans that never reach the node
+No Infura key or running API server needed: python -m pytest tests/test_block_cache.py
+"""
+import os
+
+from block_cache import BlockCache
+from test_rpc_pool import StubNode
+from test_scan_pipeline import get_block, get_block_receipts, tx_hash, WALLET
+from transaction_scanner import TransactionScanner, AddressIndex
+
+
+def cached_block(number: int, with_receipt: bool = True) -> dict:
+    """A stub-chain block paying our wallet, with its receipt and a token log"""
+    block = get_block([hex(number), True])
+    block['transactions'] = [{'hash': tx_hash(number), 'from': '0x' + '11' * 20, 'to': WALLET,
+                              'value': hex(10 ** 16), 'gasPrice': hex(10 ** 9)}]
+    if with_receipt:
+        receipt, = get_block_receipts([hex(number)])
+        receipt['logs'] = [{'address': '0x' + 'aa' * 20, 'topics': ['0x' + 'dd' * 32], 'data': '0x05', 'logIndex': '0x3'}]
+        block['receipts'] = {tx_hash(number): receipt}
+    return block
+
+
+def test_blocks_round_trip_across_segments_and_restarts(tmp_path):
+    cache = BlockCache('sepolia', directory=str(tmp_path), segment_blocks=100)
+    cache.put_many([cached_block(n) for n in range(95, 106)])
+    
+    # Heights 95-99 and 100-105 live in two segments
+    assert cache.stats()['segments'] == 2
+    assert sorted(os.listdir(tmp_path / 'sepolia')) == ['000000000000.dat', '000000000000.idx',
+                                                        '000000000100.dat', '000000000100.idx']
+    
+    block = cache.get(100)
+    assert (block['number'], block['hash'], block['parentHash']) == (hex(100), cached_block(100)['hash'], cached_block(99)['hash'])
+    assert block['transactions'] == [{'hash': tx_hash(100), 'from': '0x' + '11' * 20, 'to': WALLET,
+                                      'value': hex(10 ** 16), 'gasPrice': hex(10 ** 9)}]
+    receipt = block['receipts'][tx_hash(100)]
+    assert (receipt['status'], receipt['gasUsed']) == ('0x1', hex(21000))
+    assert receipt['logs'][0]['logIndex'] == '0x3' and receipt['logs'][0]['blockHash'] == block['hash']
+    
+    # A new process maps the same files
+    cache.close()
+    reopened = BlockCache('sepolia', directory=str(tmp_path), segment_blocks=100)
+    found = reopened.get_many(range(90, 110))
+    assert sorted(found) == list(range(95, 106))
+    assert found[99]['hash'] == cached_block(99)['hash'] and tx_hash(99) in found[99]['receipts']
+    assert (reopened.hits, reopened.misses) == (11, 9)
+    assert reopened.get(250) is None  # No segment at all
+    reopened.close()
+
+
+def test_restoring_a_height_appends_and_repoints_its_slot(tmp_path):
+    cache = BlockCache('sepolia', directory=str(tmp_path), segment_blocks=100)
+    cache.put(cached_block(42, with_receipt=False))
+    data_file = tmp_path / 'sepolia' / '000000000000.dat'
+    size = data_file.stat().st_size
+    assert cache.get(42)['receipts'] == {}
+    
+    # The deposit's receipt was fetched later - the block is stored again
+    cache.put(cached_block(42))
+    assert data_file.stat().st_size > size  # Appended, the old record is never rewritten
+    assert list(cache.get(42)['receipts']) == [tx_hash(42)]
+    cache.close()
+
+
+def test_rescan_of_cached_history_costs_no_rpc(tmp_path):
+    node = StubNode()
+    node.methods = {'eth_getBlockByNumber': get_block, 'eth_getBlockReceipts': get_block_receipts}
+    
+    class Head:
+        def block_number(self):
+            return 10_000  # Everything scanned is final
+    
+    scanner = TransactionScanner('sepolia', rpc_url=node.url)
+    scanner.head = Head()
+    scanner.block_cache = BlockCache('sepolia', directory=str(tmp_path), segment_blocks=256)
+    index = AddressIndex({WALLET: 'wallet-1'})
+    
+    first = scanner._scan(index, 1, 600)
+    node.requests = node.calls = 0
+    again = scanner._scan(index, 1, 600)
+    scanner.close()
+    scanner.block_cache.close()
+    node.stop()
+    
+    assert node.calls == 0
+    assert again['last_hash'] == first['last_hash'] == get_block([hex(600), True])['hash']
+    assert [d['tx_hash'] for d in again['deposits']] == [d['tx_hash'] for d in first['deposits']] == [tx_hash(250), tx_hash(500)]
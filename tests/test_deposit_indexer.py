@@ -0,0 +1,163 @@
+"""
+Deposit Indexer Tests
+Records, confirms and rolls back deposits against a scratch SQLite database,
+with a scripted chain standing in for the scanner
+No Infura key or running API server needed: python -m pytest tests/test_deposit_indexer.py
+"""
+import uuid
+from decimal import Decimal
+
+from models import Transaction, TransactionType, TransactionStatus, ScanCheckpoint, IndexedBlock
+from deposit_indexer import DepositIndexer
+from token_indexer import TokenTransferIndexer, TRANSFER_TOPIC, address_topic
+from transaction_scanner import TransactionScanner, AddressIndex, ChainReorgError, load_checkpoint
+
+
+class ScriptedScanner:
+    """Stands in for TransactionScanner: a fixed head and canonical block hashes"""
+    
+    NETWORKS = TransactionScanner.NETWORKS
+    
+    def __init__(self, head: int = 1000):
+        self.network = 'sepolia'
+        self.canonical = {}
+        scanner = self
+        
+        class Head:
+            def block_number(self):
+                return scanner.head_number
+        
+        self.head_number = head
+        self.head = Head()
+    
+    def get_block_hashes(self, block_numbers):
+        return {n: self.canonical[n] for n in block_numbers if n in self.canonical}
+
+
+def block_hash(number: int, fork: str = 'a') -> str:
+    return '0x' + fork * 8 + '%056x' % number
+
+
+def transfer_log(token: str, to_address: str, tx_hash: str, log_index: int, value: int, block: int = 900) -> dict:
+    return {
+        'address': token,
+        'topics': [TRANSFER_TOPIC, address_topic('0x' + '77' * 20), address_topic(to_address)],
+        'data': hex(value),
+        'transactionHash': tx_hash,
+        'logIndex': hex(log_index),
+        'blockNumber': hex(block),
+        'blockHash': block_hash(block)
+    }
+
+
+def test_multisend_credits_every_transfer_log(db, make_wallet):
+    wallet = make_wallet(db, 'USDT')
+    tokens = TokenTransferIndexer('sepolia')
+    token = tokens.tokens['USDT']
+    
+    indexes = {'USDT': AddressIndex({wallet.address: wallet.id})}
+    
+    # One multisend tx paying the same wallet three times
+    tx_hash = '0x' + uuid.uuid4().hex * 2
+    logs = [transfer_log(token, wallet.address, tx_hash, i, 5 * 10 ** 6) for i in (3, 4, 7)]
+    deposits = [tokens.parse_transfer(log, indexes, {'USDT': 6}) for log in logs]
+    assert [d['log_index'] for d in deposits] == [3, 4, 7]
+    
+    indexer = DepositIndexer('sepolia', scanner=ScriptedScanner())
+    new = indexer.record_deposits(db, deposits)
+    assert len(new) == 3 and sum(tx.amount for tx in new) == Decimal('15')
+    
+    # Rescanning the same range records nothing twice
+    assert indexer.record_deposits(db, deposits) == []
+    assert db.query(Transaction).filter(Transaction.wallet_id == wallet.id).count() == 3
+
+
+def test_rows_without_log_index_cover_one_log_each(db, make_wallet):
+    wallet = make_wallet(db, 'USDT')
+    tx_hash = '0x' + uuid.uuid4().hex * 2
+    
+    # Recorded before log indexes were stored
+    db.add(Transaction(wallet_id=wallet.id, type=TransactionType.DEPOSIT, amount=Decimal('5'),
+                       status=TransactionStatus.COMPLETED, tx_hash=tx_hash, network='sepolia', block_number=900))
+    db.flush()
+    
+    deposits = [
+        {'wallet_id': wallet.id, 'tx_hash': tx_hash, 'log_index': i, 'amount': Decimal('5'), 'currency': 'USDT',
+         'from_address': '0x' + '77' * 20, 'block_number': 900, 'block_hash': block_hash(900)}
+        for i in (3, 4)
+    ]
+    new = DepositIndexer('sepolia', scanner=ScriptedScanner()).record_deposits(db, deposits)
+    assert [tx.log_index for tx in new] == [4]
+
+
+def test_reorg_rolls_back_credited_and_pending_deposits(db, make_wallet):
+    wallet = make_wallet(db)
+    scanner = ScriptedScanner()
+    indexer = DepositIndexer('sepolia', scanner=scanner)
+    depth = indexer.confirmations
+    head = scanner.head_number = 10_000 + depth
+    first = head - depth - 1
+    fork_point = first - 2
+    
+    # Blocks up to the head on fork 'a'; one deposit deep enough to credit, one at the head
+    blocks = [(n, block_hash(n), block_hash(n - 1)) for n in range(fork_point - 3, head + 1)]
+    scanner.canonical = {n: h for n, h, _ in blocks}
+    deposits = [
+        {'wallet_id': wallet.id, 'tx_hash': '0x' + uuid.uuid4().hex * 2, 'amount': Decimal(amount),
+         'from_address': '0x' + '77' * 20, 'block_number': number, 'block_hash': block_hash(number)}
+        for amount, number in (('1.5', first), ('0.25', head))
+    ]
+    indexer.record_deposits(db, deposits)
+    indexer.record_blocks(db, blocks)
+    db.merge(ScanCheckpoint(network='sepolia', scope=wallet.id, last_block=head, last_block_hash=block_hash(head)))
+    db.flush()
+    
+    confirmed = indexer.confirm_deposits(db, [wallet.id])
+    assert [tx.amount for tx in confirmed] == [Decimal('1.5')]
+    db.refresh(wallet)
+    assert wallet.balance == Decimal('1.5')
+    
+    # Everything above fork_point is replaced by fork 'b'; the first deposit is re-mined there
+    for n in range(fork_point + 1, head + 2):
+        scanner.canonical[n] = block_hash(n, 'b')
+    remined = dict(deposits[0], block_number=head + 1, block_hash=block_hash(head + 1, 'b'))
+    calls = []
+    
+    def scan_from_checkpoint(db, index, scope, keep_hashes=None):
+        calls.append(load_checkpoint(db, 'sepolia', scope).last_block)
+        if len(calls) == 1:
+            raise ChainReorgError('sepolia', head + 1, block_hash(head), block_hash(head, 'b'))
+        return {'deposits': [remined], 'blocks': [(head + 1, block_hash(head + 1, 'b'), block_hash(head, 'b'))],
+                'last_block': head + 1}
+    
+    scanner.scan_from_checkpoint = scan_from_checkpoint
+    result = indexer.index(db, AddressIndex({wallet.address: wallet.id}), wallet.id)
+    
+    # Credit taken back, both orphaned deposits cancelled, scan resumed from the fork point
+    assert calls == [head, fork_point]
+    assert sorted(tx.amount for tx in result['rolled_back']) == [Decimal('0.25'), Decimal('1.5')]
+    assert all(tx.status == TransactionStatus.CANCELLED for tx in result['rolled_back'])
+    db.refresh(wallet)
+    assert wallet.balance == Decimal('0')
+    assert [tx.amount for tx in result['new']] == [Decimal('1.5')]
+    assert db.get(IndexedBlock, ('sepolia', fork_point + 1)) is None
+
+
+def test_confirm_skips_deposits_of_missing_wallets(db, make_wallet):
+    wallet = make_wallet(db)
+    scanner = ScriptedScanner()
+    indexer = DepositIndexer('sepolia', scanner=scanner)
+    number = scanner.head_number - indexer.confirmations
+    scanner.canonical = {number: block_hash(number)}
+    deposits = [
+        {'wallet_id': wallet_id, 'tx_hash': '0x' + uuid.uuid4().hex * 2, 'amount': Decimal('2'),
+         'from_address': '0x' + '77' * 20, 'block_number': number, 'block_hash': block_hash(number)}
+        for wallet_id in (wallet.id, str(uuid.uuid4()))
+    ]
+    indexer.record_deposits(db, deposits)
+    
+    confirmed = indexer.confirm_deposits(db, [d['wallet_id'] for d in deposits])
+    assert [tx.wallet_id for tx in confirmed] == [wallet.id]
+    db.refresh(wallet)
+    assert wallet.balance == Decimal('2')
+
@@ -0,0 +1,207 @@
+"""
+Leader Election Tests
+Lock handoff between electors, advisory lock release, and a deposed
+leader's in-flight indexing run and transaction outcomes being discarded
+No PostgreSQL, Infura key or running API server needed: python -m pytest tests/test_leader_election.py
+"""
+import os
+import uuid
+import asyncio
+import tempfile
+from decimal import Decimal
+
+import leader_election
+import deposit_worker
+from leader_election import AdvisoryLock, FileLock, LeaderElector
+from deposit_worker import DepositWorker
+from transaction_monitor import TransactionMonitor
+from database import SessionLocal
+from models import Wallet, Transaction, TransactionType, TransactionStatus
+
+
+def lock_path() -> str:
+    return os.path.join(tempfile.gettempdir(), f"dpg-test-{uuid.uuid4().hex}.lock")
+
+
+def test_file_lock_is_exclusive_until_released():
+    path = lock_path()
+    first, second = FileLock(path), FileLock(path)
+    try:
+        assert first.try_acquire() and first.is_held()
+        assert not second.try_acquire()
+        
+        first.release()
+        assert not first.is_held()
+        assert second.try_acquire()
+    finally:
+        first.release()
+        second.release()
+        os.remove(path)
+
+
+def test_leadership_passes_to_the_follower():
+    path = lock_path()
+    events = []
+    
+    def elector(name: str) -> LeaderElector:
+        return LeaderElector(lambda: events.append(('elected', name)), lambda: events.append(('deposed', name)),
+                             lock=FileLock(path), retry_seconds=0.01)
+    
+    async def scenario():
+        a, b = elector('a'), elector('b')
+        task_a = asyncio.create_task(a.run())
+        await asyncio.sleep(0.05)
+        task_b = asyncio.create_task(b.run())
+        await asyncio.sleep(0.05)
+        assert a.is_leader and not b.is_leader
+        
+        # Leader steps down (shutdown) - the follower takes over on its next attempt
+        a.stop()
+        await asyncio.sleep(0.05)
+        assert b.is_leader
+        
+        b.stop()
+        await asyncio.gather(task_a, task_b)
+    
+    try:
+        asyncio.run(scenario())
+        assert events == [('elected', 'a'), ('deposed', 'a'), ('elected', 'b'), ('deposed', 'b')]
+    finally:
+        os.remove(path)
+
+
+class RecordingConnection:
+    """Stands in for a pooled SQLAlchemy connection"""
+    
+    def __init__(self, log: list, fail_on: str = None):
+        self.log = log
+        self.fail_on = fail_on
+    
+    def execute(self, statement, params=None):
+        sql = str(statement)
+        self.log.append(sql)
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError('connection reset')
+        
+        class Result:
+            def scalar(self):
+                return True
+        
+        return Result()
+    
+    def commit(self):
+        pass
+    
+    def invalidate(self):
+        self.log.append('invalidate')
+    
+    def close(self):
+        self.log.append('close')
+
+
+def test_advisory_lock_unlocks_before_returning_connection_to_pool():
+    original = leader_election.engine
+    try:
+        log = []
+        leader_election.engine = type('Engine', (), {'connect': lambda self: RecordingConnection(log)})()
+        lock = AdvisoryLock()
+        assert lock.try_acquire()
+        lock.release()
+        assert [entry.split('(')[0] for entry in log] == ['SELECT pg_try_advisory_lock', 'SELECT pg_advisory_unlock', 'close']
+        
+        # An unlock that fails discards the connection, which ends the session and its lock
+        log.clear()
+        leader_election.engine = type('Engine', (), {'connect': lambda self: RecordingConnection(log, 'unlock')})()
+        lock = AdvisoryLock()
+        assert lock.try_acquire()
+        lock.release()
+        assert log[-2:] == ['invalidate', 'close']
+        assert not lock.is_held()
+    finally:
+        leader_election.engine = original
+
+
+def test_deposed_leader_discards_in_flight_indexing(db, make_wallet):
+    wallet_id = make_wallet(db, 'MATIC').id
+    db.close()
+    
+    worker = DepositWorker(networks=['amoy'])
+    worker.running = True
+    
+    class DeposedMidRun:
+        """Records a deposit, and leadership is lost before the run commits"""
+        
+        def index(self, db, index, scope):
+            tx = Transaction(wallet_id=wallet_id, type=TransactionType.DEPOSIT, amount=Decimal('1'),
+                             status=TransactionStatus.PENDING, tx_hash='0x' + uuid.uuid4().hex * 2, network='amoy')
+            db.add(tx)
+            db.flush()
+            worker.stop()
+            return {'new': [tx], 'confirmed': [], 'rolled_back': []}
+    
+    original = deposit_worker.get_deposit_indexer
+    try:
+        deposit_worker.get_deposit_indexer = lambda network: DeposedMidRun()
+        assert worker.index_network('amoy') == {'new': 0, 'confirmed': 0, 'rolled_back': 0}
+    finally:
+        deposit_worker.get_deposit_indexer = original
+    
+    with SessionLocal() as db:
+        assert db.query(Transaction).filter(Transaction.wallet_id == wallet_id).count() == 0
+
+
+def test_leadership_regained_mid_run_still_discards_it(db, make_wallet):
+    wallet_id = make_wallet(db, 'MATIC').id
+    db.close()
+    
+    worker = DepositWorker(networks=['amoy'])
+    worker.running = True
+    
+    class DeposedAndReElected:
+        """Leadership is lost and won back before the run commits"""
+        
+        def index(self, db, index, scope):
+            tx = Transaction(wallet_id=wallet_id, type=TransactionType.DEPOSIT, amount=Decimal('1'),
+                             status=TransactionStatus.PENDING, tx_hash='0x' + uuid.uuid4().hex * 2, network='amoy')
+            db.add(tx)
+            db.flush()
+            worker.stop()
+            worker.networks = []
+            
+            async def re_elected():
+                worker.start()
+            
+            asyncio.run(re_elected())
+            return {'new': [tx], 'confirmed': [], 'rolled_back': []}
+    
+    original = deposit_worker.get_deposit_indexer
+    try:
+        deposit_worker.get_deposit_indexer = lambda network: DeposedAndReElected()
+        assert worker.index_network('amoy') == {'new': 0, 'confirmed': 0, 'rolled_back': 0}
+        assert worker.running
+    finally:
+        deposit_worker.get_deposit_indexer = original
+    
+    with SessionLocal() as db:
+        assert db.query(Transaction).filter(Transaction.wallet_id == wallet_id).count() == 0
+
+
+def test_monitor_drops_outcomes_checked_in_an_earlier_term(db, make_wallet):
+    wallet = make_wallet(db, history=[(TransactionType.WITHDRAWAL, TransactionStatus.PENDING, '1', '0.001', True, 'sepolia')])
+    tx_id = db.query(Transaction.id).filter(Transaction.wallet_id == wallet.id).scalar()
+    
+    monitor = TransactionMonitor()
+    monitor.running = True
+    generation = monitor.generation
+    monitor.stop()
+    monitor.running, monitor.generation = True, monitor.generation + 1  # Re-elected since the check
+    
+    assert monitor.apply_outcomes({tx_id: 'confirmed'}, fees={tx_id: Decimal('0.0004')},
+                                  generation=generation) == {'confirmed': 0, 'failed': 0}
+    db.expire_all()
+    assert db.get(Transaction, tx_id).status == TransactionStatus.PENDING
+    assert db.get(Wallet, wallet.id).balance == Decimal('0')
+    
+    # Checked in the current term - stored
+    assert monitor.apply_outcomes({tx_id: 'confirmed'}, generation=monitor.generation) == {'confirmed': 1, 'failed': 0}
+
@@ -0,0 +1,122 @@
+"""
+Logs Bloom Tests
+Bloom bit math against the yellow paper's byte layout, BloomQuery answers,
+and the token indexer falling back to bloom scans on a node without eth_getLogs
+No Infura key or running API server needed: python -m pytest tests/test_log_bloom.py
+"""
+from web3 import Web3
+
+from test_rpc_pool import StubNode
+from log_bloom import BloomQuery, bloom_mask, hex_bytes
+from token_indexer import TokenTransferIndexer, LogsUnavailableError, TRANSFER_TOPIC, address_topic
+from transaction_scanner import TransactionScanner, AddressIndex
+
+WALLET = Web3.to_checksum_address('0x' + '42' * 20)
+STRANGER = Web3.to_checksum_address('0x' + '77' * 20)
+
+
+def spec_bloom(*items: bytes) -> str:
+    """logsBloom as the yellow paper builds it: 256 bytes, bit 0 is the low bit of the last byte"""
+    bloom = bytearray(256)
+    for item in items:
+        digest = Web3.keccak(item)
+        for i in (0, 2, 4):
+            bit = int.from_bytes(digest[i:i + 2], 'big') & 2047
+            bloom[255 - bit // 8] |= 1 << (bit % 8)
+    return '0x' + bloom.hex()
+
+
+def transfer_bloom(token: str, sender: str, recipient: str) -> str:
+    return spec_bloom(*(hex_bytes(item) for item in (token, TRANSFER_TOPIC, address_topic(sender), address_topic(recipient))))
+
+
+def test_bloom_mask_sets_the_spec_bits():
+    for item in (hex_bytes(WALLET), hex_bytes(TRANSFER_TOPIC), b''):
+        mask = bloom_mask(item)
+        assert '0x' + mask.to_bytes(256, 'big').hex() == spec_bloom(item)
+        assert 1 <= bin(mask).count('1') <= 3
+
+
+def test_bloom_query_needs_token_topic_and_recipient():
+    token, other_token = '0x' + 'aa' * 20, '0x' + 'bb' * 20
+    query = BloomQuery([token], TRANSFER_TOPIC, [address_topic(WALLET)])
+    
+    assert query.matches(transfer_bloom(token, STRANGER, WALLET))
+    assert query.matches(transfer_bloom(token, WALLET, STRANGER))      # False positive: we are the sender
+    assert not query.matches(transfer_bloom(token, STRANGER, STRANGER))
+    assert not query.matches(transfer_bloom(other_token, STRANGER, WALLET))
+    assert not query.matches(spec_bloom(hex_bytes(token), hex_bytes(address_topic(WALLET))))  # No Transfer topic
+    assert not query.matches('0x' + '00' * 256)
+    
+    # No recipients - any Transfer of the token
+    assert BloomQuery([token], TRANSFER_TOPIC).matches(transfer_bloom(token, STRANGER, STRANGER))
+
+
+class BloomChain:
+    """Headers and receipts of a short chain holding a few USDT transfers"""
+    
+    def __init__(self, token: str, transfers: dict):
+        self.token = token
+        self.transfers = transfers      # Block number -> (sender, recipient, value)
+        self.receipt_blocks = []
+    
+    def tx_hash(self, number: int) -> str:
+        return '0x' + '%064x' % (10 ** 6 + number)
+    
+    def get_block(self, params):
+        number, full = int(params[0], 16), params[1]
+        assert not full, "bloom scans download headers only"
+        bloom = transfer_bloom(self.token, *self.transfers[number][:2]) if number in self.transfers else '0x' + '00' * 256
+        return {'number': hex(number), 'hash': '0x' + '%064x' % (number + 1), 'parentHash': '0x' + '%064x' % number,
+                'timestamp': hex(1_700_000_000 + 12 * number), 'logsBloom': bloom,
+                'transactions': [self.tx_hash(number)]}
+    
+    def get_block_receipts(self, params):
+        number = int(params[0], 16)
+        self.receipt_blocks.append(number)
+        sender, recipient, value = self.transfers[number]
+        log = {'address': self.token, 'topics': [TRANSFER_TOPIC, address_topic(sender), address_topic(recipient)],
+               'data': hex(value), 'transactionHash': self.tx_hash(number), 'logIndex': '0x0',
+               'blockNumber': hex(number), 'blockHash': '0x' + '%064x' % (number + 1)}
+        return [{'transactionHash': self.tx_hash(number), 'status': '0x1', 'logs': [log]}]
+
+
+def test_indexer_falls_back_to_bloom_scan_without_eth_getlogs():
+    tokens = TokenTransferIndexer('sepolia', tokens={'USDT': '0x' + 'aa' * 20})
+    chain = BloomChain(tokens.tokens['USDT'], {
+        30: (STRANGER, WALLET, 5 * 10 ** 6),      # Before the fallback - eth_getLogs already covered it
+        120: (STRANGER, WALLET, 7 * 10 ** 6),
+        160: (WALLET, STRANGER, 10 ** 6),         # Bloom false positive: our wallet sent it
+        170: (STRANGER, WALLET, 25 * 10 ** 5),
+    })
+    node = StubNode()
+    node.methods = {'eth_getBlockByNumber': chain.get_block, 'eth_getBlockReceipts': chain.get_block_receipts,
+                    'eth_call': lambda params: '0x' + '%064x' % 6}
+    
+    class Head:
+        def block_number(self):
+            return 200
+    
+    scanner = TransactionScanner('sepolia', rpc_url=node.url)
+    scanner.head, scanner.block_cache = Head(), None
+    tokens.w3, tokens.head, tokens._block_scanner = scanner.w3, Head(), scanner
+    
+    # The first range is served by eth_getLogs, then the node says it doesn't support it
+    get_logs_ranges = []
+    
+    def get_logs(from_block, to_block, topics):
+        get_logs_ranges.append((from_block, to_block))
+        if from_block > 1:
+            raise LogsUnavailableError("eth_getLogs unavailable: method not found")
+        return []
+    
+    tokens._get_logs, tokens.range = get_logs, 50
+    result = tokens.scan({'USDT': AddressIndex({WALLET: 'wallet-1'})}, 1)
+    tokens.close()
+    node.stop()
+    
+    assert get_logs_ranges == [(1, 50), (51, 150)]
+    assert tokens.method == 'bloom'
+    assert result['last_block'] == 200
+    assert [(d['block_number'], str(d['amount'])) for d in result['deposits']] == [(120, '7'), (170, '2.5')]
+    assert chain.receipt_blocks == [120, 160, 170]  # Receipts only for blocks whose bloom may match
@@ -0,0 +1,196 @@
+"""
+Nonce Manager Tests
+Pipelined sends, resync after a nonce conflict, gaps left by rejected
+broadcasts, unknown broadcast outcomes, and /send debits racing deposit
+credits - against a scripted in-process node and a scratch database
+No Infura key or running API server needed: python -m pytest tests/test_nonce_manager.py
+"""
+import asyncio
+import uuid
+from decimal import Decimal
+
+import pytest
+import rlp
+from eth_account import Account
+from web3 import AsyncWeb3
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+from async_blockchain_service import AsyncBlockchainService
+from nonce_manager import NonceManager
+from deposit_indexer import DepositIndexer
+from database import SessionLocal
+from models import SenderNonce, Wallet, Transaction, TransactionType, TransactionStatus
+
+LEGACY_FEES = {'type': 'legacy', 'max_fee_per_gas': 10 ** 9}
+
+
+class ScriptedNode(AsyncJSONBaseProvider):
+    """Answers the calls send_transaction makes; broadcast failures are queued in `faults`"""
+    
+    def __init__(self, pending_count: int = 0):
+        super().__init__()
+        self.pending_count = pending_count
+        self.faults = []          # JSON-RPC error messages, or exceptions to raise
+        self.sent = []            # Nonces of accepted transactions, in arrival order
+        self.count_calls = 0
+    
+    async def make_request(self, method, params):
+        if method == 'eth_getTransactionCount':
+            self.count_calls += 1
+            return {'jsonrpc': '2.0', 'id': 1, 'result': hex(self.pending_count)}
+        assert method == 'eth_sendRawTransaction', method
+        
+        await asyncio.sleep(0)  # Let concurrent sends interleave
+        fault = self.faults.pop(0) if self.faults else None
+        if isinstance(fault, Exception):
+            raise fault
+        if fault:
+            return {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': fault}}
+        
+        nonce = int.from_bytes(rlp.decode(bytes.fromhex(params[0][2:]))[0], 'big')
+        self.sent.append(nonce)
+        self.pending_count = max(self.pending_count, nonce + 1)
+        return {'jsonrpc': '2.0', 'id': 1, 'result': '0x' + '%064x' % len(self.sent)}
+
+
+def service(node: ScriptedNode) -> AsyncBlockchainService:
+    blockchain = AsyncBlockchainService('sepolia')
+    blockchain.w3 = AsyncWeb3(node)
+    return blockchain
+
+
+def send(blockchain: AsyncBlockchainService, account, count: int = 1):
+    """Send `count` transfers from an account concurrently; returns results or exceptions"""
+    async def sends():
+        return await asyncio.gather(*(
+            blockchain.send_transaction(account.key.hex(), '0x' + '42' * 20, Decimal('0.01'),
+                                        fees=LEGACY_FEES, balance_wei=10 ** 19)
+            for _ in range(count)
+        ), return_exceptions=True)
+    return asyncio.run(sends())
+
+
+def stored(account) -> SenderNonce:
+    with SessionLocal() as db:
+        return db.get(SenderNonce, ('sepolia', account.address.lower()))
+
+
+def test_pipelined_sends_take_consecutive_nonces(scratch_db):
+    node, account = ScriptedNode(pending_count=7), Account.create()
+    results = send(service(node), account, count=10)
+    
+    assert all(isinstance(result, dict) for result in results), results
+    assert node.sent == list(range(7, 17))
+    assert node.count_calls == 1  # Only the first send asks the node
+    assert stored(account).next_nonce == 17
+
+
+def test_nonce_conflicts_resync_without_reusing_the_nonce(scratch_db):
+    node, account = ScriptedNode(pending_count=3), Account.create()
+    blockchain = service(node)
+    send(blockchain, account)
+    
+    # Sent from elsewhere meanwhile: nonce 4 is taken (mined, then queued in the mempool)
+    for fault in ('nonce too low: next nonce 5, tx nonce 4', 'replacement transaction underpriced'):
+        node.pending_count += 1
+        node.faults.append(fault)
+        assert isinstance(send(blockchain, account)[0], dict)
+    
+    assert node.sent == [3, 5, 7]
+    assert node.count_calls == 3
+    
+    # A conflict on the retry too is reported, and the nonce still isn't handed out again
+    node.pending_count = 10
+    node.faults += ['nonce too low', 'nonce too low']
+    error, = send(blockchain, account)
+    assert isinstance(error, ValueError) and 'already pending' in str(error)
+    assert stored(account).next_nonce == 10
+
+
+def test_rejected_broadcast_nonce_is_reused(scratch_db):
+    node, account = ScriptedNode(pending_count=0), Account.create()
+    blockchain = service(node)
+    node.faults = [None, 'insufficient funds for gas * price + value']
+    
+    results = send(blockchain, account, count=3)
+    assert [type(result).__name__ for result in results] == ['dict', 'ValueError', 'dict']
+    assert node.sent == [0, 1]  # The rejected nonce went to the next send
+    assert stored(account).next_nonce == 2
+
+
+def test_released_nonce_below_the_counter_becomes_a_gap(scratch_db):
+    manager, address = NonceManager(), '0x' + uuid.uuid4().hex[:40]
+    
+    async def chain_count():
+        return 20
+    
+    async def scenario():
+        reserved = [await manager.reserve('sepolia', address, chain_count) for _ in range(3)]
+        await manager.release('sepolia', address, reserved[1])
+        assert await manager.prime('sepolia', address, chain_count) == 21
+        return reserved, [await manager.reserve('sepolia', address, chain_count) for _ in range(2)]
+    
+    reserved, after = asyncio.run(scenario())
+    assert reserved == [20, 21, 22]
+    assert after == [21, 23]  # Gap filled first, then the counter
+
+
+def test_unknown_broadcast_outcome_keeps_the_nonce(scratch_db):
+    node, account = ScriptedNode(pending_count=4), Account.create()
+    blockchain = service(node)
+    
+    # The node got the transaction but the answer timed out
+    node.faults = [asyncio.TimeoutError('request timed out')]
+    node.pending_count = 5
+    error, = send(blockchain, account)
+    assert isinstance(error, ValueError) and 'outcome unknown' in str(error)
+    assert stored(account) is None  # Next send asks the node
+    
+    # Never 4 again - the chain already counts it
+    send(blockchain, account)
+    assert node.sent == [5]
+    
+    # The node already holds the exact transaction - it was sent
+    node.faults = ['already known']
+    result, = send(blockchain, account)
+    assert isinstance(result, dict) and node.sent == [5]
+    assert stored(account).next_nonce == 7
+
+
+def test_send_debit_and_deposit_credit_both_land(db, make_wallet):
+    wallet = make_wallet(db)
+    wallet_id = wallet.id
+    db.query(Wallet).filter(Wallet.id == wallet_id).update({Wallet.balance: Decimal('5')})
+    deposit = Transaction(wallet_id=wallet_id, type=TransactionType.DEPOSIT, amount=Decimal('2'),
+                          status=TransactionStatus.PENDING, tx_hash='0x' + uuid.uuid4().hex * 2,
+                          network='sepolia', block_number=1, block_hash='0x' + 'ab' * 32)
+    db.add(deposit)
+    db.commit()
+    
+    # /send has read the wallet (balance 5) and is broadcasting...
+    sending = SessionLocal()
+    assert sending.get(Wallet, wallet_id).balance == Decimal('5')
+    
+    # ...while the indexer credits the confirmed deposit
+    class Canonical:
+        network = 'sepolia'
+        
+        def get_block_hashes(self, numbers):
+            return {number: '0x' + 'ab' * 32 for number in numbers}
+        
+        class head:
+            @staticmethod
+            def block_number():
+                return 1000
+    
+    assert DepositIndexer('sepolia', scanner=Canonical()).confirm_deposits(db, [wallet_id])
+    db.commit()
+    
+    # ...then /send debits amount + fee the way the route does
+    sending.query(Wallet).filter(Wallet.id == wallet_id).update(
+        {Wallet.balance: Wallet.balance - Decimal('1.001')}, synchronize_session=False)
+    sending.commit()
+    sending.close()
+    
+    db.expire_all()
+    assert db.get(Wallet, wallet_id).balance == pytest.approx(Decimal('5.999'))
@@ -0,0 +1,89 @@
+"""
+Pending Schedule Tests
+Backoff by age, the interval bounds, sync with the database's pending set,
+and promotion once a sender's confirmed nonce passes a transaction
+No Infura key or running API server needed: python -m pytest tests/test_pending_schedule.py
+"""
+from datetime import datetime, timedelta
+
+from pending_schedule import PendingSchedule
+
+NOW = 1_800_000_000.0
+BLOCK_TIME = 12
+
+
+def sent_ago(seconds: float) -> datetime:
+    """created_at as the database stores it (naive UTC)"""
+    return datetime.utcfromtimestamp(NOW - seconds)
+
+
+def due_ids(schedule: PendingSchedule, now: float) -> list:
+    return sorted(entry['id'] for entry in schedule.pop_due(now))
+
+
+def test_checks_back_off_with_age_between_one_block_and_the_cap():
+    schedule = PendingSchedule(BLOCK_TIME, backoff_factor=0.1, max_backoff=600)
+    schedule.sync([('fresh', '0x01', sent_ago(5)), ('hour', '0x02', sent_ago(3600)),
+                   ('days', '0x03', sent_ago(3 * 86400))], now=NOW)
+    
+    # New to the schedule - all due at once
+    due = schedule.pop_due(NOW)
+    assert sorted(entry['id'] for entry in due) == ['days', 'fresh', 'hour']
+    assert schedule.pop_due(NOW) == []
+    
+    for entry in due:
+        schedule.reschedule(entry, NOW)
+    intervals = {tx_id: entry['next_check'] - NOW for tx_id, entry in schedule.entries.items()}
+    assert intervals == {'fresh': BLOCK_TIME, 'hour': 360, 'days': 600}
+    
+    assert due_ids(schedule, NOW + BLOCK_TIME) == ['fresh']
+    assert due_ids(schedule, NOW + 359) == []
+    assert due_ids(schedule, NOW + 600) == ['days', 'hour']
+
+
+def test_an_hour_of_blocks_costs_far_fewer_checks_than_polling_every_block():
+    schedule = PendingSchedule(BLOCK_TIME, backoff_factor=0.1, max_backoff=600)
+    schedule.sync([(f'tx{i}', f'0x{i:02x}', sent_ago(i * 3600)) for i in range(1, 51)], now=NOW)
+    
+    checks, blocks = 0, 3600 // BLOCK_TIME
+    for block in range(blocks):
+        now = NOW + block * BLOCK_TIME
+        for entry in schedule.pop_due(now):
+            checks += 1
+            schedule.reschedule(entry, now)
+    
+    # Polling every block would be 50 x 300; here each tx is checked about every 10 minutes
+    assert checks <= 50 * 7, checks
+
+
+def test_sync_drops_resolved_transactions():
+    schedule = PendingSchedule(BLOCK_TIME)
+    schedule.sync([('a', '0x0a', sent_ago(60)), ('b', '0x0b', sent_ago(60))], now=NOW)
+    for entry in schedule.pop_due(NOW):
+        schedule.reschedule(entry, NOW)
+    
+    # 'a' confirmed by someone else; 'c' newly sent
+    schedule.sync([('b', '0x0b', sent_ago(60)), ('c', '0x0c', None)], now=NOW + 1)
+    assert sorted(schedule.entries) == ['b', 'c']
+    assert due_ids(schedule, NOW + 1) == ['c']
+    assert due_ids(schedule, NOW + 3600) == ['b']  # The heap item left by 'a' is skipped
+
+
+def test_passed_nonce_promotes_once():
+    schedule = PendingSchedule(BLOCK_TIME, backoff_factor=0.1, max_backoff=600)
+    schedule.sync([('low', '0x01', sent_ago(86400)), ('high', '0x02', sent_ago(86400))], now=NOW)
+    for entry, nonce in zip(sorted(schedule.pop_due(NOW), key=lambda e: e['id']), (9, 4)):
+        entry['sender'], entry['nonce'] = '0xsender', nonce
+        schedule.reschedule(entry, NOW)
+    
+    assert schedule.waiting_senders() == {'0xsender': 4}
+    
+    # Confirmed nonce 5: nonce 4 ('low') was mined or replaced - check it now, not in 10 minutes
+    assert schedule.promote({'0xsender': 5}, now=NOW + 30) == 1
+    due = schedule.pop_due(NOW + 30)
+    assert [entry['id'] for entry in due] == ['low']
+    
+    # No receipt (replaced) - back to its backoff, and never promoted again
+    schedule.reschedule(due[0], NOW + 30)
+    assert schedule.promote({'0xsender': 5}, now=NOW + 60) == 0
+    assert schedule.waiting_senders() == {'0xsender': 9}
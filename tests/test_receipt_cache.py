@@ -0,0 +1,43 @@
+"""
+Receipt Cache Tests
+Finalized receipts persisted in bulk and read back after a restart
+No Infura key or running API server needed: python -m pytest tests/test_receipt_cache.py
+"""
+import asyncio
+
+from sqlalchemy import event
+
+from receipt_cache import ReceiptCache, finality_depth
+from models import FinalizedReceipt
+
+
+def receipt(number: int, status: int = 1) -> dict:
+    return {'status': status, 'blockNumber': number, 'blockHash': '0x' + '%064x' % number,
+            'gasUsed': 21000, 'effectiveGasPrice': 10 ** 9}
+
+
+def test_finalized_receipts_round_trip_in_one_query_each(scratch_db, db):
+    depth = finality_depth('sepolia')
+    receipts = [('0xAA%02d' % i, receipt(100 + i), depth) for i in range(5)]
+    receipts.append(('0xbeef', receipt(200), depth - 1))  # Not final yet - never cached
+    
+    statements = []
+    event.listen(scratch_db, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    
+    assert asyncio.run(ReceiptCache(persist=True).async_put_many('sepolia', receipts)) == 5
+    assert db.query(FinalizedReceipt).count() == 5
+    
+    # A fresh cache (restarted process) finds them with a single SELECT
+    statements.clear()
+    cache = ReceiptCache(persist=True)
+    found = asyncio.run(cache.async_get_many('sepolia', [tx_hash for tx_hash, _, _ in receipts]))
+    assert sorted(found) == sorted(tx_hash for tx_hash, _, _ in receipts[:5])
+    assert found['0xAA03'] == {'status': 'confirmed', 'block_number': 103, 'block_hash': '0x' + '%064x' % 103,
+                               'gas_used': 21000, 'effective_gas_price': 10 ** 9}
+    assert len([sql for sql in statements if sql.startswith('SELECT')]) == 1
+    assert (cache.hits, cache.misses) == (5, 1)
+    
+    # Now from memory - no query at all
+    statements.clear()
+    assert cache.get('sepolia', '0xaa03') is not None
+    assert statements == []
@@ -0,0 +1,265 @@
+"""
+RPC Pool Tests
+Runs the provider pool against local stub JSON-RPC nodes with injected latency and faults
+No Infura key or running API server needed: python tests/test_rpc_pool.py
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add backend directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from web3 import Web3, AsyncWeb3
+from eth_account import Account
+from rpc_pool import RPCPool, CircuitBreaker, is_rate_limited, is_result_limit_error
+from http_sessions import get_session_registry
+
+
+class StubNode:
+    """Local JSON-RPC node answering eth_blockNumber, with injectable latency and faults"""
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.fault = None          # None, 'http_503', 'rate_limit' or 'already_known' (eth_sendRawTransaction)
+        self.methods = {}          # Method name -> function(params) giving its result; others answer 1234
+        self.requests = 0
+        self.calls = 0             # JSON-RPC calls, counting each call in a batch
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        
+        node = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with node.lock:
+                    node.requests += 1
+                    node.calls += len(body) if isinstance(body, list) else 1
+                    node.in_flight += 1
+                    node.max_in_flight = max(node.max_in_flight, node.in_flight)
+                try:
+                    time.sleep(node.latency)
+                    if node.fault == 'http_503':
+                        self.send_response(503)
+                        self.end_headers()
+                        return
+                    
+                    def answer(request):
+                        if node.fault == 'rate_limit':
+                            return {'jsonrpc': '2.0', 'id': request['id'],
+                                    'error': {'code': -32005, 'message': 'daily request count exceeded, request rate limited'}}
+                        if node.fault == 'already_known' and request['method'] == 'eth_sendRawTransaction':
+                            return {'jsonrpc': '2.0', 'id': request['id'], 'error': {'code': -32000, 'message': 'already known'}}
+                        if request['method'] in node.methods:
+                            return {'jsonrpc': '2.0', 'id': request['id'], 'result': node.methods[request['method']](request['params'])}
+                        return {'jsonrpc': '2.0', 'id': request['id'], 'result': hex(1234)}
+                    
+                    result = [answer(r) for r in body] if isinstance(body, list) else answer(body)
+                    data = json.dumps(result).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                finally:
+                    with node.lock:
+                        node.in_flight -= 1
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def stop(self):
+        self.server.shutdown()
+
+
+def make_pool(*nodes, **kwargs) -> RPCPool:
+    return RPCPool('stub', [node.url for node in nodes], **kwargs)
+
+
+def test_failover_on_http_error():
+    """A 503 from the first endpoint is retried on the next one"""
+    bad, good = StubNode(), StubNode()
+    bad.fault = 'http_503'
+    pool = make_pool(bad, good)
+    w3 = Web3(pool.provider())
+    
+    for _ in range(5):
+        assert w3.eth.block_number == 1234
+    
+    assert good.requests >= 5
+    assert pool.endpoints[0].failures >= 1
+    bad.stop(); good.stop()
+
+
+def test_failover_on_rate_limit():
+    """A JSON-RPC rate-limit error counts as an endpoint fault, not a call result"""
+    throttled, good = StubNode(), StubNode()
+    throttled.fault = 'rate_limit'
+    pool = make_pool(throttled, good)
+    w3 = Web3(pool.provider())
+    
+    for _ in range(5):
+        assert w3.eth.block_number == 1234
+    
+    assert pool.endpoints[0].error_rate > 0
+    throttled.stop(); good.stop()
+
+
+def test_log_range_errors_are_not_throttling():
+    """'Too many results' from eth_getLogs asks for a smaller range - it must not trip failover"""
+    too_many = {'error': {'code': -32005, 'message': 'query returned more than 10000 results'}}
+    throttled = {'error': {'code': -32005, 'message': 'daily request count exceeded, request rate limited'}}
+    
+    assert not is_rate_limited(too_many)
+    assert is_result_limit_error(too_many['error'])
+    assert is_rate_limited(throttled)
+    assert not is_result_limit_error(throttled['error'])
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """After repeated failures the endpoint is skipped, then probed again after the reset timeout"""
+    flaky, good = StubNode(), StubNode()
+    flaky.fault = 'http_503'
+    pool = make_pool(flaky, good)
+    pool.endpoints[0].breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.5)
+    w3 = Web3(pool.provider())
+    
+    # Force traffic at the flaky endpoint until its breaker opens
+    while pool.endpoints[0].breaker.state != CircuitBreaker.OPEN:
+        w3.eth.block_number
+    
+    requests_when_opened = flaky.requests
+    for _ in range(10):
+        w3.eth.block_number
+    assert flaky.requests == requests_when_opened, "open circuit should receive no traffic"
+    
+    # Heal the endpoint; after the reset timeout a probe closes the circuit
+    flaky.fault = None
+    time.sleep(0.6)
+    for _ in range(20):
+        w3.eth.block_number
+        if pool.endpoints[0].breaker.state == CircuitBreaker.CLOSED:
+            break
+    assert pool.endpoints[0].breaker.state == CircuitBreaker.CLOSED
+    flaky.stop(); good.stop()
+
+
+def test_latency_weighted_routing():
+    """The faster endpoint receives most of the traffic"""
+    slow, fast = StubNode(latency=0.05), StubNode(latency=0.0)
+    pool = make_pool(slow, fast)
+    w3 = Web3(pool.provider())
+    
+    for _ in range(60):
+        w3.eth.block_number
+    
+    assert fast.requests > slow.requests * 2, (fast.requests, slow.requests)
+    slow.stop(); fast.stop()
+
+
+def test_concurrency_cap():
+    """No endpoint ever sees more in-flight requests than its cap"""
+    node = StubNode(latency=0.05)
+    pool = make_pool(node, max_concurrency=2)
+    w3 = Web3(pool.provider())
+    
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(lambda _: w3.eth.block_number, range(20)))
+    
+    assert node.max_in_flight <= 2, node.max_in_flight
+    node.stop()
+
+
+def test_all_endpoints_down():
+    """With every endpoint failing the caller gets a ConnectionError"""
+    a, b = StubNode(), StubNode()
+    a.fault = b.fault = 'http_503'
+    w3 = Web3(make_pool(a, b).provider())
+    
+    try:
+        w3.eth.block_number
+        assert False, "expected ConnectionError"
+    except ConnectionError:
+        pass
+    a.stop(); b.stop()
+
+
+def test_async_failover_and_cap():
+    """The async provider fails over and respects the concurrency cap too"""
+    bad, good = StubNode(), StubNode(latency=0.02)
+    bad.fault = 'http_503'
+    pool = make_pool(bad, good, max_concurrency=3)
+    
+    async def run():
+        w3 = AsyncWeb3(pool.async_provider())
+        results = await asyncio.gather(*(w3.eth.block_number for _ in range(15)))
+        assert all(r == 1234 for r in results)
+    
+    asyncio.run(run())
+    assert good.max_in_flight <= 3, good.max_in_flight
+    bad.stop(); good.stop()
+
+
+def test_resent_transaction_already_known_is_sent():
+    """A send that timed out is resent elsewhere; 'already known' there means it went through"""
+    slow, knows_it = StubNode(latency=0.5), StubNode()
+    knows_it.fault = 'already_known'
+    pool = RPCPool('stub', [slow.url, knows_it.url], timeout=0.2)
+    pool.candidates = lambda: list(pool.endpoints)  # Slow endpoint first
+    signed = Account.sign_transaction({'nonce': 0, 'to': '0x' + '42' * 20, 'value': 1, 'gas': 21000,
+                                       'gasPrice': 10 ** 9, 'chainId': 11155111}, '0x' + '11' * 32)
+    
+    async def send():
+        return await AsyncWeb3(pool.async_provider()).eth.send_raw_transaction(signed.raw_transaction)
+    
+    assert Web3(pool.provider()).eth.send_raw_transaction(signed.raw_transaction) == signed.hash
+    assert asyncio.run(send()) == signed.hash
+    assert knows_it.requests == 2
+    slow.stop(); knows_it.stop()
+
+
+
+def test_shared_session_in_worker_threads():
+    node = StubNode()
+    pool = make_pool(node)
+    w3 = Web3(pool.provider())
+    
+    # Requests from the constructing thread and from worker threads
+    assert w3.eth.block_number == 1234
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(lambda _: w3.eth.block_number, range(4))) == [1234] * 4
+    
+    # Every thread used the registry's keep-alive session, none built its own
+    shared = get_session_registry().session(node.url)
+    cached = list(pool.endpoints[0].provider._request_session_manager.session_cache._data.values())
+    assert len(cached) >= 2 and all(session is shared for session in cached), cached
+    node.stop()
+
+if __name__ == "__main__":
+    print("=" * 80)
+    print("🧪 RPC Pool Tests (local stub nodes)")
+    print("=" * 80)
+    
+    failed = 0
+    for name, test in list(globals().items()):
+        if name.startswith('test_') and callable(test):
+            try:
+                test()
+                print(f"✅ PASS | {name}")
+            except Exception as e:
+                failed += 1
+                print(f"❌ FAIL | {name}: {e!r}")
+    
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,73 @@
+"""
+Scan Pipeline Benchmark
+Scans a synthetic chain served by a local stub node with 50 ms latency per request,
+and checks the batched pipeline beats block-by-block fetching by an order of magnitude
+No Infura key or running API server needed: python -m pytest tests/test_scan_pipeline.py
+"""
+import time
+
+from test_rpc_pool import StubNode
+from transaction_scanner import TransactionScanner, AddressIndex
+
+LATENCY = 0.05
+BLOCKS = 2000
+WALLET = '0x' + '42' * 20
+
+
+def block_hash(number: int) -> str:
+    return '0x' + '%064x' % (number + 1)
+
+
+def tx_hash(number: int) -> str:
+    return '0x' + '%064x' % (10 ** 9 + number)
+
+
+def get_block(params):
+    """A block; every 250th one pays our wallet"""
+    number = int(params[0], 16)
+    transactions = []
+    if number % 250 == 0:
+        transactions.append({'hash': tx_hash(number), 'from': '0x' + '11' * 20, 'to': WALLET,
+                             'value': hex(10 ** 16), 'gasPrice': hex(10 ** 9)})
+    return {'number': hex(number), 'hash': block_hash(number), 'parentHash': block_hash(number - 1),
+            'timestamp': hex(1_700_000_000 + 12 * number), 'logsBloom': '0x' + '00' * 256,
+            'transactions': transactions}
+
+
+def get_block_receipts(params):
+    number = int(params[0], 16)
+    return [{'transactionHash': tx_hash(number), 'status': '0x1', 'gasUsed': hex(21000)}]
+
+
+class FixedHead:
+    def block_number(self) -> int:
+        return BLOCKS + 100
+
+
+def test_batched_scan_is_an_order_of_magnitude_faster():
+    node = StubNode(latency=LATENCY)
+    node.methods = {'eth_getBlockByNumber': get_block, 'eth_getBlockReceipts': get_block_receipts}
+    scanner = TransactionScanner('sepolia', rpc_url=node.url, batch_size=20, concurrency=8)
+    scanner.head, scanner.block_cache = FixedHead(), None
+    node.requests = node.calls = 0
+    
+    started = time.perf_counter()
+    result = scanner._scan(AddressIndex({WALLET: 'wallet-1'}), 1, BLOCKS)
+    elapsed = time.perf_counter() - started
+    scanner.close()
+    node.stop()
+    
+    # Every block, in order and linked, and every deposit
+    assert result['last_block'] == BLOCKS and result['last_hash'] == block_hash(BLOCKS)
+    assert [d['block_number'] for d in result['deposits']] == list(range(250, BLOCKS + 1, 250))
+    assert all(d['wallet_id'] == 'wallet-1' for d in result['deposits'])
+    
+    # One HTTP request per 20-block batch, plus one receipts batch per batch with a deposit
+    assert node.requests == BLOCKS // 20 + len(result['deposits'])
+    assert node.calls == BLOCKS + len(result['deposits'])
+    assert node.max_in_flight <= 8
+    
+    # Block-by-block would wait out the latency once per block
+    sequential = BLOCKS * LATENCY
+    print(f"\n⏱️ {BLOCKS} blocks in {elapsed:.2f}s (block-by-block: at least {sequential:.0f}s)")
+    assert elapsed < sequential / 10, elapsed
@@ -0,0 +1,57 @@
+"""
+Send Quote Tests
+Quotes prepared by /send/quote: created, redeemed once, and refused after expiry
+No Infura key or running API server needed: python -m pytest tests/test_send_quotes.py
+"""
+from decimal import Decimal
+
+from send_quotes import QuoteStore
+from database import SessionLocal
+from models import SendQuote
+
+
+def prepared_send(wallet) -> dict:
+    return {
+        'user_id': wallet.user_id,
+        'wallet_id': wallet.id,
+        'network': 'sepolia',
+        'to_address': '0x' + '42' * 20,
+        'amount': Decimal('0.25'),
+        'balance': Decimal('1.5'),
+        'balance_wei': 1_500_000_000_000_000_000,
+        'gas_estimate': {'gas_limit': 21000, 'max_fee_per_gas': 3_000_000_000, 'total_fee_eth': 0.000063}
+    }
+
+
+def test_quote_round_trips_through_the_database(db, make_wallet):
+    wallet = make_wallet(db)
+    store = QuoteStore(ttl=30)
+    quote = store.create(db, prepared_send(wallet))
+    
+    # Redeemed from another session, as another API worker would
+    with SessionLocal() as other:
+        taken = store.take(other, quote['quote_id'])
+    
+    assert taken == dict(prepared_send(wallet), quote_id=quote['quote_id'], expires_at=quote['expires_at'])
+    assert db.query(SendQuote).count() == 0
+
+
+def test_quote_can_only_be_used_once(db, make_wallet):
+    store = QuoteStore(ttl=30)
+    quote_id = store.create(db, prepared_send(make_wallet(db)))['quote_id']
+    
+    assert store.take(db, quote_id) is not None
+    assert store.take(db, quote_id) is None
+    assert store.take(db, 'no-such-quote') is None
+
+
+def test_expired_quote_is_refused_and_purged(db, make_wallet):
+    wallet = make_wallet(db)
+    expired = QuoteStore(ttl=-1)
+    stale_id = expired.create(db, prepared_send(wallet))['quote_id']
+    assert expired.take(db, stale_id) is None
+    
+    # Expired quotes left behind are dropped the next time one is created
+    expired.create(db, prepared_send(wallet))
+    fresh_id = QuoteStore(ttl=30).create(db, prepared_send(wallet))['quote_id']
+    assert [row.id for row in db.query(SendQuote)] == [fresh_id]